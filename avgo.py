@@ -1,9 +1,10 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
 import time
+from data_cache import load_prices
+from engine import extract_arrays, span_years
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
@@ -17,15 +18,7 @@ def get_avgo_data():
     tickers = ['AVGO', 'SHY'] 
     
     # AVGO(구 Avago)가 2009년 상장, 데이터 안정성을 위해 2010년부터 수집
-    df = yf.download(tickers, start="2010-01-01", progress=False)
-    
-    # yfinance 버전 이슈 대응 (MultiIndex 처리)
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            df = df['Close']
-        except:
-            # 최신 버전 대응
-            df = df.xs('Close', axis=1, level=0)
+    df = load_prices(tickers, start="2010-01-01")
     
     df = df.dropna()
     
@@ -157,49 +150,60 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("="*60)
 
 # ==========================================
-# 4. 실행부
+# 4. 최적화 + 결과 리포트 (run_all.py 에서도 사용)
+# ==========================================
+# AVGO는 변동성이 커서 탐색 범위를 넓게 잡되, 속도를 위해 step을 조정
+ma_range = range(20, 201, 1)   # 1일 간격 (GRID_SEARCH=adaptive 면 5일 간격 격자부터 좁혀 가며 탐색)
+rsi_range = range(70, 96, 2)   # 2단위 탐색
+buffer_range = [0.0, 0.02, 0.04, 0.06] # 개별주는 버퍼를 좀 더 넉넉히
+
+# 제약 조건 (None 이면 사용 안 함) - 조건을 어긴 것이 확실해지는 순간 그 조합은 시뮬레이션을 멈추고 탈락
+max_drawdown = None   # 예: -0.6 -> MDD 가 -60% 보다 나빠지는 조합 제외
+min_cagr = None       # 예: 0.2  -> CAGR 20% 미만 조합 제외
+
+def optimize(df_raw):
+    arrays = extract_arrays(df_raw, price='AVGO', ret_lev='Sim_AVGO_3X')
+    return grid_search('pyramid', arrays, ma_range, rsi_range, buffer_range,
+                       years=span_years(df_raw), max_drawdown=max_drawdown, min_cagr=min_cagr, ticker='AVGO')
+
+def report(df_raw, best_params):
+    # 최적 결과로 최종 실행
+    final_score, df_final = run_avgo_strategy(
+        df_raw, 
+        best_params['ma'], 
+        best_params['rsi'], 
+        best_params['buf']
+    )
+
+    # 결과 분석
+    analyze_today(
+        df_final, 
+        best_params['ma'], 
+        best_params['rsi'], 
+        best_params['buf'],
+        final_score
+    )
+
+# ==========================================
+# 5. 실행부
 # ==========================================
 if __name__ == "__main__":
     # 데이터 수집 (AVGO 2010년~현재)
     df_raw = get_avgo_data()
     
-    # AVGO는 변동성이 커서 탐색 범위를 넓게 잡되, 속도를 위해 step을 조정
-    ma_range = range(20, 201, 1)   # 5일 간격으로 탐색 (속도 향상)
-    rsi_range = range(70, 96, 2)   # 2단위 탐색
-    buffer_range = [0.0, 0.02, 0.04, 0.06] # 개별주는 버퍼를 좀 더 넉넉히
-    
     total_combinations = len(ma_range) * len(rsi_range) * len(buffer_range)
     
     print(f"\n⚡ 최적 시나리오 분석 시작...")
     print(f"   - 총 시나리오: {total_combinations:,}개")
     
     start_time = time.time()
-    best_score = -999
-    best_params = {}
     
     # 최적 파라미터 찾기
-    for ma, rsi, buf in itertools.product(ma_range, rsi_range, buffer_range):
-        score, _ = run_avgo_strategy(df_raw.copy(), ma, rsi, buf)
-        
-        if score > best_score:
-            best_score = score
-            best_params = {'ma': ma, 'rsi': rsi, 'buf': buf}
+    best_params, best_score = optimize(df_raw)
             
     print(f"\n✅ 완료! (소요시간: {time.time() - start_time:.1f}초)")
     
-    # 최적 결과로 최종 실행
-    final_score, df_final = run_avgo_strategy(
-        df_raw, 
-        best_params['ma'], 
-        best_params['rsi'], 
-        best_params['buf']
-    )
-    
-    # 결과 분석
-    analyze_today(
-        df_final, 
-        best_params['ma'], 
-        best_params['rsi'], 
-        best_params['buf'],
-        final_score
-    )
\ No newline at end of file
+    if best_params is None:
+        print("⚠️ 제약 조건(max_drawdown / min_cagr)을 만족하는 조합이 없습니다.")
+    else:
+        report(df_raw, best_params)
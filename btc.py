@@ -1,9 +1,10 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
 import time
+from data_cache import load_prices
+from engine import extract_arrays
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
@@ -13,11 +14,7 @@ warnings.filterwarnings("ignore")
 def get_btc_data():
     print("⏳ 데이터 수집 중... (BTC, BITX 시뮬레이션)")
     tickers = ['BTC-USD', 'SHY'] 
-    df = yf.download(tickers, start="2016-01-01", progress=False)
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        try: df = df['Close']
-        except: df.columns = df.columns.get_level_values(0)
+    df = load_prices(tickers, start="2016-01-01")
     
     df = df.dropna()
     
@@ -153,30 +150,18 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("="*60)
 
 # ==========================================
-# 4. 메인 실행 (최적화)
+# 4. 최적화 + 결과 리포트 (run_all.py 에서도 사용)
 # ==========================================
-if __name__ == "__main__":
-    df_raw = get_btc_data()
-    
-    # 파라미터 탐색 범위
-    ma_range = range(60, 201, 1)   # 이평선
-    rsi_range = range(70, 96, 5)   # RSI 기준 (70~95)
-    buffer_range = [0.0, 0.03, 0.05] # 휩소 버퍼
-    
-    print(f"\n⚡ 최적 시나리오 분석 중... (총 {len(ma_range)*len(rsi_range)*len(buffer_range)}개 조합)")
-    start_time = time.time()
-    
-    best_score = -999
-    best_params = {}
-    
-    for ma, rsi, buf in itertools.product(ma_range, rsi_range, buffer_range):
-        score, _ = run_switching_strategy(df_raw.copy(), ma, rsi, buf)
-        if score > best_score:
-            best_score = score
-            best_params = {'ma': ma, 'rsi': rsi, 'buf': buf}
-            
-    print(f"✅ 완료! (소요시간: {time.time() - start_time:.1f}초)")
-    
+# 파라미터 탐색 범위
+ma_range = range(60, 201, 1)   # 이평선
+rsi_range = range(70, 96, 5)   # RSI 기준 (70~95)
+buffer_range = [0.0, 0.03, 0.05] # 휩소 버퍼
+
+def optimize(df_raw):
+    arrays = extract_arrays(df_raw, price='BTC-USD', ret_lev='Sim_BITX', ret_spot='BTC_Pct')
+    return grid_search('btc', arrays, ma_range, rsi_range, buffer_range, ticker='BTC-USD')
+
+def report(df_raw, best_params):
     # 최적 결과 실행
     final_score, df_final = run_switching_strategy(
         df_raw, 
@@ -184,11 +169,26 @@ if __name__ == "__main__":
         best_params['rsi'], 
         best_params['buf']
     )
-    
+
     analyze_today(
         df_final, 
         best_params['ma'], 
         best_params['rsi'], 
         best_params['buf'],
         final_score
-    )
\ No newline at end of file
+    )
+
+# ==========================================
+# 5. 메인 실행 (최적화)
+# ==========================================
+if __name__ == "__main__":
+    df_raw = get_btc_data()
+    
+    print(f"\n⚡ 최적 시나리오 분석 중... (총 {len(ma_range)*len(rsi_range)*len(buffer_range)}개 조합)")
+    start_time = time.time()
+    
+    best_params, best_score = optimize(df_raw)
+            
+    print(f"✅ 완료! (소요시간: {time.time() - start_time:.1f}초)")
+    
+    report(df_raw, best_params)
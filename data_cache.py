@@ -0,0 +1,230 @@
+import io
+import os
+import re
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 0. 설정
+# ==========================================
+# 캐시 폴더 (기본: 스크립트 폴더의 .market_cache)
+CACHE_DIR = os.environ.get(
+    'MARKET_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.market_cache'),
+)
+# 마지막 다운로드 후 이 시간(초) 안에는 네트워크를 타지 않고 캐시만 읽음
+MAX_AGE = float(os.environ.get('MARKET_CACHE_MAX_AGE', 6 * 3600))
+# FRED 지표는 하루 한 번만 갱신 (모든 스크립트가 같은 파일을 공유)
+FRED_MAX_AGE = float(os.environ.get('FRED_CACHE_MAX_AGE', 24 * 3600))
+# FRED 그래프 CSV 주소 (API 키 불필요)
+FRED_URL = os.environ.get('FRED_URL', 'https://fred.stlouisfed.org/graph/fredgraph.csv')
+# 지정하면 yfinance 대신 같은 형식(?id=티커&cosd=시작일)의 CSV 서버에서 종가를 받음 (로컬 대역 서버 테스트용)
+PRICE_URL = os.environ.get('PRICE_URL')
+
+# 동시 다운로드 연결 수 상한, 소스별 요청 타임아웃(초), 실패 시 재시도 횟수
+MAX_CONNECTIONS = int(os.environ.get('MARKET_MAX_CONNECTIONS', 8))
+FETCH_TIMEOUT = float(os.environ.get('MARKET_FETCH_TIMEOUT', 20))
+FETCH_RETRIES = int(os.environ.get('MARKET_FETCH_RETRIES', 2))
+# 장중 봉 판단 기준 시간대 (받은 시각의 이 시간대 날짜 이후 봉은 아직 확정되지 않은 값으로 봄)
+MARKET_TZ = os.environ.get('MARKET_TZ', 'America/New_York')
+
+# ==========================================
+# 1. 캐시 파일 입출력 (시리즈별 npz: 날짜 + 값)
+# ==========================================
+def _cache_path(kind, name):
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+    return os.path.join(CACHE_DIR, f"{kind}_{safe}.npz")
+
+def _read_cache(path):
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        series = pd.Series(data['values'], index=pd.to_datetime(data['dates']))
+        meta = {'start': str(data['start']), 'fetched_at': float(data['fetched_at'])}
+    return series, meta
+
+def _write_cache(path, series, start, fetched_at):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # 쓰다가 끊기거나 여러 프로세스가 동시에 써도 기존 캐시가 깨지지 않도록
+    # 임시 파일에 쓴 뒤 교체하는 방식으로 저장
+    with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix='.tmp', delete=False) as f:
+        np.savez(
+            f,
+            dates=series.index.values.astype('datetime64[ns]'),
+            values=series.values.astype(np.float64),
+            start=np.str_(start),
+            fetched_at=np.float64(fetched_at),
+        )
+    os.replace(f.name, path)
+
+def _clean(series):
+    series = series.dropna().astype(np.float64)
+    if getattr(series.index, 'tz', None) is not None:
+        series.index = series.index.tz_localize(None)
+    return series[~series.index.duplicated(keep='last')].sort_index()
+
+def _market_date(timestamp):
+    """time.time() 값 시점의 시장 날짜 (그날 봉은 그때 아직 장중일 수 있음)"""
+    return pd.Timestamp(timestamp, unit='s', tz='UTC').tz_convert(MARKET_TZ).tz_localize(None).normalize()
+
+# ==========================================
+# 2. 증분 업데이트 공용 로직
+# ==========================================
+def _load_cached(path, start, fetch, label, max_age=None):
+    """
+    캐시가 있으면 마지막 날짜 이후 구간만 받아서 이어 붙이고,
+    없거나 요청 시작일이 캐시보다 앞서면 전체를 받습니다.
+    네트워크 실패 시에는 캐시가 있으면 캐시로 계속 진행합니다 (오프라인 실행).
+    """
+    if max_age is None:
+        max_age = MAX_AGE
+    start = pd.Timestamp(start).strftime('%Y-%m-%d')
+    cached = _read_cache(path)
+    now = time.time()
+
+    if cached is not None and not cached[0].empty and cached[1]['start'] <= start:
+        series, meta = cached
+        if now - meta['fetched_at'] < max_age:
+            return series[series.index >= start]
+
+        # 받을 때 장중이던 봉은 확정 종가가 아니므로 빼고 마지막 확정 봉부터 다시 받음
+        # (그대로 두면 겹치는 날 값이 달라져서 매번 전체를 다시 받게 됨)
+        final = series[series.index < _market_date(meta['fetched_at'])]
+        if final.empty:
+            final = series
+        last = final.index[-1]
+        try:
+            new = _clean(fetch(last.strftime('%Y-%m-%d')))
+        except Exception as e:
+            print(f"⚠️ {label} 업데이트 실패, 캐시 데이터로 진행합니다: {e}")
+            return series[series.index >= start]
+
+        if last in new.index and not np.isclose(new[last], final[last], rtol=1e-6, atol=0.0):
+            # 겹치는 날 값이 다르면 (배당/분할로 수정주가가 다시 계산됨) 전체를 다시 받음
+            try:
+                series = _clean(fetch(meta['start']))
+            except Exception as e:
+                # 캐시는 그대로 두므로 다음 실행에서 다시 시도
+                print(f"⚠️ {label} 전체 재다운로드 실패, 캐시 데이터로 진행합니다: {e}")
+                return series[series.index >= start]
+        else:
+            series = pd.concat([final, new[new.index > last]])
+
+        _write_cache(path, series, meta['start'], now)
+        return series[series.index >= start]
+
+    try:
+        series = _clean(fetch(start))
+    except Exception as e:
+        if cached is None:
+            raise
+        print(f"⚠️ {label} 다운로드 실패, 캐시 데이터로 진행합니다: {e}")
+        series = cached[0]
+        return series[series.index >= start]
+
+    _write_cache(path, series, start, now)
+    return series
+
+# ==========================================
+# 3. 다운로드 공용 (타임아웃 + 재시도)
+# ==========================================
+def _with_retry(fetch):
+    """실패하면 0.5초, 1초, ... 쉬었다가 FETCH_RETRIES 번까지 다시 시도"""
+    def run(since):
+        for attempt in range(FETCH_RETRIES + 1):
+            try:
+                return fetch(since)
+            except Exception:
+                if attempt == FETCH_RETRIES:
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+    return run
+
+def _read_csv_url(base_url, name, start):
+    query = urllib.parse.urlencode({'id': name, 'cosd': start})
+    with urllib.request.urlopen(f"{base_url}?{query}", timeout=FETCH_TIMEOUT) as resp:
+        body = resp.read()
+    # 휴일 등 값이 없는 날은 '.' 으로 들어옴
+    df = pd.read_csv(io.BytesIO(body), index_col=0, parse_dates=True, na_values='.')
+    return df.iloc[:, 0]
+
+# ==========================================
+# 4. 주가 (yfinance 종가)
+# ==========================================
+def _download_close(ticker, start):
+    if PRICE_URL:
+        return _read_csv_url(PRICE_URL, ticker, start)
+
+    import yfinance as yf
+
+    # yf.download 는 모듈 전역 결과 테이블을 써서 스레드끼리 동시에 부를 수 없으므로
+    # 티커 객체의 history() 로 받음 (스레드마다 독립적으로 돌고, 타임아웃도 티커별)
+    # auto_adjust=True 는 yf.download 기본값과 같은 수정주가
+    df = yf.Ticker(ticker).history(start=start, auto_adjust=True, timeout=FETCH_TIMEOUT)
+    if df is None or len(df) == 0:
+        return pd.Series(dtype=np.float64)
+    return df['Close']
+
+def load_close(ticker, start):
+    """티커 1개의 종가 Series (로컬 캐시 + 증분 다운로드)"""
+    series = _load_cached(
+        _cache_path('price', ticker), start,
+        _with_retry(lambda since: _download_close(ticker, since)), ticker,
+    )
+    return series.rename(ticker)
+
+def load_prices(tickers, start):
+    """
+    yf.download(tickers, start=...)['Close'] 대체 (티커별 동시 다운로드).
+    컬럼 순서는 tickers 순서 그대로이며, 날짜는 합집합(빈 칸은 NaN)입니다.
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    return load_all(tickers, start)[0]
+
+# ==========================================
+# 5. 매크로 지표 (FRED)
+# ==========================================
+def load_fred(series_id, start):
+    """
+    FRED 시리즈 1개 (예: 'T10Y2Y', 'BAMLH0A0HYM2').
+    web.DataReader(series_id, 'fred', ...) / Fred.get_series 대체이며, 하루 한 번만 다운로드합니다.
+    """
+    series = _load_cached(
+        _cache_path('fred', series_id), start,
+        _with_retry(lambda since: _read_csv_url(FRED_URL, series_id, since)), f"FRED {series_id}",
+        max_age=FRED_MAX_AGE,
+    )
+    return series.rename(series_id)
+
+# ==========================================
+# 6. 동시 수집 (주가 + FRED 한 번에)
+# ==========================================
+def load_all(tickers, start, fred_ids=()):
+    """
+    주가와 FRED 시리즈를 스레드 풀(최대 MAX_CONNECTIONS 연결)에서 동시에 받습니다.
+    소스마다 타임아웃/재시도가 따로 돌기 때문에 느린 소스가 다른 소스를 막지 않습니다.
+
+    returns:
+      - 종가 DataFrame (컬럼 = tickers 순서)
+      - {series_id: Series} (받지 못한 FRED 시리즈는 빠짐)
+    """
+    tickers = list(dict.fromkeys(tickers))
+    with ThreadPoolExecutor(max_workers=MAX_CONNECTIONS) as pool:
+        price_jobs = [pool.submit(load_close, ticker, start) for ticker in tickers]
+        fred_jobs = {sid: pool.submit(load_fred, sid, start) for sid in fred_ids}
+
+        prices = pd.concat([job.result() for job in price_jobs], axis=1)
+        macro = {}
+        for sid, job in fred_jobs.items():
+            try:
+                macro[sid] = job.result()
+            except Exception as e:
+                print(f"⚠️ FRED {sid} 다운로드 실패: {e}")
+    return prices, macro
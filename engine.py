@@ -0,0 +1,849 @@
+import os
+import numpy as np
+
+# Numba가 설치되어 있으면 상태 머신 루프를 JIT 컴파일 (없으면 순수 파이썬으로 동작)
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# ==========================================
+# 0. 전략 종류 (스크립트별 상태 머신)
+# ==========================================
+SWITCH = 0    # nvda/lly/nflx/unh/indy/ucyb/ether : 본주 ↔ 2배 스위칭 + 금리차 역전 필터
+PYRAMID = 1   # soxx/avgo/msft/oracle : 30% → 70% → 100% 피라미딩
+PLTR = 2      # pltr : 피라미딩 + 금리차 역전 시 최대 비중 제한
+TQQQ = 3      # qqq tqqq : 피라미딩 + 하이일드 스프레드 Risk-Off
+BTC = 4       # btc : 현금 / 현물 / 레버리지 3모드
+VIX = 5       # VIX 필터 피라미딩 (세 번째 파라미터 = vix_panic_line)
+
+KINDS = {
+    'switch': SWITCH,
+    'pyramid': PYRAMID,
+    'pltr': PLTR,
+    'tqqq': TQQQ,
+    'btc': BTC,
+    'vix': VIX,
+}
+
+# 시뮬레이션 루프가 조합별로 함께 누적하는 값 (최대 낙폭, 일간 수익률 합, 제곱합, 보유 비중 합, 시뮬레이션한 날 수)
+STATS = ('mdd', 'ret_sum', 'ret_sq_sum', 'exposure_sum', 'bars')
+# simulate_metrics() 가 돌려주는 지표 열 순서
+METRICS = ('score', 'cagr', 'mdd', 'vol', 'sharpe', 'exposure')
+
+# ==========================================
+# 1. DataFrame -> 커널용 배열 추출 (1회)
+# ==========================================
+def extract_arrays(df, price, ret_lev, ret_spot=None, ret_cash='Sim_Cash', macro=None, macro2=None):
+    """
+    그리드 탐색 전에 한 번만 호출해서 커널이 쓰는 배열을 뽑아 둡니다.
+
+    params:
+      - price: 신호용 가격 컬럼 (예: 'NVDA')
+      - ret_lev: 레버리지 수익률 컬럼 (예: 'Sim_Lev_2X', 'Sim_SOXL_3X')
+      - ret_spot: 본주(1배) 수익률 컬럼 (스위칭/BTC 전략만 사용)
+      - ret_cash: 현금성 자산 수익률 컬럼
+      - macro, macro2: 매크로 필터 컬럼 (금리차, Risk-Off 플래그, VIX / VIX_MA50)
+    """
+    n = len(df)
+
+    def column(name):
+        if name is None:
+            return np.zeros(n)
+        return np.ascontiguousarray(df[name].values, dtype=np.float64)
+
+    return {
+        'price': column(price),
+        'rsi': column('RSI'),
+        'macro': column(macro),
+        'macro2': column(macro2),
+        # 수익률의 NaN은 pandas prod()처럼 건너뛰도록 0으로 채움
+        'ret_lev': np.nan_to_num(column(ret_lev)),
+        'ret_spot': np.nan_to_num(column(ret_spot)),
+        'ret_cash': np.nan_to_num(column(ret_cash)),
+    }
+
+# ==========================================
+# 2. 하루치 상태 전이 (스크립트의 for 루프 본문과 동일)
+# ==========================================
+def _step(kind, pos, lev, price, ma_val, rsi_val, m1, m2, rsi_limit, p3):
+    if kind == SWITCH:
+        lev = 0.0
+        if price < ma_val * (1 - p3):
+            pos = 0.0
+        else:
+            if price > ma_val:
+                if pos == 0.0: pos = 0.3
+                elif pos <= 0.3: pos = 0.7
+                else: pos = 1.0
+                if rsi_val < rsi_limit:
+                    lev = 1.0
+            # 금리차 역전 시: 비중 30% 제한 + 무조건 1배
+            if m1 < 0:
+                pos = min(pos, 0.3)
+                lev = 0.0
+        return pos, lev
+
+    if kind == BTC:
+        # pos/lev 조합으로 모드 표현 (현금: 0/0, 현물: 1/0, 레버리지: 1/1)
+        if price < ma_val * (1 - p3):
+            pos = 0.0
+            lev = 0.0
+        elif price > ma_val:
+            pos = 1.0
+            lev = 0.0 if rsi_val > rsi_limit else 1.0
+        return pos, lev
+
+    if kind == PLTR:
+        max_alloc = 0.5 if m1 < -0.5 else 1.0
+        if price < ma_val * (1 - p3):
+            pos = 0.0
+        elif price > ma_val:
+            if pos == 0.0:
+                pos = min(0.3, max_alloc)
+            elif pos <= 0.3:
+                pos = min(0.7, max_alloc)
+            elif pos <= 0.7:
+                if rsi_val < rsi_limit: pos = min(1.0, max_alloc)
+                else: pos = min(0.7, max_alloc)
+            elif rsi_val > rsi_limit:
+                pos = 0.7
+        return pos, 1.0
+
+    if kind == VIX:
+        # 버퍼 대신 VIX 공포선(p3)으로 대피
+        if price < ma_val or m1 > m2 * 1.2 or m1 > p3:
+            pos = 0.0
+        elif pos == 0.0: pos = 0.3
+        elif pos == 0.3: pos = 0.7
+        elif pos == 0.7:
+            if m1 < 20 and rsi_val < rsi_limit: pos = 1.0
+        elif pos == 1.0:
+            if rsi_val > rsi_limit: pos = 0.7
+        return pos, 1.0
+
+    # PYRAMID / TQQQ (TQQQ는 Risk-Off 플래그가 켜지면 무조건 현금화)
+    if kind == TQQQ and m1 != 0:
+        return 0.0, 1.0
+    if price < ma_val * (1 - p3):
+        pos = 0.0
+    elif price > ma_val:
+        if pos == 0.0: pos = 0.3
+        elif pos == 0.3: pos = 0.7
+        elif pos == 0.7:
+            if rsi_val < rsi_limit: pos = 1.0
+        elif pos == 1.0:
+            if rsi_val > rsi_limit: pos = 0.7
+    return pos, 1.0
+
+# ==========================================
+# 3. 배열 전용 백테스트 커널
+# ==========================================
+def _simulate(kind, price, ma, rsi, m1, m2, ret_lev, ret_spot, ret_cash, rsi_limit, p3, pos_out, lev_out, stats_out,
+              mdd_limit, min_final, bound):
+    # mdd_limit / min_final / bound: 조기 중단 조건 (growth_bound 참고, 조건 없으면 -inf / -inf / 1)
+    pos = 0.0
+    lev = 0.0
+    equity = 1.0
+    # 같은 루프에서 리스크 지표용 누적값도 계산 (STATS 순서)
+    peak = 0.0
+    mdd = 0.0
+    total = 0.0
+    total_sq = 0.0
+    exposure = 0.0
+    bars = 0
+    pruned = False
+
+    for i in range(len(price)):
+        # 오늘 수익률은 어제 포지션으로 결정 (shift(1) + fillna(0) 과 동일)
+        r = ret_lev[i] * pos * lev + ret_spot[i] * pos * (1 - lev) + ret_cash[i] * (1 - pos)
+        equity *= 1 + r
+
+        total += r
+        total_sq += r * r
+        exposure += pos
+        if equity > peak:
+            peak = equity
+        elif (equity - peak) / peak < mdd:
+            mdd = (equity - peak) / peak
+        bars += 1
+
+        # 낙폭 한도를 넘었거나, 남은 기간 최대로 벌어도 목표 배수에 못 미치면 여기서 중단
+        if mdd < mdd_limit or equity * bound[i + 1] < min_final:
+            pruned = True
+            break
+
+        if i > 0:
+            pos, lev = _step(kind, pos, lev, price[i], ma[i], rsi[i], m1[i], m2[i], rsi_limit, p3)
+        pos_out[i] = pos
+        lev_out[i] = lev
+
+    stats_out[0] = mdd
+    stats_out[1] = total
+    stats_out[2] = total_sq
+    stats_out[3] = exposure
+    stats_out[4] = bars
+    if pruned:
+        return np.nan
+    return equity
+
+def _simulate_many(kind, price, ema_rows, rsi, m1, m2, ret_lev, ret_spot, ret_cash, ma_idx, rsi_limits, p3s, stats,
+                   mdd_limit, min_final, bound):
+    # 조합을 하나씩 _simulate()로 돌리는 루프 (JIT 백엔드에서 사용, ema_rows는 스팬별 연속 배열)
+    n = len(price)
+    pos_out = np.zeros(n)
+    lev_out = np.zeros(n)
+    scores = np.empty(len(ma_idx))
+    for c in range(len(ma_idx)):
+        scores[c] = _simulate(kind, price, ema_rows[ma_idx[c]], rsi, m1, m2, ret_lev, ret_spot, ret_cash,
+                              rsi_limits[c], p3s[c], pos_out, lev_out, stats[c], mdd_limit, min_final, bound)
+    return scores
+
+# ==========================================
+# 4. 조합 일괄 시뮬레이션 (상태 벡터)
+# ==========================================
+def _step_batch(kind, pos, lev, price, ma_val, rsi_val, m1, m2, rsi_limit, p3):
+    # _step()과 같은 규칙을 조합 벡터 전체에 마스크로 적용
+    if kind == VIX:
+        sell = (price < ma_val) | (m1 > m2 * 1.2) | (m1 > p3)
+    else:
+        sell = price < ma_val * (1 - p3)
+    up = ~sell & (price > ma_val)
+
+    if kind == SWITCH:
+        ramp = np.where(pos == 0.0, 0.3, np.where(pos <= 0.3, 0.7, 1.0))
+        new_pos = np.where(sell, 0.0, np.where(up, ramp, pos))
+        if m1 < 0:
+            return np.where(sell, 0.0, np.minimum(new_pos, 0.3)), np.zeros_like(pos)
+        return new_pos, (up & (rsi_val < rsi_limit)).astype(np.float64)
+
+    if kind == BTC:
+        new_pos = np.where(sell, 0.0, np.where(up, 1.0, pos))
+        new_lev = np.where(sell, 0.0, np.where(up, np.where(rsi_val > rsi_limit, 0.0, 1.0), lev))
+        return new_pos, new_lev
+
+    if kind == TQQQ and m1 != 0:
+        return np.zeros_like(pos), lev
+
+    if kind == PLTR:
+        max_alloc = 0.5 if m1 < -0.5 else 1.0
+        ramp = np.where(pos == 0.0, min(0.3, max_alloc),
+               np.where(pos <= 0.3, min(0.7, max_alloc),
+               np.where(pos <= 0.7, np.where(rsi_val < rsi_limit, min(1.0, max_alloc), min(0.7, max_alloc)),
+               np.where(rsi_val > rsi_limit, 0.7, pos))))
+        return np.where(sell, 0.0, np.where(up, ramp, pos)), lev
+
+    full = rsi_val < rsi_limit
+    if kind == VIX:
+        full = full & (m1 < 20)
+        up = ~sell
+    ramp = np.where(pos == 0.0, 0.3,
+           np.where(pos == 0.3, 0.7,
+           np.where(pos == 0.7, np.where(full, 1.0, 0.7),
+           np.where(pos == 1.0, np.where(rsi_val > rsi_limit, 0.7, 1.0), pos))))
+    return np.where(sell, 0.0, np.where(up, ramp, pos)), lev
+
+def simulate_batch(kind, arrays, ema, ma_idx, rsi_limits, p3s, pos_out=None, stats_out=None):
+    """
+    여러 (ma, rsi, p3) 조합을 상태 벡터로 묶어 한 번의 시간축 루프로 시뮬레이션합니다.
+    파이썬 루프는 n_bars 번만 돌고, 조합 방향은 전부 NumPy 연산입니다.
+
+    params:
+      - ema: (n_bars x n_spans) EMA 매트릭스 (indicators.ema_matrix)
+      - ma_idx: 조합별 EMA 매트릭스 열 번호
+      - rsi_limits, p3s: 조합별 RSI 기준 / 세 번째 파라미터
+      - pos_out: (n_combos x n_bars) 배열을 넘기면 날짜별 비중을 기록
+      - stats_out: (n_combos x len(STATS)) 배열을 넘기면 리스크 지표용 누적값을 기록
+    returns:
+      - 조합별 누적 수익(배수) 배열 (_simulate 결과와 동일)
+    """
+    code = KINDS[kind]
+    ma_idx = np.asarray(ma_idx, dtype=np.intp)
+    rsi_limits = np.asarray(rsi_limits, dtype=np.float64)
+    p3s = np.asarray(p3s, dtype=np.float64)
+
+    n_combos = len(ma_idx)
+    pos = np.zeros(n_combos)
+    lev = np.zeros(n_combos) if code in (SWITCH, BTC) else np.ones(n_combos)
+    equity = np.ones(n_combos)
+
+    price, rsi = arrays['price'], arrays['rsi']
+    m1, m2 = arrays['macro'], arrays['macro2']
+    ret_lev, ret_spot, ret_cash = arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash']
+
+    if stats_out is not None:
+        stats_out[:] = 0.0
+        peak = np.zeros(n_combos)
+
+    for i in range(len(price)):
+        r = ret_lev[i] * pos * lev + ret_spot[i] * pos * (1 - lev) + ret_cash[i] * (1 - pos)
+        equity *= 1 + r
+        if stats_out is not None:
+            np.maximum(peak, equity, out=peak)
+            np.minimum(stats_out[:, 0], (equity - peak) / peak, out=stats_out[:, 0])
+            stats_out[:, 1] += r
+            stats_out[:, 2] += r * r
+            stats_out[:, 3] += pos
+            stats_out[:, 4] += 1
+        if i > 0:
+            pos, lev = _step_batch(code, pos, lev, price[i], ema[i, ma_idx], rsi[i], m1[i], m2[i], rsi_limits, p3s)
+        if pos_out is not None:
+            pos_out[:, i] = pos
+
+    return equity
+
+def simulate_combos(kind, arrays, ema, ma_idx, rsi_limits, p3s):
+    """
+    조합 목록을 평가하는 공용 진입점.
+    JIT 백엔드가 켜져 있으면 컴파일된 조합별 루프를, 아니면 simulate_batch()를 씁니다.
+    스위칭 전략은 rsi_limit 을 분리해서 평가하는 simulate_switch()로 보냅니다.
+    피라미딩/TQQQ/BTC 는 누적 로그 성장률 조회로 점수를 내는 simulate_events()로 보냅니다 (BACKTEST_EVENTS=0 으로 끔).
+    """
+    if kind == 'switch':
+        return simulate_switch(arrays, ema, ma_idx, rsi_limits, p3s)
+    if EVENTS_ENABLED and kind in PREFIX_KINDS:
+        return simulate_events(kind, arrays, ema, ma_idx, rsi_limits, p3s)
+    if not JIT_ENABLED:
+        return simulate_batch(kind, arrays, ema, ma_idx, rsi_limits, p3s)
+
+    # 열 단위 접근이 연속 메모리가 되도록 (n_spans x n_bars)로 전치
+    ema_rows = np.ascontiguousarray(np.asarray(ema, dtype=np.float64).T)
+    return _simulate_many(
+        KINDS[kind], arrays['price'], ema_rows, arrays['rsi'], arrays['macro'], arrays['macro2'],
+        arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash'],
+        np.asarray(ma_idx, dtype=np.intp), np.asarray(rsi_limits, dtype=np.float64), np.asarray(p3s, dtype=np.float64),
+        np.zeros((len(ma_idx), len(STATS))), -np.inf, -np.inf, np.ones(len(arrays['price']) + 1),
+    )
+
+# ==========================================
+# 5. 스위칭 전략 분해 평가 (rsi_limit 은 레버리지 여부만 결정)
+# ==========================================
+def _positions_many(kind, price, ema_rows, rsi, m1, m2, ret_lev, ret_spot, ret_cash, ma_idx, rsi_limits, p3s, pos_rows):
+    # 조합별 비중 경로를 pos_rows 에 기록 (JIT 백엔드에서 사용)
+    lev_out = np.zeros(len(price))
+    stats_out = np.zeros(len(STATS))
+    bound = np.ones(len(price) + 1)
+    for c in range(len(ma_idx)):
+        _simulate(kind, price, ema_rows[ma_idx[c]], rsi, m1, m2, ret_lev, ret_spot, ret_cash,
+                  rsi_limits[c], p3s[c], pos_rows[c], lev_out, stats_out, -np.inf, -np.inf, bound)
+
+def simulate_positions(kind, arrays, ema, ma_idx, rsi_limits, p3s):
+    """
+    조합별 날짜별 비중 경로를 (n_combos x n_bars) 배열로 돌려줍니다.
+    simulate_combos() 와 같은 백엔드(JIT 또는 상태 벡터)를 씁니다.
+    """
+    n = len(arrays['price'])
+    pos_rows = np.zeros((len(ma_idx), n))
+    if not JIT_ENABLED:
+        simulate_batch(kind, arrays, ema, ma_idx, rsi_limits, p3s, pos_out=pos_rows)
+        return pos_rows
+
+    ema_rows = np.ascontiguousarray(np.asarray(ema, dtype=np.float64).T)
+    _positions_many(
+        KINDS[kind], arrays['price'], ema_rows, arrays['rsi'], arrays['macro'], arrays['macro2'],
+        arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash'],
+        np.asarray(ma_idx, dtype=np.intp), np.asarray(rsi_limits, dtype=np.float64), np.asarray(p3s, dtype=np.float64),
+        pos_rows,
+    )
+    return pos_rows
+
+def _switch_overlay(grow_lev, grow_spot, up, rsi, rsi_limits, out):
+    # 같은 비중 경로에 rsi_limit 별 레버리지만 입혀서 누적 (JIT 백엔드에서 사용)
+    for c in range(len(rsi_limits)):
+        equity = 1.0
+        lev = False
+        for i in range(len(grow_lev)):
+            equity *= grow_lev[i] if lev else grow_spot[i]
+            lev = up[i] and rsi[i] < rsi_limits[c]
+        out[c] = equity
+
+def simulate_switch(arrays, ema, ma_idx, rsi_limits, p3s):
+    """
+    스위칭 전략(nvda 계열)은 비중(current_pos) 경로가 (ma, sell_buffer)와 금리차로만 정해지고,
+    rsi_limit 은 그날 2배/1배 여부만 바꿉니다.
+    그래서 (ma, sell_buffer) 쌍마다 상태 머신을 한 번만 돌리고,
+    RSI 기준값들은 레버리지 마스크만 바꿔 끼워 벡터 연산으로 한꺼번에 평가합니다.
+    결과는 simulate_combos('switch', ...) 와 비트 단위로 같습니다.
+    """
+    ma_idx = np.asarray(ma_idx, dtype=np.intp)
+    rsi_limits = np.asarray(rsi_limits, dtype=np.float64)
+    p3s = np.asarray(p3s, dtype=np.float64)
+
+    # 1) (ma, sell_buffer) 쌍별 비중 경로: rsi_limit = -inf 로 돌려도 비중은 같음
+    pair_ma, pair_p3, pair_of = _group_pairs(ma_idx, p3s)
+    pos_rows = simulate_positions('switch', arrays, ema, pair_ma, np.full(len(pair_ma), -np.inf), pair_p3)
+
+    price, rsi, m1 = arrays['price'], arrays['rsi'], arrays['macro']
+    ret_lev, ret_spot, ret_cash = arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash']
+
+    scores = np.empty(len(ma_idx))
+    for j in range(len(pair_ma)):
+        ma = ema[:, pair_ma[j]]
+        # 2배 모드 후보일: 매도선 위 + 가격 > EMA + 금리차 역전 아님 (첫날은 상태 전이 없음)
+        up = ~(price < ma * (1 - pair_p3[j])) & (price > ma) & ~(m1 < 0)
+        up[0] = False
+
+        # 어제 비중/레버리지로 오늘 수익률 계산 (2배일 때 / 1배일 때 두 경우)
+        pos = np.concatenate(([0.0], pos_rows[j, :-1]))
+        grow_lev = 1 + (ret_lev * pos * 1.0 + ret_spot * pos * (1 - 1.0) + ret_cash * (1 - pos))
+        grow_spot = 1 + (ret_lev * pos * 0.0 + ret_spot * pos * (1 - 0.0) + ret_cash * (1 - pos))
+
+        members = np.flatnonzero(pair_of == j)
+        if JIT_ENABLED:
+            out = np.empty(len(members))
+            _switch_overlay(grow_lev, grow_spot, up, rsi, rsi_limits[members], out)
+            scores[members] = out
+        else:
+            lev = np.zeros((len(price), len(members)), dtype=bool)
+            lev[1:] = up[:-1, None] & (rsi[:-1, None] < rsi_limits[members][None, :])
+            # 커널과 같은 순서(첫날부터 날짜순)로 곱해야 결과가 비트 단위로 같음
+            scores[members] = np.multiply.reduce(np.where(lev, grow_lev[:, None], grow_spot[:, None]), axis=0)
+    return scores
+
+# ==========================================
+# 6. 이벤트 기반 비중 경로 (피라미딩 / TQQQ / BTC)
+# ==========================================
+# 이 전략들은 매도선 이탈, EMA 위 램프(0.3 -> 0.7), RSI 기준 통과 날에만 상태가 정해지고
+# 나머지 날은 전날 상태를 그대로 이어받습니다. 그래서 날짜별 상태 머신 없이
+# "결정일(이벤트)의 상태 코드 + forward-fill" 로 전체 경로를 한 번에 만들 수 있습니다.
+EVENTS_ENABLED = os.environ.get('BACKTEST_EVENTS', '1') != '0'
+
+# 상태 코드 -> (비중, 레버리지)
+PYRAMID_STATES = ((0.0, 1.0), (0.3, 1.0), (0.7, 1.0), (1.0, 1.0))
+BTC_STATES = ((0.0, 0.0), (1.0, 0.0), (1.0, 1.0))   # 현금 / 현물 / 레버리지
+
+def _group_pairs(ma_idx, p3s):
+    # 조합을 (ma, p3) 쌍으로 묶음: (쌍별 ma 열 번호, 쌍별 p3, 조합별 쌍 번호)
+    pairs, pair_of = np.unique(np.stack([ma_idx, p3s], axis=1), axis=0, return_inverse=True)
+    return pairs[:, 0].astype(np.intp), pairs[:, 1], pair_of.ravel()
+
+def _crossings(code, price, ma, m1, m2, p3):
+    # 매도일 / 매수(EMA 위)일 마스크 - rsi_limit 과 무관 (첫날은 상태 전이 없음)
+    sell = price < ma * (1 - p3)
+    if code == TQQQ:
+        sell = sell | (m1 != 0)
+    up = ~sell & (price > ma)
+    sell[0] = False
+    up[0] = False
+    return sell, up
+
+def event_codes(kind, arrays, ma, p3, rsi_limits):
+    """
+    (ma, p3) 하나에 대해 여러 rsi_limit 의 날짜별 상태 코드를 (n_bars x n_rsi) 로 계산합니다.
+    결정일은 event_segments() 로 한 번만 뽑고, rsi_limit 별 코드는 결정일에서만 정한 뒤
+    다음 결정일 전날까지 그대로 채웁니다 (forward-fill).
+    코드의 의미는 PYRAMID_STATES / BTC_STATES 를 참고하세요.
+
+    params:
+      - ma: EMA 배열, p3: sell_buffer
+    """
+    starts, state, level = event_segments(kind, arrays, ma, p3)
+    limits = np.asarray(rsi_limits, dtype=np.float64)[None, :]
+    codes = np.repeat(state[:, None], limits.shape[1], axis=1)
+
+    open_ = state < 0
+    opened = level[open_][:, None]
+    if KINDS[kind] == BTC:
+        # 매수일 -> RSI 과열이면 현물 아니면 레버리지
+        codes[open_] = np.where(opened > limits, 1, 2)
+    else:
+        # 3번째 이후 매수일은 RSI 가 기준 아래(1.0) / 위(0.7)일 때만 결정, 같으면(NaN 포함) 직전 결정일 상태 유지
+        codes[open_] = np.where(opened < limits, 3, np.where(opened > limits, 2, -1))
+        last = np.where(codes >= 0, np.arange(len(starts))[:, None], 0)
+        np.maximum.accumulate(last, axis=0, out=last)
+        codes = np.take_along_axis(codes, last, axis=0)
+
+    return np.repeat(codes, np.diff(np.append(starts, len(arrays['price']))), axis=0)
+
+def _growth_table(arrays, states):
+    # table[c, i] = 어제 상태가 코드 c 일 때 오늘(i)의 1 + 수익률 (커널과 같은 식)
+    # 첫날 상태 전이 전에는 레버리지 0 이므로 i <= 1 은 lev = 0 으로 계산
+    ret_lev, ret_spot, ret_cash = arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash']
+    table = np.empty((len(states), len(ret_lev)))
+    for c, (pos, lev) in enumerate(states):
+        lev = np.full(len(ret_lev), lev)
+        lev[:2] = 0.0
+        table[c] = 1 + (ret_lev * pos * lev + ret_spot * pos * (1 - lev) + ret_cash * (1 - pos))
+    return table
+
+def _exact_scores(kind, arrays, ma, p3, rsi_limits, table):
+    # 상태 코드 경로로 날짜별 성장률을 골라 첫날부터 순서대로 곱함 (커널과 비트 단위로 같음)
+    codes = event_codes(kind, arrays, ma, p3, rsi_limits)
+    days = np.arange(1, table.shape[1])[:, None]
+    return np.multiply.reduce(table[codes[:-1], days], axis=0, initial=table[0, 0])
+
+# ==========================================
+# 7. 누적 로그 수익률 기반 점수 (구간 합 조회)
+# ==========================================
+# 상태 코드별 하루 성장률의 로그를 데이터당 한 번 누적해 두면(cum_log), 결정일 하나가 연 구간의
+# 수익 배수는 구간 양 끝 누적값의 차이로 바로 나옵니다 (구간 하나당 O(1), 날짜 수와 무관).
+# 피라미딩/BTC 는 RSI 구간(3번째 매수일 이후, BTC 는 매수일 이후)의 상태가 "구간을 연 날의 RSI 가
+# 기준보다 아래인가" 하나로만 갈리므로, 구간들을 그 RSI 로 칸에 나눠 누적해 두면 rsi_limit 하나당
+# 조회 한 번으로 점수가 정해집니다.
+PREFIX_KINDS = ('pyramid', 'tqqq', 'btc')
+# 최고점 근처(상대 오차 이내) 조합은 곱셈 순서까지 같은 방식으로 다시 계산해 동점 처리를 커널과 맞춤
+EXACT_TOL = 1e-9
+
+def cum_log_table(table):
+    """
+    상태 코드별 누적 로그 성장률 (데이터당 한 번).
+    cum[c, i] = log(table[c, 0]) + ... + log(table[c, i]) - 상태 c 가 a 일에 정해져 b 일까지 이어지면
+    a+1 ~ b 일의 수익 배수는 exp(cum[c, b] - cum[c, a]).
+    긴 기간의 누적 반올림 오차를 줄이려고 확장 정밀도로 더합니다.
+    """
+    return np.cumsum(np.log(table), axis=1, dtype=np.longdouble)
+
+def event_segments(kind, arrays, ma, p3):
+    """
+    rsi_limit 과 무관한 결정일(이벤트) 목록을 계산합니다. 첫날(코드 0)은 항상 포함합니다.
+    교차 마스크에서 np.flatnonzero 로 결정일만 뽑고, 매수 횟수 / 상태는 결정일끼리만 계산합니다.
+
+    returns:
+      - starts: 결정일 인덱스 (오름차순), 다음 결정일 전날까지 그 상태가 이어짐
+      - state: 결정일의 고정 상태 코드 (0/1/2), RSI 에 따라 갈리는 결정일은 -1
+      - level: 결정일의 RSI
+    """
+    code = KINDS[kind]
+    price, rsi = arrays['price'], arrays['rsi']
+
+    sell, up = _crossings(code, price, ma, arrays['macro'], arrays['macro2'], p3)
+    starts = np.concatenate(([0], np.flatnonzero(sell | up)))
+    is_up = up[starts]
+    if code == BTC:
+        state = np.where(is_up, -1, 0)
+    else:
+        # 마지막 매도 이후 몇 번째 매수일인지 (1번째 0.3, 2번째 0.7, 3번째부터 RSI 로 0.7 / 1.0)
+        ups = np.cumsum(is_up)
+        since = np.where(sell[starts], ups, 0)
+        np.maximum.accumulate(since, out=since)
+        k = ups - since
+        state = np.where(is_up, np.where(k <= 2, k, -1), 0)
+    state[0] = 0
+    return starts, state, rsi[starts]
+
+def _prefix_scores(kind, cum_log, starts, state, level, rsi_limits):
+    """
+    event_segments() 의 결정일 구간과 cum_log_table() 로 rsi_limit 별 점수를 계산합니다.
+    구간 하나당 누적값 조회 두 번이므로 비용은 결정일 수에 비례합니다 (날짜 수와 무관).
+    returns: (점수 배열, 구간을 연 날의 RSI 가 기준과 정확히 같은 조합 마스크)
+    """
+    # 결정일 a 의 상태가 a+1 ~ b 일(다음 결정일 또는 마지막 날) 성장률을 결정, 길이 0 인 구간은 제외
+    ends = np.append(starts[1:], cum_log.shape[1] - 1)
+    keep = ends > starts
+    starts, ends, state, level = starts[keep], ends[keep], state[keep], level[keep]
+    open_ = state < 0
+
+    def span(code, a, b):
+        return cum_log[code, b] - cum_log[code, a]
+
+    fixed = cum_log[0, 0] + span(state[~open_], starts[~open_], ends[~open_]).sum()
+    if kind == 'btc':
+        # RSI <= 기준 -> 레버리지(2), RSI > 기준 -> 현물(1)
+        below, above, side = 2, 1, 'left'
+    else:
+        # RSI < 기준 -> 100%(3), RSI > 기준 -> 70%(2)
+        below, above, side = 3, 2, 'right'
+    base = span(above, starts[open_], ends[open_])
+    delta = span(below, starts[open_], ends[open_]) - base
+
+    # 구간을 RSI 기준값 사이 칸으로 나눠 칸별 합을 구한 뒤 누적: gain[k] = 기준값 limits[k] 의 추가 수익
+    limits, index = np.unique(rsi_limits, return_inverse=True)
+    opened = level[open_]
+    bucket = np.searchsorted(limits, opened, side=side)
+    gain = np.zeros(len(limits) + 1, dtype=np.longdouble)
+    np.add.at(gain, bucket, delta)
+    gain = np.cumsum(gain)
+
+    hit = np.searchsorted(limits, opened, side='left')
+    hit = hit[(hit < len(limits)) & (limits[np.minimum(hit, len(limits) - 1)] == opened)]
+    tie = np.zeros(len(limits), dtype=bool)
+    tie[hit] = True
+    return np.exp(fixed + base.sum() + gain[index.ravel()]).astype(np.float64), tie[index.ravel()]
+
+def simulate_events(kind, arrays, ema, ma_idx, rsi_limits, p3s):
+    """
+    PREFIX_KINDS 전략의 조합 목록을 평가합니다. (ma, p3) 쌍마다 교차일을 한 번만 구합니다.
+
+    event_segments() 의 결정일 구간마다 누적 로그 성장률(cum_log_table, 데이터당 한 번)을 두 번 조회해서
+    (ma, p3) 쌍당 결정일 수에 비례하는 비용으로 모든 rsi_limit 의 점수를 내고,
+    최고점 근처 조합과 RSI 가 기준값과 정확히 같은 날이 있는 조합만 _exact_scores() 로 다시 계산합니다.
+    성장률이 0 이하인 날이 있는 데이터는 로그를 쓸 수 없으므로 전부 _exact_scores() 로 평가합니다.
+    """
+    if kind not in PREFIX_KINDS:
+        raise ValueError(f"simulate_events 는 {PREFIX_KINDS} 만 지원합니다: {kind}")
+    ma_idx = np.asarray(ma_idx, dtype=np.intp)
+    rsi_limits = np.asarray(rsi_limits, dtype=np.float64)
+    pair_ma, pair_p3, pair_of = _group_pairs(ma_idx, np.asarray(p3s, dtype=np.float64))
+
+    table = _growth_table(arrays, BTC_STATES if kind == 'btc' else PYRAMID_STATES)
+    use_prefix = (table > 0).all()
+    if use_prefix:
+        cum_log = cum_log_table(table)
+
+    scores = np.empty(len(ma_idx))
+    for j in range(len(pair_ma)):
+        members = np.flatnonzero(pair_of == j)
+        ma, limits = ema[:, pair_ma[j]], rsi_limits[members]
+        if not use_prefix:
+            scores[members] = _exact_scores(kind, arrays, ma, pair_p3[j], limits, table)
+            continue
+
+        starts, state, level = event_segments(kind, arrays, ma, pair_p3[j])
+        scores[members], tie = _prefix_scores(kind, cum_log, starts, state, level, limits)
+        if kind != 'btc' and tie.any():
+            # 구간을 연 날의 RSI 가 기준과 같으면 그날은 결정일이 아니므로 정확 계산으로 대체
+            scores[members[tie]] = _exact_scores(kind, arrays, ma, pair_p3[j], limits[tie], table)
+
+    if use_prefix and len(scores):
+        near = np.flatnonzero(scores >= scores.max() * (1 - EXACT_TOL))
+        for j in np.unique(pair_of[near]):
+            members = near[pair_of[near] == j]
+            scores[members] = _exact_scores(kind, arrays, ema[:, pair_ma[j]], pair_p3[j], rsi_limits[members], table)
+    return scores
+
+# ==========================================
+# 8. 조합별 리스크 지표 (CAGR / MDD / 변동성 / 샤프)
+# ==========================================
+def summarize_stats(scores, stats, n_bars, years=None):
+    """
+    시뮬레이션 루프가 누적한 STATS 로 METRICS 매트릭스 (n_combos x len(METRICS)) 를 만듭니다.
+    변동성/샤프는 일간 수익률 표본 표준편차(ddof=1)를 연율화한 값이고, 무위험 수익률은 0 으로 둡니다.
+
+    params:
+      - years: 분석 기간(년), analyze_today 와 같게 (마지막 날 - 첫날).days / 365.25
+               None 이면 1년 = 252 거래일로 계산
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    stats = np.asarray(stats, dtype=np.float64)
+    if years is None:
+        years = n_bars / 252
+    per_year = n_bars / years
+
+    mean = stats[:, 1] / n_bars
+    var = np.maximum(stats[:, 2] - stats[:, 1] * mean, 0.0) / max(n_bars - 1, 1)
+    std = np.sqrt(var)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(per_year), 0.0)
+        cagr = scores ** (1 / years) - 1
+
+    return np.column_stack([
+        scores, cagr, stats[:, 0], std * np.sqrt(per_year), sharpe, stats[:, 3] / n_bars,
+    ])
+
+def simulate_metrics(kind, arrays, ema, ma_idx, rsi_limits, p3s, years=None):
+    """
+    simulate_combos() 와 같은 조합 목록을 평가하되, 점수 대신 METRICS 매트릭스를 돌려줍니다.
+    MDD/변동성/노출도는 같은 시뮬레이션 루프에서 누적하므로 데이터를 다시 훑지 않습니다.
+    'score' 열은 simulate_combos() 결과와 같습니다.
+    """
+    ma_idx = np.asarray(ma_idx, dtype=np.intp)
+    rsi_limits = np.asarray(rsi_limits, dtype=np.float64)
+    p3s = np.asarray(p3s, dtype=np.float64)
+    stats = np.zeros((len(ma_idx), len(STATS)))
+
+    if JIT_ENABLED:
+        ema_rows = np.ascontiguousarray(np.asarray(ema, dtype=np.float64).T)
+        scores = _simulate_many(
+            KINDS[kind], arrays['price'], ema_rows, arrays['rsi'], arrays['macro'], arrays['macro2'],
+            arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash'], ma_idx, rsi_limits, p3s, stats,
+            -np.inf, -np.inf, np.ones(len(arrays['price']) + 1),
+        )
+    else:
+        scores = simulate_batch(kind, arrays, ema, ma_idx, rsi_limits, p3s, stats_out=stats)
+    return summarize_stats(scores, stats, len(arrays['price']), years)
+
+# ==========================================
+# 9. 제약 조건 조기 중단 (최대 낙폭 / 최소 CAGR)
+# ==========================================
+def span_years(df):
+    # analyze_today 와 같은 분석 기간(년)
+    return (df.index[-1] - df.index[0]).days / 365.25
+
+def growth_bound(arrays):
+    """
+    bound[i] = i 일부터 마지막 날까지 어떤 비중으로도 넘을 수 없는 누적 성장 배수 (bound[n] = 1).
+    하루 수익률은 세 자산 수익률의 볼록 결합이므로 그날 가장 좋은 자산의 성장률이 상한입니다.
+    """
+    best = np.maximum(np.maximum(arrays['ret_lev'], arrays['ret_spot']), arrays['ret_cash']) + 1
+    bound = np.ones(len(best) + 1)
+    bound[:-1] = np.cumprod(best[::-1])[::-1]
+    # 누적곱 반올림 때문에 상한이 실제보다 작아져 잘못 중단되지 않도록 약간 여유를 둠 (마지막 날은 정확히 1)
+    bound[:-1] *= 1 + 1e-9
+    return bound
+
+def _constraint_limits(max_drawdown, min_cagr, years, n_bars):
+    # (MDD 하한, 최종 배수 하한) - 조건이 없으면 -inf
+    mdd_limit = -abs(max_drawdown) if max_drawdown is not None else -np.inf
+    if min_cagr is None:
+        return mdd_limit, -np.inf
+    if years is None:
+        years = n_bars / 252
+    return mdd_limit, (1 + min_cagr) ** years
+
+def simulate_pruned(kind, arrays, ema, ma_idx, rsi_limits, p3s, max_drawdown=None, min_cagr=None, years=None):
+    """
+    제약 조건을 어긴 것이 확실해지는 순간 그 조합의 시뮬레이션을 멈춥니다.
+
+    params:
+      - max_drawdown: 허용 최대 낙폭 (예: -0.6 또는 0.6 -> MDD 가 -60% 보다 나빠지면 중단)
+      - min_cagr: 최소 연평균 수익률 (예: 0.15). 지금까지의 배수 x 남은 기간 최대 성장(growth_bound)이
+                  목표 배수에 못 미치면 중단
+      - years: 분석 기간(년), span_years(df) 권장 (None 이면 1년 = 252 거래일)
+    returns:
+      - scores: 조건을 만족한 조합은 누적 수익(배수, simulate_combos 와 동일), 중단된 조합은 NaN
+      - pruned_at: 중단된 조합은 시뮬레이션한 날 수, 끝까지 간 조합은 -1
+    """
+    ma_idx = np.asarray(ma_idx, dtype=np.intp)
+    rsi_limits = np.asarray(rsi_limits, dtype=np.float64)
+    p3s = np.asarray(p3s, dtype=np.float64)
+    n = len(arrays['price'])
+    mdd_limit, min_final = _constraint_limits(max_drawdown, min_cagr, years, n)
+    bound = growth_bound(arrays) if min_final > -np.inf else np.ones(n + 1)
+
+    if JIT_ENABLED:
+        stats = np.zeros((len(ma_idx), len(STATS)))
+        ema_rows = np.ascontiguousarray(np.asarray(ema, dtype=np.float64).T)
+        scores = _simulate_many(
+            KINDS[kind], arrays['price'], ema_rows, arrays['rsi'], arrays['macro'], arrays['macro2'],
+            arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash'], ma_idx, rsi_limits, p3s, stats,
+            mdd_limit, min_final, bound,
+        )
+        pruned_at = np.where(np.isnan(scores), stats[:, 4], -1).astype(np.intp)
+        return scores, pruned_at
+
+    # 상태 벡터 방식: 중단된 조합은 상태 벡터에서 빼서 이후 날짜의 연산량을 줄임
+    code = KINDS[kind]
+    scores = np.full(len(ma_idx), np.nan)
+    pruned_at = np.full(len(ma_idx), -1, dtype=np.intp)
+    alive = np.arange(len(ma_idx))
+    pos = np.zeros(len(alive))
+    lev = np.zeros(len(alive)) if code in (SWITCH, BTC) else np.ones(len(alive))
+    equity = np.ones(len(alive))
+    peak = np.zeros(len(alive))
+    mdd = np.zeros(len(alive))
+
+    price, rsi = arrays['price'], arrays['rsi']
+    m1, m2 = arrays['macro'], arrays['macro2']
+    ret_lev, ret_spot, ret_cash = arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash']
+
+    for i in range(n):
+        equity *= 1 + (ret_lev[i] * pos * lev + ret_spot[i] * pos * (1 - lev) + ret_cash[i] * (1 - pos))
+        np.maximum(peak, equity, out=peak)
+        np.minimum(mdd, (equity - peak) / peak, out=mdd)
+
+        stop = (mdd < mdd_limit) | (equity * bound[i + 1] < min_final)
+        if stop.any():
+            pruned_at[alive[stop]] = i + 1
+            keep = ~stop
+            alive, pos, lev, equity, peak, mdd = alive[keep], pos[keep], lev[keep], equity[keep], peak[keep], mdd[keep]
+            if len(alive) == 0:
+                break
+
+        if i > 0:
+            pos, lev = _step_batch(code, pos, lev, price[i], ema[i, ma_idx[alive]], rsi[i], m1[i], m2[i],
+                                   rsi_limits[alive], p3s[alive])
+
+    scores[alive] = equity
+    return scores, pruned_at
+
+# ==========================================
+# 10. 조합 상태 이어 가기 (새 봉만 추가 시뮬레이션)
+# ==========================================
+# 조합별 끝 상태: COMBO_STATE 순서의 (n_combos x 4) 배열 + STATS 누적값 (n_combos x len(STATS))
+# 전체 기간을 한 번 돌려 둔 끝 상태에서 새 봉만 이어 돌리면 처음부터 다시 돌린 것과 같은 값이 나옵니다.
+COMBO_STATE = ('pos', 'lev', 'equity', 'peak')
+
+def _advance(kind, price, ma, rsi, m1, m2, ret_lev, ret_spot, ret_cash, rsi_limit, p3, state, stats, first):
+    # _simulate() 와 같은 루프를 저장된 상태에서 시작 (state / stats 는 제자리 갱신)
+    # first=True 면 처음부터 (첫 봉은 상태 전이 없음), False 면 이어서 (모든 봉에서 상태 전이)
+    pos, lev, equity, peak = state[0], state[1], state[2], state[3]
+    mdd, total, total_sq, exposure, bars = stats[0], stats[1], stats[2], stats[3], stats[4]
+
+    for i in range(len(price)):
+        r = ret_lev[i] * pos * lev + ret_spot[i] * pos * (1 - lev) + ret_cash[i] * (1 - pos)
+        equity *= 1 + r
+
+        total += r
+        total_sq += r * r
+        exposure += pos
+        if equity > peak:
+            peak = equity
+        elif (equity - peak) / peak < mdd:
+            mdd = (equity - peak) / peak
+        bars += 1
+
+        if i > 0 or not first:
+            pos, lev = _step(kind, pos, lev, price[i], ma[i], rsi[i], m1[i], m2[i], rsi_limit, p3)
+
+    state[0], state[1], state[2], state[3] = pos, lev, equity, peak
+    stats[0], stats[1], stats[2], stats[3], stats[4] = mdd, total, total_sq, exposure, bars
+
+def _advance_many(kind, price, ema_rows, rsi, m1, m2, ret_lev, ret_spot, ret_cash, ma_idx, rsi_limits, p3s,
+                  states, stats, first):
+    for c in range(len(ma_idx)):
+        _advance(kind, price, ema_rows[ma_idx[c]], rsi, m1, m2, ret_lev, ret_spot, ret_cash,
+                 rsi_limits[c], p3s[c], states[c], stats[c], first)
+
+def advance_combos(kind, arrays, ema, ma_idx, rsi_limits, p3s, states=None, stats=None):
+    """
+    조합 목록을 저장된 끝 상태에서 arrays 의 봉만큼 이어서 시뮬레이션합니다.
+
+    params:
+      - arrays / ema: 이어 붙일 봉만 담은 배열 (ema 는 ema_matrix(..., init=직전 EMA) 로 이어서 계산)
+      - states / stats: 직전 끝 상태 (COMBO_STATE / STATS 순서), None 이면 처음부터 (첫 봉 = 전체 기간의 첫 봉)
+    returns:
+      - (states, stats) 갱신된 끝 상태. 누적 수익(배수)은 states[:, 2]
+    """
+    n_combos = len(ma_idx)
+    first = states is None
+    if first:
+        states = np.zeros((n_combos, len(COMBO_STATE)))
+        states[:, 1] = 0.0 if KINDS[kind] in (SWITCH, BTC) else 1.0
+        states[:, 2] = 1.0
+        stats = np.zeros((n_combos, len(STATS)))
+    ma_idx = np.asarray(ma_idx, dtype=np.intp)
+    rsi_limits = np.asarray(rsi_limits, dtype=np.float64)
+    p3s = np.asarray(p3s, dtype=np.float64)
+
+    if JIT_ENABLED:
+        _advance_many(
+            KINDS[kind], arrays['price'], np.ascontiguousarray(np.asarray(ema, dtype=np.float64).T),
+            arrays['rsi'], arrays['macro'], arrays['macro2'], arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash'],
+            ma_idx, rsi_limits, p3s, states, stats, first,
+        )
+        return states, stats
+
+    # 순수 NumPy: simulate_batch() 와 같은 상태 벡터 루프
+    code = KINDS[kind]
+    pos, lev, equity, peak = (states[:, j].copy() for j in range(len(COMBO_STATE)))
+    price, rsi = arrays['price'], arrays['rsi']
+    m1, m2 = arrays['macro'], arrays['macro2']
+    ret_lev, ret_spot, ret_cash = arrays['ret_lev'], arrays['ret_spot'], arrays['ret_cash']
+    for i in range(len(price)):
+        r = ret_lev[i] * pos * lev + ret_spot[i] * pos * (1 - lev) + ret_cash[i] * (1 - pos)
+        equity *= 1 + r
+        np.maximum(peak, equity, out=peak)
+        np.minimum(stats[:, 0], (equity - peak) / peak, out=stats[:, 0])
+        stats[:, 1] += r
+        stats[:, 2] += r * r
+        stats[:, 3] += pos
+        stats[:, 4] += 1
+        if i > 0 or not first:
+            pos, lev = _step_batch(code, pos, lev, price[i], ema[i, ma_idx], rsi[i], m1[i], m2[i], rsi_limits, p3s)
+    states[:] = np.column_stack([pos, lev, equity, peak])
+    return states, stats
+
+# ==========================================
+# 11. JIT 백엔드 (선택)
+# ==========================================
+# BACKTEST_JIT=0 으로 끌 수 있습니다. 같은 함수를 컴파일만 하므로 결과는 순수 파이썬 경로와 동일합니다.
+JIT_ENABLED = njit is not None and os.environ.get('BACKTEST_JIT', '1') != '0'
+
+if JIT_ENABLED:
+    _step = njit(cache=True)(_step)
+    _simulate = njit(cache=True)(_simulate)
+    _simulate_many = njit(cache=True)(_simulate_many)
+    _advance = njit(cache=True)(_advance)
+    _advance_many = njit(cache=True)(_advance_many)
+    _positions_many = njit(cache=True)(_positions_many)
+    _switch_overlay = njit(cache=True)(_switch_overlay)
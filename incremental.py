@@ -0,0 +1,208 @@
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine import KINDS, _step
+
+# ==========================================
+# 0. 설정
+# ==========================================
+# 전략 상태 스냅샷 폴더 (기본: 스크립트 폴더의 .strategy_state)
+STATE_DIR = os.environ.get(
+    'STRATEGY_STATE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.strategy_state'),
+)
+# 스크립트와 같은 RSI 기간
+RSI_WINDOW = 14
+# 스냅샷에 남겨 두는 최근 자산 곡선 길이
+TAIL = 20
+# 업데이트 때 마지막 봉보다 이만큼(일) 앞에서부터 데이터를 받음 (스크립트의 RSI / 이동평균 필터가 채워지도록)
+LOOKBACK_DAYS = 60
+
+# ==========================================
+# 1. 스냅샷 만들기 (전체 기간 백테스트 결과에서 1회)
+# ==========================================
+# spec: 스크립트별 상태 정의
+#   - kind: 엔진 전략 종류 (예: 'switch', 'pyramid', 'tqqq')
+#   - price: 신호용 가격 컬럼 (EMA / RSI 기준)
+#   - returns: {'ret_lev' / 'ret_spot' / 'ret_cash': (종가 컬럼, 배수)} - 수익률 = 종가 변동률 x 배수
+#   - macro: 매크로 필터 컬럼 (m1, 스크립트가 데이터 수집 단계에서 만든 필터 컬럼도 가능), 없으면 None
+#   - columns: 다음 봉에서 변동률 계산 / 리포트에 쓰려고 마지막 값을 저장할 컬럼
+#   - third: params 에서 세 번째 파라미터 키 (없으면 'buf')
+# 예: {'kind': 'switch', 'price': 'NVDA', 'macro': 'T10Y2Y', 'columns': ['NVDA', 'SHY', 'T10Y2Y'],
+#      'returns': {'ret_lev': ('NVDA', 2.0), 'ret_spot': ('NVDA', 1.0), 'ret_cash': ('SHY', 1.0)}}
+def build_state(spec, df, params, total_score):
+    """
+    스크립트의 run_*_strategy() 결과 DataFrame 에서 다음 봉을 이어 가는 데 필요한 값만 뽑습니다.
+    (마지막 EMA, RSI 상승/하락 폭 창, 비중/레버리지 상태, 누적 수익/고점/MDD, 최근 자산 곡선)
+
+    params:
+      - df: run_*_strategy() 가 돌려준 DataFrame (Strategy_Pos / Strategy_Ret 컬럼 포함)
+      - params: {'ma': ..., 'rsi': ..., 'buf': ...} (세 번째 파라미터 키는 스크립트마다 다름)
+      - total_score: run_*_strategy() 가 돌려준 누적 수익(배수)
+    """
+    price = df[spec['price']]
+    delta = price.diff().iloc[-RSI_WINDOW:]
+    cum_ret = (1 + df['Strategy_Ret']).cumprod()
+
+    return {
+        'spec': spec,
+        'params': params,
+        'start': df.index[0].strftime('%Y-%m-%d'),
+        'end': df.index[-1].strftime('%Y-%m-%d'),
+        'bars': len(df),
+        'last': {col: float(df[col].iloc[-1]) for col in spec['columns']},
+        'ema': float(price.ewm(span=params['ma'], adjust=False).mean().iloc[-1]),
+        'rsi': float(df['RSI'].iloc[-1]),
+        'gains': [float(v) for v in delta.where(delta > 0, 0)],
+        'losses': [float(v) for v in -delta.where(delta < 0, 0)],
+        'pos': float(df['Strategy_Pos'].iloc[-1]),
+        'lev': float(df['Is_Leveraged'].iloc[-1]) if 'Is_Leveraged' in df else 1.0,
+        'equity': float(total_score),
+        'peak': float(cum_ret.max()),
+        'mdd': float(((cum_ret - cum_ret.cummax()) / cum_ret.cummax()).min()),
+        'tail': [[d.strftime('%Y-%m-%d'), float(v)] for d, v in cum_ret.iloc[-TAIL:].items()],
+    }
+
+# ==========================================
+# 2. 한 봉씩 이어 가기 (전체 기간을 다시 돌리지 않음)
+# ==========================================
+def _ema_step(weighted, value, span):
+    # indicators.ema_matrix 의 결측 없는 경우와 같은 점화식 (pandas ewm adjust=False)
+    alpha = 1.0 / (1.0 + (span - 1.0) / 2.0)
+    old_wt = 1.0 - alpha
+    if weighted == value:
+        return weighted
+    return (old_wt * weighted + alpha * value) / (old_wt + alpha)
+
+def _rsi(gain, loss):
+    # 스크립트의 100 - 100 / (1 + gain / loss) 를 pandas 와 같게: 하락 없으면 inf -> 100, 둘 다 0 이면 NaN
+    if loss > 0:
+        return 100 - (100 / (1 + gain / loss))
+    return 100.0 if gain > 0 else float('nan')
+
+def advance(state, date, bar, macro=None):
+    """
+    스냅샷을 새 봉 1개만큼 진행합니다 (스크립트의 for 루프 1회 + 수익률 1일치).
+
+    params:
+      - date: 새 봉 날짜
+      - bar: {컬럼: 값} - spec['columns'] 의 새 값 (예: {'NVDA': 181.2, 'SHY': 82.9, 'T10Y2Y': 0.52})
+      - macro: 이 봉의 매크로 필터 값, None 이면 bar[spec['macro']] (없으면 0)
+    """
+    spec, params, last = state['spec'], state['params'], state['last']
+    ma, rsi_limit, p3 = params['ma'], params['rsi'], params[spec.get('third', 'buf')]
+
+    # 1. 어제 비중으로 오늘 수익률 (engine 커널과 같은 식)
+    ret = {key: 0.0 for key in ('ret_lev', 'ret_spot', 'ret_cash')}
+    for key, (col, mult) in spec['returns'].items():
+        ret[key] = (bar[col] / last[col] - 1) * mult
+    pos, lev = state['pos'], state['lev']
+    r = ret['ret_lev'] * pos * lev + ret['ret_spot'] * pos * (1 - lev) + ret['ret_cash'] * (1 - pos)
+    state['equity'] *= 1 + r
+    state['peak'] = max(state['peak'], state['equity'])
+    state['mdd'] = min(state['mdd'], (state['equity'] - state['peak']) / state['peak'])
+    day = pd.Timestamp(date).strftime('%Y-%m-%d')
+    state['tail'] = (state['tail'] + [[day, state['equity']]])[-TAIL:]
+
+    # 2. 지표 (EMA, RSI 14)
+    price = bar[spec['price']]
+    delta = price - last[spec['price']]
+    state['gains'] = (state['gains'] + [delta if delta > 0 else 0.0])[-RSI_WINDOW:]
+    state['losses'] = (state['losses'] + [-delta if delta < 0 else 0.0])[-RSI_WINDOW:]
+    state['ema'] = _ema_step(state['ema'], price, ma)
+    state['rsi'] = _rsi(sum(state['gains']) / RSI_WINDOW, sum(state['losses']) / RSI_WINDOW)
+
+    # 3. 상태 전이
+    if macro is None:
+        macro = bar[spec['macro']] if spec.get('macro') else 0.0
+    state['pos'], state['lev'] = _step(KINDS[spec['kind']], pos, lev, price, state['ema'], state['rsi'],
+                                       macro, 0.0, rsi_limit, p3)
+
+    state['last'] = {col: float(bar[col]) for col in spec['columns']}
+    state['end'] = day
+    state['bars'] += 1
+    return state
+
+def advance_frame(state, df):
+    """
+    state['end'] 이후의 행만 골라 차례로 advance() 합니다.
+    returns: 반영한 봉 수
+    """
+    columns = state['spec']['columns']
+    start = df.index.searchsorted(pd.Timestamp(state['end']), side='right')
+    values = df[columns].to_numpy(dtype=np.float64)[start:].tolist()
+    for date, row in zip(df.index[start:], values):
+        advance(state, date, dict(zip(columns, row)))
+    return len(values)
+
+def matches_last(state, df, rtol=1e-6):
+    """
+    새로 받은 데이터의 state['end'] 행이 스냅샷의 마지막 값과 같은지 확인합니다.
+    배당/분할로 수정주가가 다시 계산되면 False (전체 기간을 다시 돌려야 함).
+    """
+    end = pd.Timestamp(state['end'])
+    if end not in df.index:
+        return False
+    row = df.loc[end]
+    return all(np.isclose(row[col], value, rtol=rtol, atol=0.0) for col, value in state['last'].items())
+
+# ==========================================
+# 3. 저장 / 불러오기
+# ==========================================
+def _state_path(name):
+    return os.path.join(STATE_DIR, f"{name}.json")
+
+def save_state(name, state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    # 쓰다가 끊겨도 기존 스냅샷이 깨지지 않도록 임시 파일에 쓴 뒤 교체
+    with tempfile.NamedTemporaryFile('w', dir=STATE_DIR, suffix='.tmp', delete=False, encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(f.name, _state_path(name))
+
+def load_state(name):
+    path = _state_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+# ==========================================
+# 4. 일일 업데이트 공용 흐름
+# ==========================================
+def run_update(name, load_recent, full_run, report):
+    """
+    스냅샷 이후의 새 봉만 반영해서 오늘의 리포트를 냅니다 (그리드 재최적화 없음).
+
+    params:
+      - name: 스냅샷 이름 (보통 스크립트 이름)
+      - load_recent(start): start 날짜부터의 데이터 DataFrame (스크립트의 데이터 수집 함수, spec['columns'] 포함)
+      - full_run(params): 스냅샷이 없거나 데이터가 수정됐을 때 전체 기간을 다시 돌려 새 스냅샷을 만드는 함수
+                          (params 는 기존 스냅샷의 파라미터, 없으면 None)
+      - report(state): 스냅샷으로 오늘의 리포트를 출력하는 함수 (스크립트의 analyze_today)
+    """
+    state = load_state(name)
+    if state is None:
+        print(f"⚠️ {name}: 저장된 상태가 없어 전체 기간을 다시 계산합니다.")
+        return full_run(None)
+
+    df = load_recent((pd.Timestamp(state['end']) - pd.Timedelta(days=LOOKBACK_DAYS)).strftime('%Y-%m-%d'))
+    if not matches_last(state, df):
+        print(f"⚠️ {name}: 과거 데이터가 바뀌어(배당/분할 등) 전체 기간을 다시 계산합니다.")
+        return full_run(state['params'])
+
+    start = time.perf_counter()
+    prev_end = state['end']
+    n_new = advance_frame(state, df)
+    elapsed = time.perf_counter() - start
+    if n_new:
+        save_state(name, state)
+        print(f"🔄 증분 업데이트: 새 봉 {n_new}개 반영 ({prev_end} → {state['end']}, {elapsed * 1e6:.0f}µs)")
+    else:
+        print(f"🔄 새 데이터 없음 (마지막 봉: {state['end']})")
+    report(state)
+    return state
@@ -0,0 +1,42 @@
+import numpy as np
+
+# ==========================================
+# EMA 매트릭스 (모든 스팬을 한 번에 계산)
+# ==========================================
+def ema_matrix(price, spans, init=None):
+    """
+    (n_bars x n_spans) EMA 매트릭스를 시간축 1회 순회로 계산합니다.
+    pandas ewm(span=..., adjust=False).mean() 과 같은 점화식을 스팬 벡터에 동시에 적용합니다.
+
+    params:
+      - price: 가격 Series 또는 1차원 배열
+      - spans: EMA 기간 목록 (예: range(20, 201, 1))
+      - init: 직전 봉의 EMA 값 (스팬별). 주면 그 값에서 이어서 계산합니다 (새 봉만 추가할 때)
+    """
+    values = np.asarray(price, dtype=np.float64)
+    spans = np.asarray(list(spans), dtype=np.float64)
+
+    # pandas와 동일한 계수: com = (span - 1) / 2, alpha = 1 / (1 + com)
+    alpha = 1.0 / (1.0 + (spans - 1.0) / 2.0)
+    old_wt_factor = 1.0 - alpha
+
+    out = np.empty((len(values), len(spans)))
+    weighted = np.full(len(spans), np.nan) if init is None else np.array(init, dtype=np.float64)
+    old_wt = np.ones(len(spans))
+
+    for i in range(len(values)):
+        cur = values[i]
+        if weighted[0] != weighted[0]:
+            # 첫 관측값은 그대로 시작값
+            if cur == cur:
+                weighted[:] = cur
+        else:
+            # 결측(NaN) 구간은 값은 유지하고 직전 값의 가중치만 감쇠
+            old_wt *= old_wt_factor
+            if cur == cur:
+                new = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                weighted = np.where(weighted != cur, new, weighted)
+                old_wt[:] = 1.0
+        out[i] = weighted
+
+    return out
@@ -1,10 +1,10 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
 import time
-from pandas_datareader import data as pdr
+from data_cache import load_all, load_prices
+from engine import extract_arrays
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
@@ -16,21 +16,16 @@ def get_combined_data():
     
     tickers = ['INDY', 'SHY']
     # INDY(iShares India 50 ETF) 상장 시점(2009년 말) 데이터를 최대한 확보하기 위해 2008년부터 탐색합니다.
-    df = yf.download(tickers, start="2008-01-01", progress=False)
+    df, macro = load_all(tickers, start="2008-01-01", fred_ids=['T10Y2Y'])
     
-    if isinstance(df.columns, pd.MultiIndex):
-        df = df['Close']
-    
-    import pandas_datareader.data as web
-    try:
-        spread = web.DataReader('T10Y2Y', 'fred', start='2008-01-01')
-    except:
+    if 'T10Y2Y' in macro:
+        spread = macro['T10Y2Y']
+    else:
         print("⚠️ FRED 연결 실패. yfinance 데이터로 대체 시도.")
-        t10 = yf.download("^TNX", start="2008-01-01", progress=False)['Close']
-        t02 = yf.download("^IRX", start="2008-01-01", progress=False)['Close']
-        spread = t10 - t02
+        bonds = load_prices(["^TNX", "^IRX"], start="2008-01-01")
+        spread = (bonds['^TNX'] - bonds['^IRX']).to_frame('T10Y2Y')
 
-    df = df.join(spread).fillna(method='ffill')
+    df = df.join(spread).ffill()
     df.columns = list(df.columns[:-1]) + ['T10Y2Y']
     df = df.dropna()
 
@@ -163,31 +158,35 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("═"*60)
 
 # ==========================================
-# 4. 실행부
+# 4. 최적화 + 결과 리포트 (run_all.py 에서도 사용)
+# ==========================================
+# 정밀 탐색 범위
+ma_range = range(20, 201, 1) 
+rsi_range = range(70, 96, 1)
+buffer_range = [0.01, 0.02, 0.03, 0.05] 
+
+def optimize(df_raw):
+    arrays = extract_arrays(df_raw, price='INDY', ret_lev='Sim_Lev_2X', ret_spot='INDY_Pct', macro='T10Y2Y')
+    return grid_search('switch', arrays, ma_range, rsi_range, buffer_range, ticker='INDY')
+
+def report(df_raw, best_params):
+    final_score, df_final = run_strategy(df_raw, best_params['ma'], best_params['rsi'], best_params['buf'])
+    analyze_today(df_final, best_params['ma'], best_params['rsi'], best_params['buf'], final_score)
+
+# ==========================================
+# 5. 실행부
 # ==========================================
 if __name__ == "__main__":
     df_raw = get_combined_data()
     
     if df_raw is not None:
-        # 정밀 탐색 범위
-        ma_range = range(20, 201, 1) 
-        rsi_range = range(70, 96, 1)
-        buffer_range = [0.01, 0.02, 0.03, 0.05] 
-        
         total_comb = len(ma_range) * len(rsi_range) * len(buffer_range)
         print(f"\n⚡ {total_comb:,}개 조합 정밀 분석 중... 인도 증시(INDY)의 과거 데이터를 탐색합니다.")
         
         start_time = time.time()
-        best_score = -999
-        best_params = {}
         
-        for ma, rsi, buf in itertools.product(ma_range, rsi_range, buffer_range):
-            score, _ = run_strategy(df_raw.copy(), ma, rsi, buf)
-            if score > best_score:
-                best_score = score
-                best_params = {'ma': ma, 'rsi': rsi, 'buf': buf}
+        best_params, best_score = optimize(df_raw)
                 
         print(f"✅ 분석 완료! (소요시간: {time.time() - start_time:.1f}초)")
         
-        final_score, df_final = run_strategy(df_raw, best_params['ma'], best_params['rsi'], best_params['buf'])
-        analyze_today(df_final, best_params['ma'], best_params['rsi'], best_params['buf'], final_score)
\ No newline at end of file
+        report(df_raw, best_params)
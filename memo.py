@@ -0,0 +1,163 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 0. 설정
+# ==========================================
+# 디스크 캐시 폴더 (기본: 스크립트 폴더의 .grid_memo)
+MEMO_DIR = os.environ.get(
+    'GRID_MEMO_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.grid_memo'),
+)
+# 디스크 캐시 최대 크기(MB), 넘으면 가장 오래 안 쓴 블록 파일부터 삭제
+MEMO_MAX_MB = float(os.environ.get('GRID_MEMO_MAX_MB', 256))
+# 메모리 캐시에 둘 최대 조합 수, 넘으면 가장 오래 안 쓴 블록부터 내보냄
+MEMO_MAX_ITEMS = int(os.environ.get('GRID_MEMO_ITEMS', 200_000))
+
+# 캐시 단위는 "블록" = (네임스페이스, 첫 번째 파라미터 값) 하나에 딸린 나머지 파라미터 -> 값
+# 예: 같은 데이터/전략의 ma=120 행 전체. 그리드가 겹치면 블록 단위로 읽고 빠진 조합만 계산해서 합칩니다.
+_memory = OrderedDict()
+_memory_sizes = {}
+_memory_items = 0
+
+# ==========================================
+# 1. 지문 (입력 데이터 + 설정 해시)
+# ==========================================
+def fingerprint(*parts):
+    """
+    배열 dict / DataFrame / 배열 / 일반 값들의 내용 해시.
+    예: fingerprint('grid', kind, objective, years, arrays) - 봉 하나만 달라도 다른 값
+    """
+    h = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, dict):
+            for key in sorted(part):
+                arr = np.ascontiguousarray(part[key])
+                h.update(f"{key}:{arr.dtype}:{arr.shape}".encode())
+                h.update(arr.tobytes())
+        elif isinstance(part, pd.DataFrame):
+            h.update(repr(list(part.columns)).encode())
+            h.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+        elif isinstance(part, np.ndarray):
+            arr = np.ascontiguousarray(part)
+            h.update(f"{arr.dtype}:{arr.shape}".encode())
+            h.update(arr.tobytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+# ==========================================
+# 2. 메모리 계층 (LRU)
+# ==========================================
+def _remember(key, block):
+    global _memory_items
+    _memory_items += len(block) - _memory_sizes.get(key, 0)
+    _memory[key] = block
+    _memory_sizes[key] = len(block)
+    _memory.move_to_end(key)
+    while _memory_items > MEMO_MAX_ITEMS and len(_memory) > 1:
+        old, _ = _memory.popitem(last=False)
+        _memory_items -= _memory_sizes.pop(old)
+
+def clear_memory():
+    global _memory_items
+    _memory.clear()
+    _memory_sizes.clear()
+    _memory_items = 0
+
+# ==========================================
+# 3. 디스크 계층 (크기 제한, 오래 안 쓴 파일부터 삭제)
+# ==========================================
+def _block_path(key):
+    return os.path.join(MEMO_DIR, f"{hashlib.sha1(repr(key).encode()).hexdigest()[:24]}.npz")
+
+def _read_block(key):
+    path = _block_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            params, values = data['params'], data['values']
+    except Exception:
+        return None
+    # 최근 사용 시각 갱신 (디스크 정리 순서)
+    os.utime(path)
+    return dict(zip(map(tuple, params.tolist()), values.tolist()))
+
+def _write_block(key, block):
+    os.makedirs(MEMO_DIR, exist_ok=True)
+    params = np.array(list(block), dtype=np.float64)
+    values = np.array(list(block.values()), dtype=np.float64)
+    # 쓰다가 끊겨도 기존 블록이 깨지지 않도록 임시 파일에 쓴 뒤 교체
+    with tempfile.NamedTemporaryFile(dir=MEMO_DIR, suffix='.tmp', delete=False) as f:
+        np.savez(f, params=params, values=values)
+    os.replace(f.name, _block_path(key))
+
+def _evict_disk():
+    if not os.path.isdir(MEMO_DIR):
+        return
+    files = []
+    for entry in os.scandir(MEMO_DIR):
+        if entry.name.endswith('.npz'):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    limit = MEMO_MAX_MB * 1024 * 1024
+    for _, size, path in sorted(files):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+# ==========================================
+# 4. 캐시를 거친 평가
+# ==========================================
+def cached_values(namespace, params, compute):
+    """
+    파라미터 튜플 목록의 값을 메모리 -> 디스크 순으로 찾고, 없는 조합만 compute 로 계산해서 채웁니다.
+
+    params:
+      - namespace: 데이터/전략/설정 지문 (fingerprint), 다르면 캐시를 공유하지 않음
+      - params: 숫자 파라미터 튜플 목록 (예: [(120, 80, 0.02), ...])
+      - compute: 파라미터 튜플 목록 -> 값 배열 (예: search.kernel_objective 의 evaluate)
+    returns: params 순서의 값 배열 (np.float64)
+    """
+    keys = [tuple(float(v) for v in p) for p in params]
+    blocks = {}
+    for head in dict.fromkeys(k[0] for k in keys):
+        key = (namespace, head)
+        block = _memory.get(key)
+        blocks[head] = block if block is not None else (_read_block(key) or {})
+
+    missing = [i for i, k in enumerate(keys) if k[1:] not in blocks[k[0]]]
+    if missing:
+        values = np.asarray(compute([params[i] for i in missing]), dtype=np.float64)
+        changed = set()
+        for i, value in zip(missing, values.tolist()):
+            blocks[keys[i][0]][keys[i][1:]] = value
+            changed.add(keys[i][0])
+        for head in changed:
+            _write_block((namespace, head), blocks[head])
+        _evict_disk()
+
+    for head, block in blocks.items():
+        _remember((namespace, head), block)
+    return np.array([blocks[k[0]][k[1:]] for k in keys], dtype=np.float64)
+
+def memoize(namespace, evaluate):
+    """
+    search.py 형식의 evaluate(파라미터 튜플 목록) -> 값 배열 함수를 캐시로 감쌉니다.
+    예: memoize(fingerprint('my_eval', df), evaluate)  (search.kernel_objective / strategy_objective 의 memo=True 가 이 형태)
+    """
+    def cached(params):
+        return cached_values(namespace, params, evaluate)
+    return cached
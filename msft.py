@@ -1,9 +1,10 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
 import time
+from data_cache import load_prices
+from engine import extract_arrays
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
@@ -17,13 +18,7 @@ def get_msft_data():
     tickers = ['MSFT', 'SHY'] 
     
     # 2008년 금융위기를 포함하기 위해 2004년부터 데이터 수집
-    df = yf.download(tickers, start="2004-01-01", progress=False)
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            df = df['Close']
-        except:
-            df.columns = df.columns.get_level_values(0)
+    df = load_prices(tickers, start="2004-01-01")
     
     df = df.dropna()
     
@@ -155,49 +150,52 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("="*60)
 
 # ==========================================
-# 4. 실행부
+# 4. 최적화 + 결과 리포트 (run_all.py 에서도 사용)
+# ==========================================
+# MSFT는 우상향 성향이 강함 -> 파라미터 탐색 범위 설정
+ma_range = range(20, 201, 1)   
+rsi_range = range(70, 96, 2)   
+buffer_range = [0.0, 0.01, 0.02, 0.03, 0.04] 
+
+def optimize(df_raw):
+    arrays = extract_arrays(df_raw, price='MSFT', ret_lev='Sim_MSFT_2X')
+    return grid_search('pyramid', arrays, ma_range, rsi_range, buffer_range, ticker='MSFT')
+
+def report(df_raw, best_params):
+    # 최적 결과로 최종 실행
+    final_score, df_final = run_msft_strategy(
+        df_raw, 
+        best_params['ma'], 
+        best_params['rsi'], 
+        best_params['buf']
+    )
+
+    # 결과 분석
+    analyze_today(
+        df_final, 
+        best_params['ma'], 
+        best_params['rsi'], 
+        best_params['buf'],
+        final_score
+    )
+
+# ==========================================
+# 5. 실행부
 # ==========================================
 if __name__ == "__main__":
     # 데이터 수집 (20년치)
     df_raw = get_msft_data()
     
-    # MSFT는 우상향 성향이 강함 -> 파라미터 탐색 범위 설정
-    ma_range = range(20, 201, 1)   
-    rsi_range = range(70, 96, 2)   
-    buffer_range = [0.0, 0.01, 0.02, 0.03, 0.04] 
-    
     total_combinations = len(ma_range) * len(rsi_range) * len(buffer_range)
     
     print(f"\n⚡ 최적 시나리오 분석 시작...")
     print(f"   - 총 시나리오: {total_combinations:,}개")
     
     start_time = time.time()
-    best_score = -999
-    best_params = {}
     
     # 최적 파라미터 찾기
-    for ma, rsi, buf in itertools.product(ma_range, rsi_range, buffer_range):
-        score, _ = run_msft_strategy(df_raw.copy(), ma, rsi, buf)
-        
-        if score > best_score:
-            best_score = score
-            best_params = {'ma': ma, 'rsi': rsi, 'buf': buf}
+    best_params, best_score = optimize(df_raw)
             
     print(f"\n✅ 완료! (소요시간: {time.time() - start_time:.1f}초)")
     
-    # 최적 결과로 최종 실행
-    final_score, df_final = run_msft_strategy(
-        df_raw, 
-        best_params['ma'], 
-        best_params['rsi'], 
-        best_params['buf']
-    )
-    
-    # 결과 분석
-    analyze_today(
-        df_final, 
-        best_params['ma'], 
-        best_params['rsi'], 
-        best_params['buf'],
-        final_score
-    )
\ No newline at end of file
+    report(df_raw, best_params)
@@ -1,36 +1,33 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
+import sys
 import time
-from pandas_datareader import data as pdr
+from data_cache import load_all, load_prices
+from engine import extract_arrays
+from incremental import build_state, run_update, save_state
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
 # ==========================================
 # 1. 데이터 수집 (NVDA & 장단기 금리차)
 # ==========================================
-def get_combined_data():
+def get_combined_data(start="2006-01-01"):
     print("⏳ 데이터 수집 중... (NVDA, SHY, 10Y-2Y Spread)")
     
     tickers = ['NVDA', 'SHY']
-    df = yf.download(tickers, start="2006-01-01", progress=False)
+    df, macro = load_all(tickers, start=start, fred_ids=['T10Y2Y'])
     
-    if isinstance(df.columns, pd.MultiIndex):
-        df = df['Close']
-    
-    import pandas_datareader.data as web
-    try:
+    if 'T10Y2Y' in macro:
         # FRED에서 장단기 금리차 직접 로드
-        spread = web.DataReader('T10Y2Y', 'fred', start='2006-01-01')
-    except:
+        spread = macro['T10Y2Y']
+    else:
         print("⚠️ FRED 연결 실패. yfinance 국채 데이터로 대체 시도.")
-        t10 = yf.download("^TNX", start="2006-01-01", progress=False)['Close']
-        t02 = yf.download("^IRX", start="2006-01-01", progress=False)['Close']
-        spread = t10 - t02
+        bonds = load_prices(["^TNX", "^IRX"], start=start)
+        spread = (bonds['^TNX'] - bonds['^IRX']).to_frame('T10Y2Y')
 
-    df = df.join(spread).fillna(method='ffill')
+    df = df.join(spread).ffill()
     df.columns = list(df.columns[:-1]) + ['T10Y2Y']
     df = df.dropna()
 
@@ -111,24 +108,26 @@ def run_strategy(df, ma_period, rsi_limit, sell_buffer):
 # ==========================================
 # 3. 결과 분석 및 출력 (강화 버전)
 # ==========================================
-def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
-    last_row = df.iloc[-1]
-    price = last_row['NVDA']
-    ma_series = df['NVDA'].ewm(span=ma_period, adjust=False).mean()
-    current_ma = ma_series.iloc[-1]
+# 리포트는 전략 상태 스냅샷(incremental.build_state)으로 출력하므로
+# 전체 실행(report)과 일일 업데이트(update)가 같은 화면을 냅니다.
+def analyze_today(state):
+    params = state['params']
+    ma_period, rsi_limit, sell_buffer = params['ma'], params['rsi'], params['buf']
+    price = state['last']['NVDA']
+    current_ma = state['ema']
     sell_line = current_ma * (1 - sell_buffer)
-    rsi = last_row['RSI']
-    current_spread = last_row['T10Y2Y']
+    rsi = state['rsi']
+    current_spread = state['last']['T10Y2Y']
     
-    target_pos = last_row['Strategy_Pos']
-    target_lev = last_row['Is_Leveraged']
+    target_pos = state['pos']
+    target_lev = state['lev']
     
-    start_date = df.index[0]
-    end_date = df.index[-1]
+    total_score = state['equity']
+    start_date = pd.Timestamp(state['start'])
+    end_date = pd.Timestamp(state['end'])
     years = (end_date - start_date).days / 365.25
     cagr = (total_score ** (1 / years)) - 1
-    cum_ret = (1 + df['Strategy_Ret']).cumprod()
-    mdd = ((cum_ret - cum_ret.cummax()) / cum_ret.cummax()).min()
+    mdd = state['mdd']
     
     print("\n" + "═"*60)
     print(f"🏆 [최적화 완료: NVDA ↔ NVDL 스위칭 전략]")
@@ -164,33 +163,62 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("═"*60)
 
 # ==========================================
-# 4. 실행부
+# 4. 최적화 + 결과 리포트 (run_all.py 에서도 사용)
+# ==========================================
+# 사용자 지정 최적화 범위 (1단위 정밀 탐색)
+ma_range = range(20, 201, 1) 
+rsi_range = range(70, 96, 1)
+buffer_range = [0.01, 0.02, 0.03] 
+
+def optimize(df_raw):
+    arrays = extract_arrays(df_raw, price='NVDA', ret_lev='Sim_Lev_2X', ret_spot='NVDA_Pct', macro='T10Y2Y')
+    return grid_search('switch', arrays, ma_range, rsi_range, buffer_range, ticker='NVDA')
+
+# 일일 업데이트용 상태 정의 (incremental.build_state 참고)
+STATE_SPEC = {
+    'kind': 'switch', 'price': 'NVDA', 'macro': 'T10Y2Y', 'columns': ['NVDA', 'SHY', 'T10Y2Y'],
+    'returns': {'ret_lev': ('NVDA', 2.0), 'ret_spot': ('NVDA', 1.0), 'ret_cash': ('SHY', 1.0)},
+}
+
+def report(df_raw, best_params):
+    # 최적 파라미터로 최종 결과 도출 -> 상태 스냅샷 저장 (다음 update 의 출발점)
+    final_score, df_final = run_strategy(df_raw, best_params['ma'], best_params['rsi'], best_params['buf'])
+    state = build_state(STATE_SPEC, df_final, best_params, final_score)
+    save_state('nvda', state)
+    analyze_today(state)
+
+def update():
+    # 저장된 스냅샷에 새 봉만 반영 (파라미터는 마지막 최적화 결과 그대로)
+    def full_run(params):
+        df_raw = get_combined_data()
+        params = params or optimize(df_raw)[0]
+        if params is None:
+            print("⚠️ 제약 조건(max_drawdown / min_cagr)을 만족하는 조합이 없습니다.")
+        else:
+            report(df_raw, params)
+    return run_update('nvda', get_combined_data, full_run, analyze_today)
+
+# ==========================================
+# 5. 실행부
 # ==========================================
 if __name__ == "__main__":
+    # 사용법: python nvda.py         -> 전체 최적화 + 리포트
+    #         python nvda.py update  -> 저장된 상태에 새 봉만 반영해서 리포트
+    if sys.argv[1:] == ['update']:
+        update()
+        sys.exit()
+
     df_raw = get_combined_data()
     
     if df_raw is not None:
-        # 사용자 지정 최적화 범위 (1단위 정밀 탐색)
-        ma_range = range(20, 201, 1) 
-        rsi_range = range(70, 96, 1)
-        buffer_range = [0.01, 0.02, 0.03] 
-        
         total_comb = len(ma_range) * len(rsi_range) * len(buffer_range)
         print(f"\n⚡ 총 {total_comb:,}개의 시나리오 정밀 분석 시작... (잠시만 기다려주세요)")
         
         start_time = time.time()
-        best_score = -999
-        best_params = {}
         
         # 최적화 루프
-        for ma, rsi, buf in itertools.product(ma_range, rsi_range, buffer_range):
-            score, _ = run_strategy(df_raw.copy(), ma, rsi, buf)
-            if score > best_score:
-                best_score = score
-                best_params = {'ma': ma, 'rsi': rsi, 'buf': buf}
+        best_params, best_score = optimize(df_raw)
                 
         print(f"✅ 분석 완료! (소요시간: {time.time() - start_time:.1f}초)")
         
-        # 최적 파라미터로 최종 결과 도출
-        final_score, df_final = run_strategy(df_raw, best_params['ma'], best_params['rsi'], best_params['buf'])
-        analyze_today(df_final, best_params['ma'], best_params['rsi'], best_params['buf'], final_score)
\ No newline at end of file
+        report(df_raw, best_params)
@@ -0,0 +1,892 @@
+import hashlib
+import heapq
+import itertools
+import os
+import sqlite3
+import tempfile
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from indicators import ema_matrix
+from engine import METRICS, advance_combos, simulate_combos, simulate_metrics, simulate_pruned, summarize_stats
+
+# ==========================================
+# 그리드 탐색 (itertools.product 대체)
+# ==========================================
+def _grid(arrays, ma_range, rsi_range, third_range):
+    # (EMA 매트릭스, 조합별 ma 열 번호, rsi, 세 번째 파라미터, 그리드 shape)
+    ma_list, rsi_list, third_list = list(ma_range), list(rsi_range), list(third_range)
+    ema = ema_matrix(arrays['price'], ma_list)
+
+    ma_idx, rsi_vals, third_vals = np.meshgrid(
+        np.arange(len(ma_list)),
+        np.asarray(rsi_list, dtype=np.float64),
+        np.asarray(third_list, dtype=np.float64),
+        indexing='ij',
+    )
+    shape = (len(ma_list), len(rsi_list), len(third_list))
+    return ema, ma_idx.ravel(), rsi_vals.ravel(), third_vals.ravel(), shape
+
+def _score_combos(kind, arrays, ema, ma_idx, rsi_vals, third_vals, max_drawdown=None, min_cagr=None, years=None):
+    # 제약 조건이 있으면 조기 중단 경로(중단된 조합은 NaN), 없으면 기본 경로
+    if max_drawdown is None and min_cagr is None:
+        return simulate_combos(kind, arrays, ema, ma_idx, rsi_vals, third_vals)
+    return simulate_pruned(kind, arrays, ema, ma_idx, rsi_vals, third_vals, max_drawdown, min_cagr, years)[0]
+
+def grid_scores(kind, arrays, ma_range, rsi_range, third_range, max_drawdown=None, min_cagr=None, years=None,
+                time_budget=None):
+    """
+    전체 그리드를 한 번에 평가해서 (len(ma_range), len(rsi_range), len(third_range)) 배열로 돌려줍니다.
+    순서는 itertools.product(ma_range, rsi_range, third_range) 와 같습니다.
+    max_drawdown / min_cagr 를 주면 조건을 어긴 조합은 중간에 멈추고 NaN 으로 남습니다 (simulate_pruned 참고).
+    time_budget(초)을 주면 그 시간 안에 평가한 조합만 채우고 나머지는 NaN 입니다 (anytime_scores 참고).
+    """
+    start = time.monotonic()
+    ema, ma_idx, rsi_vals, third_vals, shape = _grid(arrays, ma_range, rsi_range, third_range)
+    if time_budget is not None:
+        scores, _ = anytime_scores(kind, arrays, ema, ma_idx, rsi_vals, third_vals, shape, time_budget,
+                                   years=years, max_drawdown=max_drawdown, min_cagr=min_cagr, start=start)
+        return scores.reshape(shape)
+    scores = _score_combos(kind, arrays, ema, ma_idx, rsi_vals, third_vals, max_drawdown, min_cagr, years)
+    return scores.reshape(shape)
+
+def grid_metrics(kind, arrays, ma_range, rsi_range, third_range, years=None):
+    """
+    grid_scores() 와 같은 그리드를 평가하되 조합마다 METRICS 전체를 돌려줍니다.
+    returns: (len(ma_range), len(rsi_range), len(third_range), len(METRICS)) 배열
+             예: metrics[..., METRICS.index('sharpe')]
+    """
+    ema, ma_idx, rsi_vals, third_vals, shape = _grid(arrays, ma_range, rsi_range, third_range)
+    metrics = simulate_metrics(kind, arrays, ema, ma_idx, rsi_vals, third_vals, years)
+    return metrics.reshape(shape + (len(METRICS),))
+
+def pick_best(scores, ma_range, rsi_range, third_range, names=('ma', 'rsi', 'buf')):
+    # 기존 `if score > best_score` 와 동일: 최고점이 여러 개면 그리드 순서상 첫 번째
+    # 모든 조합이 NaN (제약 조건 탈락) 이면 (None, None)
+    if np.isnan(scores).all():
+        return None, None
+    flat = np.where(np.isnan(scores), -np.inf, scores).ravel()
+    best = int(np.argmax(flat))
+    i, j, k = np.unravel_index(best, np.shape(scores))
+    values = (list(ma_range)[i], list(rsi_range)[j], list(third_range)[k])
+    return dict(zip(names, values)), float(flat[best])
+
+def _objective_values(metrics, objective, max_drawdown=None, min_cagr=None):
+    # 클수록 좋은 값으로 변환 (변동성은 낮을수록 좋으므로 부호 반전), 제약 조건 탈락 조합은 NaN
+    values = metrics[..., METRICS.index(objective)]
+    values = -values if objective == 'vol' else values.copy()
+    if max_drawdown is not None:
+        values[metrics[..., METRICS.index('mdd')] < -abs(max_drawdown)] = np.nan
+    if min_cagr is not None:
+        values[metrics[..., METRICS.index('cagr')] < min_cagr] = np.nan
+    return values
+
+def evaluate_combos(kind, arrays, ema, ma_idx, rsi_vals, third_vals, objective='score', years=None,
+                    max_drawdown=None, min_cagr=None):
+    """
+    조합 목록의 objective 값 (클수록 좋음, 제약 조건 탈락은 NaN).
+    grid_search / adaptive_search / search.py 탐색기가 공용으로 씁니다.
+    """
+    combo = (kind, arrays, ema, ma_idx, rsi_vals, third_vals)
+    if objective == 'score':
+        return _score_combos(*combo, max_drawdown, min_cagr, years)
+    return _objective_values(simulate_metrics(*combo, years), objective, max_drawdown, min_cagr)
+
+# 탐색 방식(또는 전체 탐색의 주 경로)별로 같이 쓸 수 있는 옵션
+OPTION_GROUPS = {
+    'search': {
+        'adaptive': ('time_budget',),
+        'halving': ('time_budget',),
+        'random': ('time_budget', 'memo'),
+        'tpe': ('time_budget', 'memo'),
+        'genetic': ('time_budget', 'memo'),
+    },
+    'exhaustive': [
+        ('time_budget', ('time_budget',)),
+        ('store', ('store', 'incremental', 'top_k', 'results_path')),
+        ('incremental', ('store', 'incremental', 'top_k', 'results_path')),
+        ('memo', ('memo',)),
+        ('top_k', ('top_k', 'results_path')),
+        ('results_path', ('top_k', 'results_path')),
+        (None, ('workers', 'checkpoint')),
+    ],
+}
+
+def _check_options(search, **used):
+    # 켜진 옵션 중 주 경로가 지원하지 않는 것이 있으면 ValueError (조용히 하나를 무시하지 않음)
+    used = [name for name, on in used.items() if on]
+    if search != 'exhaustive':
+        mode, allowed = f"search='{search}'", OPTION_GROUPS['search'][search]
+    else:
+        lead, allowed = next((lead, allowed) for lead, allowed in OPTION_GROUPS['exhaustive']
+                             if lead is None or lead in used)
+        mode = lead or '전체 탐색'
+    extra = [name for name in used if name not in allowed]
+    if extra:
+        raise ValueError(f"{mode} 와 같이 쓸 수 없는 옵션입니다: {', '.join(extra)} "
+                         f"(같이 쓸 수 있는 옵션: {', '.join(allowed)}, 환경변수 GRID_* 도 확인)")
+
+def grid_search(kind, arrays, ma_range, rsi_range, third_range, names=('ma', 'rsi', 'buf'), workers=None,
+                objective='score', years=None, max_drawdown=None, min_cagr=None, search=None, time_budget=None,
+                checkpoint=None, incremental=None, store=None, memo=None, top_k=None, results_path=None, ticker=None):
+    """
+    스크립트의 최적화 루프를 한 줄로 대체합니다.
+
+    params:
+      - workers: 프로세스 수 (None이면 환경변수 GRID_WORKERS, 없으면 1 = 단일 프로세스)
+      - objective: 순위 기준 (METRICS 중 하나, 기본 'score' = 누적 수익 배수)
+                   예: 'sharpe', 'mdd' (낙폭이 작을수록 위), 'vol' (변동성이 낮을수록 위)
+      - years: 분석 기간(년), CAGR/연율화에 사용 (engine.span_years(df) 권장)
+      - max_drawdown, min_cagr: 제약 조건 (예: -0.6, 0.15). 조건을 어긴 조합은 제외하며,
+        objective='score' 이면 어긴 것이 확실해지는 날에 시뮬레이션을 멈춥니다 (simulate_pruned)
+      - search: 'exhaustive' (전체 탐색), 'adaptive' (adaptive_search, 평가 횟수 절약),
+                'halving' (halving_search, 최근 구간부터 기간을 늘려 가며 상위 조합만 남김),
+                'random' / 'tpe' / 'genetic' (search.py, 환경변수 GRID_BUDGET 회 평가, GRID_SEED 시드)
+                None 이면 환경변수 GRID_SEARCH, 없으면 'exhaustive'
+      - time_budget: 제한 시간(초). 전체 탐색과 search.py 탐색기는 시간이 다 되면 그때까지의 1등을 돌려주고,
+                     adaptive 는 남은 좁히기 단계를, halving 은 남은 중간 구간을 건너뜁니다 (평가 비율은 출력)
+                     (None 이면 환경변수 GRID_TIME_BUDGET, 없으면 제한 없음)
+      - checkpoint: 전체 탐색 중간 결과를 CHECKPOINT_EVERY 초마다 저장하고, 중단 후 다시 돌리면 이어서 탐색
+                    (None 이면 환경변수 GRID_CHECKPOINT, '1' 이면 사용. 병렬 탐색에서 켜면 워커가 구간 1등 대신
+                     구간 점수 전체를 돌려줍니다)
+      - incremental: 조합별 끝 상태를 저장해 두고, 다음 실행에서는 새로 붙은 봉만 이어서 재채점 (incremental_metrics)
+                     (None 이면 환경변수 GRID_INCREMENTAL, '1' 이면 사용)
+      - store: 전체 그리드의 METRICS 를 결과 저장소(results_store)에 ticker 이름으로 저장하고, 같은 데이터로
+               이미 저장된 결과가 있으면 다시 계산하지 않습니다 (stored_metrics)
+               (None 이면 환경변수 GRID_STORE, '1' 이면 사용. 문자열을 주면 그 이름으로 저장 = store=True, ticker=문자열)
+      - ticker: 결과 저장소에 쓸 이름, 스크립트마다 다르게 (예: 'SOXX', VIX 필터 QQQ 는 'QQQ-VIX')
+      - memo: 조합별 평가 결과를 (데이터 지문, 전략, 파라미터) 로 캐시 (memo.py, 메모리 LRU + 크기 제한 디스크).
+              같은 데이터로 다시 돌리거나 겹치는 그리드는 새 조합만 계산합니다 (단일 프로세스)
+              (None 이면 환경변수 GRID_MEMO, '1' 이면 사용)
+      - top_k: 1등만이 아니라 objective 기준 상위 top_k 개를 출력 (grid_results, None 이면 환경변수 GRID_TOP_K)
+      - results_path: 전체 METRICS 텐서를 이 경로의 .npy 로 저장 (grid_results, None 이면 환경변수 GRID_RESULTS_PATH)
+      같이 쓸 수 있는 옵션 (그 밖의 조합은 하나를 조용히 무시하지 않고 ValueError, OPTION_GROUPS 참고):
+        - adaptive / halving: time_budget
+        - random / tpe / genetic: time_budget, memo
+        - 전체 탐색 + time_budget: 단독
+        - 전체 탐색 + store / incremental: 서로, 그리고 top_k / results_path
+        - 전체 탐색 + memo: 단독
+        - 전체 탐색 + top_k / results_path: 서로
+        - 그 밖의 전체 탐색: workers, checkpoint
+    returns:
+      - (best_params, best_value)  예: ({'ma': 120, 'rsi': 80, 'buf': 0.02}, 35.1)
+        best_value 는 objective 기준 값 ('vol' 은 부호가 바뀐 값)
+        조건을 만족하는 조합이 없으면 (None, None)
+    """
+    if objective not in METRICS:
+        raise ValueError(f"objective 는 {METRICS} 중 하나여야 합니다: {objective}")
+    if search is None:
+        search = os.environ.get('GRID_SEARCH', 'exhaustive')
+    if time_budget is None and os.environ.get('GRID_TIME_BUDGET'):
+        time_budget = float(os.environ['GRID_TIME_BUDGET'])
+    if checkpoint is None:
+        checkpoint = os.environ.get('GRID_CHECKPOINT', '0') == '1'
+    if incremental is None:
+        incremental = os.environ.get('GRID_INCREMENTAL', '0') == '1'
+    if memo is None:
+        memo = os.environ.get('GRID_MEMO', '0') == '1'
+    if top_k is None and os.environ.get('GRID_TOP_K'):
+        top_k = int(os.environ['GRID_TOP_K'])
+    if results_path is None:
+        results_path = os.environ.get('GRID_RESULTS_PATH')
+    if workers is None:
+        workers = int(os.environ.get('GRID_WORKERS', '1'))
+    if isinstance(store, str):
+        store, ticker = True, store
+    if store is None:
+        store = os.environ.get('GRID_STORE', '0') == '1'
+    if store and not ticker:
+        raise ValueError("store 를 쓰려면 결과 저장소에 쓸 이름(ticker)이 필요합니다 (예: ticker='SOXX')")
+    if search not in ('exhaustive',) + tuple(OPTION_GROUPS['search']):
+        raise ValueError(f"search 는 'exhaustive', 'adaptive', 'halving', 'random', 'tpe', 'genetic' 중 하나여야 합니다: {search}")
+    _check_options(search, time_budget=time_budget is not None, checkpoint=checkpoint, incremental=incremental,
+                   store=store, memo=memo, top_k=top_k, results_path=results_path, workers=workers > 1)
+
+    if search == 'adaptive':
+        return adaptive_search(kind, arrays, ma_range, rsi_range, third_range, names, objective=objective, years=years,
+                               max_drawdown=max_drawdown, min_cagr=min_cagr, time_budget=time_budget)
+    if search == 'halving':
+        return halving_search(kind, arrays, ma_range, rsi_range, third_range, names, objective=objective, years=years,
+                              max_drawdown=max_drawdown, min_cagr=min_cagr, time_budget=time_budget)
+    if search in ('random', 'tpe', 'genetic'):
+        from search import search_strategy
+        space = dict(zip(names, (list(ma_range), list(rsi_range), list(third_range))))
+        return search_strategy(kind, arrays, space, search, int(os.environ.get('GRID_BUDGET', '2000')),
+                               int(os.environ.get('GRID_SEED', '0')), objective=objective, years=years,
+                               max_drawdown=max_drawdown, min_cagr=min_cagr, time_budget=time_budget, memo=memo)
+    if store or incremental:
+        if store:
+            metrics = stored_metrics(ticker, kind, arrays, ma_range, rsi_range, third_range, years, incremental)
+        else:
+            metrics = incremental_metrics(kind, arrays, ma_range, rsi_range, third_range, years)
+        values = _objective_values(metrics, objective, max_drawdown, min_cagr)
+        if not (top_k or results_path):
+            return pick_best(values, ma_range, rsi_range, third_range, names)
+        if results_path:
+            results = _results_file(results_path, ma_range, rsi_range, third_range)
+            results[...] = np.moveaxis(metrics, -1, 0)
+            results.flush()
+        heap = []
+        _push_top(heap, top_k or 1, values.ravel(), 0)
+        return _report_top(_top_list(heap, ma_range, rsi_range, third_range, names), top_k, objective, results_path)
+    if top_k or results_path:
+        _, top = grid_results(kind, arrays, ma_range, rsi_range, third_range, names, top_k or 1,
+                              objective, years, max_drawdown, min_cagr, results_path)
+        return _report_top(top, top_k, objective, results_path)
+    if time_budget is not None:
+        best_params, best_value, coverage = anytime_search(kind, arrays, ma_range, rsi_range, third_range, names,
+                                                           time_budget, objective=objective, years=years,
+                                                           max_drawdown=max_drawdown, min_cagr=min_cagr)
+        if coverage < 1:
+            print(f"   ⚠️ 전체 조합의 {100 * coverage:.1f}% 만 평가한 결과입니다 (time_budget 을 늘리면 전체 탐색)")
+        return best_params, best_value
+    if memo:
+        from search import kernel_objective
+        evaluate = kernel_objective(kind, arrays, objective, years, max_drawdown, min_cagr, memo=True)
+        scores = evaluate(list(itertools.product(ma_range, rsi_range, third_range)))
+        return pick_best(scores.reshape(len(ma_range), len(rsi_range), len(third_range)),
+                         ma_range, rsi_range, third_range, names)
+    if workers > 1:
+        return parallel_grid_search(kind, arrays, ma_range, rsi_range, third_range, names, workers, objective, years,
+                                    max_drawdown, min_cagr, checkpoint)
+
+    ema, ma_idx, rsi_vals, third_vals, shape = _grid(arrays, ma_range, rsi_range, third_range)
+    if checkpoint:
+        key = checkpoint_key(kind, arrays, ma_range, rsi_range, third_range, objective, years, max_drawdown, min_cagr)
+        scores = checkpoint_scores(kind, arrays, ema, ma_idx, rsi_vals, third_vals, shape, key,
+                                   objective, years, max_drawdown, min_cagr)
+    else:
+        scores = evaluate_combos(kind, arrays, ema, ma_idx, rsi_vals, third_vals, objective, years, max_drawdown, min_cagr)
+    return pick_best(scores.reshape(shape), ma_range, rsi_range, third_range, names)
+
+# ==========================================
+# 시간 제한 탐색 (언제 멈춰도 그때까지의 1등)
+# ==========================================
+def _radical_inverse(i, base):
+    # Halton 수열: 정수 i 를 base 진법으로 뒤집어 [0, 1) 실수로
+    out = np.zeros(len(i))
+    scale = 1.0 / base
+    i = i.copy()
+    while i.any():
+        out += (i % base) * scale
+        i //= base
+        scale /= base
+    return out
+
+def _spread_order(shape, seed=0, spread=1024):
+    """
+    그리드 평탄 인덱스의 평가 순서.
+    앞의 spread 개는 저불일치(Halton) 점이 떨어지는 칸이라 그리드 전체에 고르게 흩어지고,
+    나머지는 MA 기간 단위로 묶어서(기간 순서는 무작위) 묶음마다 계산할 EMA 열이 적도록 합니다.
+    """
+    total = int(np.prod(shape))
+    i = np.arange(1, min(spread, total) + 1)
+    cells = [np.minimum((_radical_inverse(i, b) * n).astype(np.intp), n - 1) for b, n in zip((2, 3, 5), shape)]
+    flat = np.ravel_multi_index(cells, shape)
+    _, first = np.unique(flat, return_index=True)
+    head = flat[np.sort(first)]
+
+    rng = np.random.default_rng(seed)
+    rest = np.setdiff1d(np.arange(total), head)
+    rest = rest[rng.permutation(len(rest))]
+    ma_rank = rng.permutation(shape[0])[rest // int(np.prod(shape[1:]))]
+    return np.concatenate([head, rest[np.argsort(ma_rank, kind='stable')]])
+
+def anytime_scores(kind, arrays, ema, ma_idx, rsi_vals, third_vals, shape, time_budget, seed=0,
+                   objective='score', years=None, max_drawdown=None, min_cagr=None, start=None):
+    """
+    제한 시간(초) 안에서 _spread_order() 순서로 조합을 묶음 단위로 평가합니다.
+    묶음 크기는 지금까지의 평가 속도로 남은 시간에 맞춰 정하므로, 마지막 묶음만큼만 시간을 넘길 수 있습니다.
+    start(time.monotonic() 값)를 주면 그때부터 시간을 잽니다 (_grid 전에 재서 넘기면 EMA 계산 시간도 제한 시간에 포함).
+
+    returns:
+      - scores: 평가한 조합은 objective 값, 평가하지 못한 조합은 NaN (평탄 배열)
+      - coverage: 평가한 조합 비율 (0 ~ 1)
+    """
+    begin = time.monotonic()
+    start = begin if start is None else start
+    order = _spread_order(shape, seed)
+    total = len(order)
+    scores = np.full(total, np.nan)
+
+    done, chunk = 0, min(256, total)
+    while done < total:
+        batch = order[done:done + chunk]
+        scores[batch] = evaluate_combos(kind, arrays, ema, ma_idx[batch], rsi_vals[batch], third_vals[batch],
+                                        objective, years, max_drawdown, min_cagr)
+        done += len(batch)
+        now = time.monotonic()
+        left = time_budget - (now - start)
+        if left <= 0:
+            break
+        # 남은 시간의 절반 안에 끝날 만큼만 다음 묶음으로 (묶음이 클수록 조합당 비용이 줄어서 최대 4배씩 키움)
+        elapsed = now - begin
+        chunk = int(np.clip(done / elapsed * left * 0.5 if elapsed > 0 else chunk * 4, 64, chunk * 4))
+
+    coverage = done / total
+    print(f"⏱️ 시간 제한 탐색: {time.monotonic() - start:.1f}초 동안 {done:,} / {total:,}개 조합 평가 "
+          f"(커버리지 {100 * coverage:.1f}%)")
+    return scores, coverage
+
+def anytime_search(kind, arrays, ma_range, rsi_range, third_range, names=('ma', 'rsi', 'buf'), time_budget=60.0,
+                   seed=0, objective='score', years=None, max_drawdown=None, min_cagr=None):
+    """
+    제한 시간 안에서 그리드를 고르게 훑고 그때까지의 1등을 돌려줍니다.
+    returns: (best_params, best_value, coverage)  - 시간 안에 다 돌면 coverage = 1.0 이고 grid_search 와 같은 결과
+    """
+    start = time.monotonic()
+    ema, ma_idx, rsi_vals, third_vals, shape = _grid(arrays, ma_range, rsi_range, third_range)
+    scores, coverage = anytime_scores(kind, arrays, ema, ma_idx, rsi_vals, third_vals, shape, time_budget, seed,
+                                      objective, years, max_drawdown, min_cagr, start)
+    best_params, best_value = pick_best(scores.reshape(shape), ma_range, rsi_range, third_range, names)
+    return best_params, best_value, coverage
+
+# ==========================================
+# 체크포인트 (중단돼도 이어서 탐색)
+# ==========================================
+# 체크포인트 폴더 (기본: 스크립트 폴더의 .grid_checkpoints)
+CHECKPOINT_DIR = os.environ.get(
+    'GRID_CHECKPOINT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.grid_checkpoints'),
+)
+# 이 시간(초)마다 저장 (이보다 빨리 끝나는 탐색은 파일을 만들지 않음)
+CHECKPOINT_EVERY = float(os.environ.get('GRID_CHECKPOINT_EVERY', 30))
+# 한 묶음에 들어가는 대략의 조합 수 (MA 기간 단위로 끊음)
+CHECKPOINT_CHUNK = 4096
+
+def checkpoint_key(kind, arrays, ma_range, rsi_range, third_range, objective='score', years=None,
+                   max_drawdown=None, min_cagr=None):
+    """데이터(커널 입력 배열) + 그리드 + 평가 기준의 해시. 데이터가 하루만 늘어도 다른 키가 됩니다."""
+    h = hashlib.sha1(repr((kind, objective, years, max_drawdown, min_cagr)).encode())
+    for key in sorted(arrays):
+        arr = np.ascontiguousarray(arrays[key])
+        h.update(f"{key}:{arr.dtype}:{arr.shape}".encode())
+        h.update(arr.tobytes())
+    for values in (ma_range, rsi_range, third_range):
+        values = np.asarray(list(values), dtype=np.float64)
+        h.update(f"{len(values)}".encode())
+        h.update(values.tobytes())
+    return h.hexdigest()[:20]
+
+def _checkpoint_path(key):
+    return os.path.join(CHECKPOINT_DIR, f"grid_{key}.npz")
+
+def _load_checkpoint(key, total):
+    # (점수, 평가 완료 여부) - 파일이 없거나 크기가 안 맞으면 처음부터
+    path = _checkpoint_path(key)
+    if os.path.exists(path):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                scores, done = data['scores'], data['done']
+            if len(scores) == total and len(done) == total:
+                return scores, done
+        except Exception as e:
+            print(f"⚠️ 체크포인트를 읽지 못해 처음부터 탐색합니다: {e}")
+    return np.full(total, np.nan), np.zeros(total, dtype=bool)
+
+def _save_checkpoint(key, scores, done):
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    valid = np.where(done & ~np.isnan(scores), scores, -np.inf)
+    best = int(np.argmax(valid))
+    # 쓰다가 끊겨도 기존 체크포인트가 깨지지 않도록 임시 파일에 쓴 뒤 교체
+    with tempfile.NamedTemporaryFile(dir=CHECKPOINT_DIR, suffix='.tmp', delete=False) as f:
+        np.savez(f, scores=scores, done=done, best_index=np.int64(best), best_value=np.float64(valid[best]))
+    os.replace(f.name, _checkpoint_path(key))
+
+def _checkpoint_chunks(shape):
+    # MA 기간 단위로 자른 평탄 인덱스 구간 목록 (묶음마다 계산할 EMA 열이 적도록)
+    per_ma = int(np.prod(shape[1:]))
+    step = max(1, CHECKPOINT_CHUNK // per_ma) * per_ma
+    total = shape[0] * per_ma
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+def _run_checkpointed(key, total, chunks, score_chunks):
+    """
+    체크포인트 공용 루프. 이미 끝난 구간은 건너뛰고, score_chunks(남은 구간 목록) 가 내놓는
+    (시작, 점수 배열) 을 받을 때마다 채워 넣으며 CHECKPOINT_EVERY 초마다 저장합니다.
+    중단(Ctrl+C 포함)되면 그때까지를 저장하고, 다 끝나면 체크포인트를 지웁니다.
+    """
+    scores, done = _load_checkpoint(key, total)
+    if done.any():
+        print(f"💾 체크포인트에서 이어서 탐색: {int(done.sum()):,} / {total:,}개 조합 완료")
+    todo = [(a, b) for a, b in chunks if not done[a:b].all()]
+
+    last_save = time.monotonic()
+    try:
+        for start, chunk_scores in score_chunks(todo):
+            scores[start:start + len(chunk_scores)] = chunk_scores
+            done[start:start + len(chunk_scores)] = True
+            if time.monotonic() - last_save >= CHECKPOINT_EVERY:
+                _save_checkpoint(key, scores, done)
+                last_save = time.monotonic()
+    except BaseException:
+        if done.any():
+            _save_checkpoint(key, scores, done)
+        raise
+
+    if os.path.exists(_checkpoint_path(key)):
+        os.remove(_checkpoint_path(key))
+    return scores
+
+def checkpoint_scores(kind, arrays, ema, ma_idx, rsi_vals, third_vals, shape, key, objective='score', years=None,
+                      max_drawdown=None, min_cagr=None):
+    """
+    전체 그리드를 MA 기간 단위 묶음으로 평가하면서 checkpoint_key() 로 중간 결과를 저장/복구합니다.
+    returns: 평탄 점수 배열 (evaluate_combos 와 같은 값)
+    """
+    def score_chunks(todo):
+        for a, b in todo:
+            yield a, evaluate_combos(kind, arrays, ema, ma_idx[a:b], rsi_vals[a:b], third_vals[a:b],
+                                     objective, years, max_drawdown, min_cagr)
+
+    return _run_checkpointed(key, len(ma_idx), _checkpoint_chunks(shape), score_chunks)
+
+# ==========================================
+# 증분 재채점 (새로 붙은 봉만 이어서 시뮬레이션)
+# ==========================================
+# 조합별 끝 상태 폴더 (기본: 스크립트 폴더의 .grid_state)
+GRID_STATE_DIR = os.environ.get(
+    'GRID_STATE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.grid_state'),
+)
+# 상태 파일 키에 넣는 데이터 앞부분 길이 (뒤에 봉이 붙어도 같은 키, 다른 종목과는 다른 키)
+GRID_STATE_HEAD = 252
+
+def _hash_arrays(h, arrays, n):
+    for key in sorted(arrays):
+        arr = np.ascontiguousarray(arrays[key][:n])
+        h.update(f"{key}:{arr.dtype}:{arr.shape}".encode())
+        h.update(arr.tobytes())
+    return h
+
+def _grid_state_path(kind, arrays, ma_list, rsi_list, third_list):
+    h = hashlib.sha1(repr((kind, ma_list, rsi_list, third_list)).encode())
+    _hash_arrays(h, arrays, GRID_STATE_HEAD)
+    return os.path.join(GRID_STATE_DIR, f"state_{h.hexdigest()[:20]}.npz")
+
+def _prefix_digest(arrays, n):
+    # 저장 시점까지의 데이터 전체 해시 (배당/분할로 과거가 바뀌었는지 확인용)
+    return _hash_arrays(hashlib.sha1(), arrays, n).hexdigest()
+
+def _load_grid_state(path, arrays, n_combos):
+    # (저장된 봉 수, 조합 상태, STATS, 마지막 EMA 행) - 쓸 수 없으면 None
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            bars, digest = int(data['bars']), str(data['digest'])
+            states, stats, ema_last = data['states'], data['stats'], data['ema_last']
+    except Exception as e:
+        print(f"⚠️ 저장된 조합 상태를 읽지 못해 처음부터 계산합니다: {e}")
+        return None
+    if bars > len(arrays['price']) or len(states) != n_combos or digest != _prefix_digest(arrays, bars):
+        return None
+    return bars, states, stats, ema_last
+
+def _save_grid_state(path, arrays, states, stats, ema_last):
+    os.makedirs(GRID_STATE_DIR, exist_ok=True)
+    bars = len(arrays['price'])
+    # 쓰다가 끊겨도 기존 상태 파일이 깨지지 않도록 임시 파일에 쓴 뒤 교체
+    with tempfile.NamedTemporaryFile(dir=GRID_STATE_DIR, suffix='.tmp', delete=False) as f:
+        np.savez(f, bars=np.int64(bars), digest=np.str_(_prefix_digest(arrays, bars)),
+                 states=states, stats=stats, ema_last=ema_last)
+    os.replace(f.name, path)
+
+def incremental_metrics(kind, arrays, ma_range, rsi_range, third_range, years=None):
+    """
+    전체 그리드의 METRICS 를 조합별 끝 상태(비중/레버리지, 누적 수익, 고점, 리스크 누적값, 마지막 EMA)에서 이어서 계산합니다.
+    저장된 상태가 지금 데이터의 앞부분과 정확히 같으면 새로 붙은 봉만 시뮬레이션하고,
+    없거나 과거 데이터가 바뀌었으면 전체 기간을 한 번 돌린 뒤 끝 상태를 저장합니다.
+
+    returns: grid_metrics() 와 같은 (len(ma_range), len(rsi_range), len(third_range), len(METRICS)) 배열
+    """
+    ma_list, rsi_list, third_list = list(ma_range), list(rsi_range), list(third_range)
+    shape = (len(ma_list), len(rsi_list), len(third_list))
+    i, j, k = np.unravel_index(np.arange(int(np.prod(shape))), shape)
+    ma_idx = i
+    rsi_vals = np.asarray(rsi_list, dtype=np.float64)[j]
+    third_vals = np.asarray(third_list, dtype=np.float64)[k]
+
+    start = time.time()
+    n = len(arrays['price'])
+    path = _grid_state_path(kind, arrays, ma_list, rsi_list, third_list)
+    saved = _load_grid_state(path, arrays, len(ma_idx))
+    if saved is None:
+        ema = ema_matrix(arrays['price'], ma_list)
+        states, stats = advance_combos(kind, arrays, ema, ma_idx, rsi_vals, third_vals)
+        new_bars = n
+    else:
+        bars, states, stats, ema_last = saved
+        new = {key: arr[bars:] for key, arr in arrays.items()}
+        ema = ema_matrix(new['price'], ma_list, init=ema_last) if n > bars else ema_last[None, :]
+        if n > bars:
+            states, stats = advance_combos(kind, new, ema, ma_idx, rsi_vals, third_vals, states, stats)
+        new_bars = n - bars
+
+    _save_grid_state(path, arrays, states, stats, ema[-1])
+    if saved is None:
+        label = "전체 기간 계산 후 상태 저장"
+    else:
+        label = f"새 봉 {new_bars}개만 반영" if new_bars else "새 봉 없음"
+    print(f"🔁 증분 재채점: {label} ({len(ma_idx):,}개 조합, {time.time() - start:.2f}초)")
+
+    return summarize_stats(states[:, 2], stats, n, years).reshape(shape + (len(METRICS),))
+
+# ==========================================
+# 결과 저장소 (조합별 지표를 SQLite 에 저장, 같은 데이터면 재계산 없음)
+# ==========================================
+def stored_metrics(ticker, kind, arrays, ma_range, rsi_range, third_range, years=None, incremental=False):
+    """
+    전체 그리드의 METRICS 를 results_store 에 저장하고 돌려줍니다 (grid_metrics() 와 같은 모양).
+    저장소에 지금 데이터(입력 배열 내용 해시)로 계산한 그리드 전체가 있으면 시뮬레이션 없이 읽기만 합니다.
+    incremental=True 면 새로 계산할 때 incremental_metrics() 로 새 봉만 이어서 계산합니다.
+    조회는 results_store.query / top_results (예: python results_store.py SOXX --by cagr --max-drawdown 0.4)
+    """
+    from results_store import load_results, save_results
+
+    start = time.time()
+    metrics = load_results(ticker, kind, arrays, ma_range, rsi_range, third_range, years)
+    if metrics is not None:
+        print(f"🗄️ 저장된 결과 사용: {ticker} ({metrics[..., 0].size:,}개 조합, {time.time() - start:.2f}초)")
+    else:
+        if incremental:
+            metrics = incremental_metrics(kind, arrays, ma_range, rsi_range, third_range, years)
+        else:
+            metrics = grid_metrics(kind, arrays, ma_range, rsi_range, third_range, years)
+        try:
+            save_results(ticker, kind, arrays, ma_range, rsi_range, third_range, metrics, years)
+            print(f"🗄️ 결과 저장: {ticker} ({metrics[..., 0].size:,}개 조합, {time.time() - start:.2f}초)")
+        except sqlite3.Error as e:
+            # 저장에 실패해도 이번 탐색 결과는 그대로 사용
+            print(f"⚠️ 결과 저장 실패 ({ticker}): {e}")
+    return metrics
+
+# ==========================================
+# 결과 텐서 + 상위 K 개 (1등 하나만 남기지 않음)
+# ==========================================
+def _push_top(heap, k, values, start):
+    # 크기 k 의 최소 힙에 (값, -평탄 인덱스) 를 넣어 상위 k 개만 유지 (동점이면 그리드 순서상 앞쪽이 위)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) > k:
+        valid = valid[np.lexsort((valid, -values[valid]))[:k]]
+    for i in valid.tolist():
+        item = (float(values[i]), -(start + i))
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+def _results_file(path, ma_range, rsi_range, third_range):
+    # path 의 .npy 메모리 매핑 결과 텐서 (METRICS 축이 먼저) + 축 값 파일
+    ma_list, rsi_list, third_list = list(ma_range), list(rsi_range), list(third_range)
+    shape = (len(METRICS), len(ma_list), len(rsi_list), len(third_list))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    results = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=shape)
+    np.savez(os.path.splitext(path)[0] + '_axes.npz', ma=np.asarray(ma_list), rsi=np.asarray(rsi_list, dtype=np.float64),
+             third=np.asarray(third_list, dtype=np.float64), metrics=np.array(METRICS))
+    return results
+
+def _top_list(heap, ma_range, rsi_range, third_range, names):
+    # _push_top 힙 -> [(params, value), ...] 값이 큰 순서
+    ma_list, rsi_list, third_list = list(ma_range), list(rsi_range), list(third_range)
+    shape = (len(ma_list), len(rsi_list), len(third_list))
+    top = []
+    for value, neg_index in sorted(heap, reverse=True):
+        i, j, k = np.unravel_index(-neg_index, shape)
+        top.append((dict(zip(names, (ma_list[i], rsi_list[j], third_list[k]))), value))
+    return top
+
+def _report_top(top, top_k, objective, results_path):
+    # grid_search 의 top_k / results_path 출력, 1등 (없으면 (None, None))
+    if top_k:
+        print(f"🏅 상위 {len(top)}개 ({objective})")
+        for rank, (params, value) in enumerate(top, 1):
+            print(f"   {rank:>2}. " + ", ".join(f"{key}={val}" for key, val in params.items()) + f" → {value:.4f}")
+    if results_path:
+        print(f"💾 결과 텐서 저장: {results_path}")
+    return top[0] if top else (None, None)
+
+def grid_results(kind, arrays, ma_range, rsi_range, third_range, names=('ma', 'rsi', 'buf'), top_k=20,
+                 objective='score', years=None, max_drawdown=None, min_cagr=None, path=None):
+    """
+    그리드 전체의 METRICS 텐서와 objective 기준 상위 top_k 개 조합을 함께 만듭니다.
+    MA 기간 단위 묶음으로 계산해서 텐서에 바로 채우므로, 계산 중 메모리는 그리드 크기와 무관하게 묶음 하나 + 힙 크기입니다.
+
+    params:
+      - path: 주면 텐서를 그 경로의 .npy 로 만들고 메모리 매핑으로 채움 (메모리에 전부 올리지 않음)
+              축 값은 '<path 에서 .npy 뺀 이름>_axes.npz' 에 저장 (ma, rsi, third, metrics)
+              나중에 np.load(path, mmap_mode='r') 로 필요한 부분만 읽을 수 있습니다.
+    returns:
+      - (results, top)
+        results: (len(METRICS), len(ma_range), len(rsi_range), len(third_range)) 배열
+                 예: results[METRICS.index('cagr')] -> CAGR 텐서
+        top: [(params, value), ...] objective 값이 큰 순서 (grid_search 의 1등이 top[0]), 탈락 조합 제외
+    """
+    if objective not in METRICS:
+        raise ValueError(f"objective 는 {METRICS} 중 하나여야 합니다: {objective}")
+    ma_list, rsi_list, third_list = list(ma_range), list(rsi_range), list(third_range)
+    shape = (len(ma_list), len(rsi_list), len(third_list))
+    rsi_arr = np.asarray(rsi_list, dtype=np.float64)
+    third_arr = np.asarray(third_list, dtype=np.float64)
+
+    if path is None:
+        results = np.empty((len(METRICS),) + shape)
+    else:
+        results = _results_file(path, ma_list, rsi_list, third_list)
+    flat = results.reshape(len(METRICS), -1)
+
+    heap = []
+    for start, stop in _checkpoint_chunks(shape):
+        i, j, k = np.unravel_index(np.arange(start, stop), shape)
+        ema = ema_matrix(arrays['price'], ma_list[i[0]:i[-1] + 1])
+        metrics = simulate_metrics(kind, arrays, ema, i - i[0], rsi_arr[j], third_arr[k], years)
+        flat[:, start:stop] = metrics.T
+        _push_top(heap, top_k, _objective_values(metrics, objective, max_drawdown, min_cagr), start)
+    if path is not None:
+        results.flush()
+    return results, _top_list(heap, ma_list, rsi_list, third_list, names)
+
+# ==========================================
+# 적응형 탐색 (거친 격자 -> 상위 영역만 촘촘하게)
+# ==========================================
+def _neighborhood(points, radius, stride, shape):
+    # 각 점 주변 +-radius 범위를 stride 간격으로 자른 격자 (그리드 평탄 인덱스)
+    blocks = [np.empty(0, dtype=np.intp)]
+    for p in points:
+        axes = [np.unique(np.clip(np.arange(c - r, c + r + 1, s), 0, n - 1))
+                for c, r, s, n in zip(p, radius, stride, shape)]
+        mesh = np.meshgrid(*axes, indexing='ij')
+        blocks.append(np.ravel_multi_index([m.ravel() for m in mesh], shape))
+    return np.unique(np.concatenate(blocks))
+
+def adaptive_search(kind, arrays, ma_range, rsi_range, third_range, names=('ma', 'rsi', 'buf'),
+                    coarse=(5, 2, 1), top_k=5, verify=None, objective='score', years=None,
+                    max_drawdown=None, min_cagr=None, time_budget=None):
+    """
+    거친 격자(축별 coarse 칸 간격)를 먼저 평가하고, 상위 top_k 조합 주변만 간격을 절반씩 줄여 가며
+    1칸 간격까지 좁힙니다. 마지막에는 상위 조합의 바로 옆 칸을 더 나아지지 않을 때까지 확인합니다.
+    평가 횟수와 전체 탐색(itertools.product) 대비 절약률을 출력합니다.
+
+    params:
+      - coarse: (ma, rsi, 세 번째 파라미터) 축별 첫 격자 간격 (인덱스 기준, 예: range(20, 201, 1) 에서 5 = 5일)
+      - top_k: 단계마다 주변을 좁혀 볼 상위 조합 수
+      - verify: True 면 전체 탐색도 돌려 1등이 같은지 확인하고, 다르면 전체 탐색 결과를 돌려줌
+                (None 이면 환경변수 GRID_VERIFY=1 일 때만)
+      - time_budget: 제한 시간(초), 시간이 다 되면 남은 좁히기 단계를 건너뛰고 그때까지의 1등 (거친 격자는 항상 평가)
+    returns:
+      - grid_search() 와 같은 (best_params, best_value)
+    """
+    if verify is None:
+        verify = os.environ.get('GRID_VERIFY', '0') == '1'
+    deadline = time.monotonic() + time_budget if time_budget is not None else np.inf
+    ema, ma_idx, rsi_vals, third_vals, shape = _grid(arrays, ma_range, rsi_range, third_range)
+    total = int(np.prod(shape))
+    scores = np.full(total, np.nan)
+    seen = np.zeros(total, dtype=bool)
+
+    def run(flat, first=False):
+        # 거친 격자 이후 단계는 시간이 남아 있을 때만
+        if not first and time.monotonic() >= deadline:
+            return 0
+        flat = flat[~seen[flat]]
+        if len(flat):
+            scores[flat] = evaluate_combos(kind, arrays, ema, ma_idx[flat], rsi_vals[flat], third_vals[flat],
+                                           objective, years, max_drawdown, min_cagr)
+            seen[flat] = True
+        return len(flat)
+
+    def leaders():
+        # 평가한 조합 중 상위 top_k (동점이면 그리드 순서상 앞선 조합)
+        ranked = np.where(np.isnan(scores) | ~seen, -np.inf, scores)
+        order = np.lexsort((np.arange(total), -ranked))[:top_k]
+        return [np.unravel_index(i, shape) for i in order if ranked[i] > -np.inf]
+
+    # 1) 거친 격자 (축의 마지막 값도 포함)
+    stride = [max(1, min(int(s), n)) for s, n in zip(coarse, shape)]
+    axes = [np.union1d(np.arange(0, n, s), [n - 1]) for s, n in zip(stride, shape)]
+    mesh = np.meshgrid(*axes, indexing='ij')
+    run(np.ravel_multi_index([m.ravel() for m in mesh], shape), first=True)
+
+    # 2) 상위 조합 주변을 간격 절반씩 좁혀 가며 평가
+    while max(stride) > 1:
+        radius = stride
+        stride = [max(1, (s + 1) // 2) if s > 1 else 1 for s in stride]
+        run(_neighborhood(leaders(), radius, stride, shape))
+
+    # 3) 1칸 간격: 상위 조합 바로 옆에 더 좋은 조합이 없을 때까지
+    while run(_neighborhood(leaders(), (1, 1, 1), (1, 1, 1), shape)):
+        pass
+
+    best = pick_best(scores.reshape(shape), ma_range, rsi_range, third_range, names)
+    evaluated = int(seen.sum())
+    print(f"🔎 적응형 탐색: {evaluated:,} / {total:,}개 조합 평가 ({100 * (1 - evaluated / total):.1f}% 절약)"
+          + (" - 시간 제한으로 좁히기 중단" if time.monotonic() >= deadline else ""))
+
+    if verify:
+        full = evaluate_combos(kind, arrays, ema, ma_idx, rsi_vals, third_vals, objective, years, max_drawdown, min_cagr)
+        exact = pick_best(full.reshape(shape), ma_range, rsi_range, third_range, names)
+        if exact[0] == best[0]:
+            print("   ✅ 검증: 전체 탐색과 1등 조합이 같습니다.")
+        else:
+            print(f"   ⚠️ 검증: 전체 탐색 1등 {exact[0]} (적응형 {best[0]}) -> 전체 탐색 결과를 사용합니다.")
+            best = exact
+    return best
+
+# ==========================================
+# 연속 반감 탐색 (짧은 최근 구간 -> 전체 기간)
+# ==========================================
+def _recent(arrays, ema, bars):
+    # 최근 bars 일만 잘라낸 배열 (EMA 는 전체 기간으로 계산한 값을 그대로 사용)
+    return {key: value[-bars:] for key, value in arrays.items()}, ema[-bars:]
+
+def halving_search(kind, arrays, ma_range, rsi_range, third_range, names=('ma', 'rsi', 'buf'),
+                   eta=3, min_bars=504, objective='score', years=None, max_drawdown=None, min_cagr=None,
+                   time_budget=None):
+    """
+    연속 반감(successive halving) 탐색.
+    모든 조합을 가장 짧은 최근 구간으로 먼저 평가하고 상위 1/eta 만 남긴 뒤,
+    구간을 eta 배씩 늘려 다시 평가합니다. 마지막 단계는 전체 기간이므로 남은 조합의 점수는 grid_search 와 같습니다.
+    각 구간의 포지션은 구간 첫날 0 에서 시작합니다.
+
+    params:
+      - eta: 단계마다 남길 비율의 역수이자 구간 증가 배수
+      - min_bars: 첫 구간의 최소 길이 (기본 504 거래일 = 약 2년)
+      - time_budget: 제한 시간(초), 시간이 다 되면 남은 중간 구간을 건너뛰고 살아남은 조합을 바로 전체 기간으로 평가
+    returns:
+      - grid_search() 와 같은 (best_params, best_value)
+    """
+    deadline = time.monotonic() + time_budget if time_budget is not None else np.inf
+    ema, ma_idx, rsi_vals, third_vals, shape = _grid(arrays, ma_range, rsi_range, third_range)
+    n = len(arrays['price'])
+    total = int(np.prod(shape))
+    if years is None:
+        years = n / 252
+
+    # 전체 기간부터 eta 로 나눠 가며 구간 길이 결정 (짧은 것부터)
+    windows = [n]
+    while windows[-1] // eta >= min_bars and total // eta ** len(windows) >= 1:
+        windows.append(windows[-1] // eta)
+    windows = windows[::-1]
+
+    alive = np.arange(total)
+    work = 0
+    rungs = []
+    bars = windows[0]
+    while True:
+        part, part_ema = _recent(arrays, ema, bars)
+        scores = evaluate_combos(kind, part, part_ema, ma_idx[alive], rsi_vals[alive], third_vals[alive],
+                                 objective, years * bars / n, max_drawdown, min_cagr)
+        work += len(alive) * bars
+        rungs.append(bars)
+        if bars == n:
+            break
+        # 상위 1/eta 유지 (동점이면 그리드 순서상 앞선 조합, 탈락(NaN)은 제외)
+        ranked = np.where(np.isnan(scores), -np.inf, scores)
+        keep = max(1, int(np.ceil(len(alive) / eta)))
+        order = np.lexsort((alive, -ranked))[:keep]
+        order = order[ranked[order] > -np.inf]
+        if len(order) == 0:
+            return None, None
+        alive = np.sort(alive[order])
+        # 시간이 다 되면 남은 중간 구간을 건너뛰고 바로 전체 기간으로
+        bars = n if time.monotonic() >= deadline else windows[len(rungs)]
+
+    full = np.full(total, np.nan)
+    full[alive] = scores
+    print(f"✂️ 연속 반감 탐색: 구간 {' -> '.join(str(b) for b in rungs)}일, "
+          f"전체 기간 평가 {len(alive):,} / {total:,}개 조합 "
+          f"(계산량 {100 * work / (total * n):.1f}%)"
+          + (" - 시간 제한으로 중간 구간 생략" if len(rungs) < len(windows) else ""))
+    return pick_best(full.reshape(shape), ma_range, rsi_range, third_range, names)
+
+# ==========================================
+# 병렬 그리드 탐색 (프로세스 풀 + 공유 메모리)
+# ==========================================
+_worker = {}
+
+def _to_shared(arr, blocks):
+    # 배열을 공유 메모리 블록에 복사하고 (이름, dtype, shape)만 워커에 넘김
+    arr = np.ascontiguousarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    blocks.append(shm)
+    return shm.name, arr.dtype.str, arr.shape
+
+def _from_shared(name, dtype, shape):
+    # 블록 정리(unlink)는 부모 프로세스가 담당
+    shm = shared_memory.SharedMemory(name=name)
+    _worker.setdefault('blocks', []).append(shm)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+def _init_worker(kind, specs, rsi_vals, third_vals, shape, objective='score', years=None,
+                 max_drawdown=None, min_cagr=None):
+    arrays = {key: _from_shared(*spec) for key, spec in specs.items()}
+    _worker.update(kind=kind, ema=arrays.pop('ema'), arrays=arrays,
+                   rsi_vals=rsi_vals, third_vals=third_vals, shape=shape,
+                   objective=objective, years=years, max_drawdown=max_drawdown, min_cagr=min_cagr)
+
+def _score_chunk(start, stop):
+    # 워커는 구간 안의 1등 (그리드 인덱스, 점수)만 돌려줌
+    i, j, k = np.unravel_index(np.arange(start, stop), _worker['shape'])
+    combo = (_worker['kind'], _worker['arrays'], _worker['ema'], i, _worker['rsi_vals'][j], _worker['third_vals'][k])
+    scores = evaluate_combos(*combo, _worker['objective'], _worker['years'], _worker['max_drawdown'], _worker['min_cagr'])
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    best = int(np.argmax(scores))
+    return start + best, float(scores[best])
+
+def _score_rows(bounds):
+    # 체크포인트용: 구간 전체 점수를 돌려줌
+    start, stop = bounds
+    i, j, k = np.unravel_index(np.arange(start, stop), _worker['shape'])
+    combo = (_worker['kind'], _worker['arrays'], _worker['ema'], i, _worker['rsi_vals'][j], _worker['third_vals'][k])
+    return start, evaluate_combos(*combo, _worker['objective'], _worker['years'], _worker['max_drawdown'], _worker['min_cagr'])
+
+def parallel_grid_search(kind, arrays, ma_range, rsi_range, third_range, names=('ma', 'rsi', 'buf'), workers=None,
+                         objective='score', years=None, max_drawdown=None, min_cagr=None, checkpoint=False):
+    """
+    그리드를 연속 구간으로 나눠 프로세스 풀에서 평가합니다.
+    가격/지표 배열은 공유 메모리로 한 번만 올리고, 워커는 (그리드 인덱스, 점수)만 돌려줍니다.
+    동점이면 그리드 순서상 앞선 조합을 고르므로 워커 수와 관계없이 결과가 같습니다.
+    checkpoint=True 면 워커가 구간 점수 전체를 돌려주고 grid_search 와 같은 체크포인트로 저장/복구합니다.
+    """
+    ma_list, rsi_list, third_list = list(ma_range), list(rsi_range), list(third_range)
+    shape = (len(ma_list), len(rsi_list), len(third_list))
+    total = shape[0] * shape[1] * shape[2]
+    workers = workers or os.cpu_count() or 1
+
+    n_chunks = min(total, workers * 4)
+    bounds = np.linspace(0, total, n_chunks + 1).astype(int)
+    chunks = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    blocks = []
+    try:
+        specs = {key: _to_shared(arrays[key], blocks) for key in arrays}
+        specs['ema'] = _to_shared(ema_matrix(arrays['price'], ma_list), blocks)
+        init_args = (kind, specs, np.asarray(rsi_list, dtype=np.float64),
+                     np.asarray(third_list, dtype=np.float64), shape, objective, years, max_drawdown, min_cagr)
+
+        with multiprocessing.get_context().Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+            if checkpoint:
+                key = checkpoint_key(kind, arrays, ma_list, rsi_list, third_list, objective, years,
+                                     max_drawdown, min_cagr)
+                scores = _run_checkpointed(key, total, _checkpoint_chunks(shape),
+                                           lambda todo: pool.imap_unordered(_score_rows, todo))
+            else:
+                results = pool.starmap(_score_chunk, chunks)
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    if checkpoint:
+        return pick_best(scores.reshape(shape), ma_list, rsi_list, third_list, names)
+
+    # 리듀스: 최고 점수, 동점이면 작은 인덱스
+    best_index, best_score = max(results, key=lambda item: (item[1], -item[0]))
+    if best_score == -np.inf:
+        return None, None
+    i, j, k = np.unravel_index(best_index, shape)
+    return dict(zip(names, (ma_list[i], rsi_list[j], third_list[k]))), best_score
@@ -1,9 +1,10 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
 import time
+from data_cache import load_prices
+from engine import extract_arrays
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
@@ -17,13 +18,7 @@ def get_orcl_data():
     tickers = ['ORCL', 'SHY'] 
     
     # [변경됨] 기간을 2004년(약 20년 전)으로 설정
-    df = yf.download(tickers, start="2004-01-01", progress=False)
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            df = df['Close']
-        except:
-            df.columns = df.columns.get_level_values(0)
+    df = load_prices(tickers, start="2004-01-01")
     
     df = df.dropna()
     
@@ -154,49 +149,52 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("="*60)
 
 # ==========================================
-# 4. 실행부
+# 4. 최적화 + 결과 리포트 (run_all.py 에서도 사용)
+# ==========================================
+# 오라클은 무거운 주식이므로 파라미터 범위를 넓게 잡음
+ma_range = range(20, 201, 1)   
+rsi_range = range(70, 96, 2)   
+buffer_range = [0.0, 0.01, 0.02, 0.03, 0.04] 
+
+def optimize(df_raw):
+    arrays = extract_arrays(df_raw, price='ORCL', ret_lev='Sim_ORCL_2X')
+    return grid_search('pyramid', arrays, ma_range, rsi_range, buffer_range, ticker='ORCL')
+
+def report(df_raw, best_params):
+    # 최적 결과로 최종 실행
+    final_score, df_final = run_orcl_strategy(
+        df_raw, 
+        best_params['ma'], 
+        best_params['rsi'], 
+        best_params['buf']
+    )
+
+    # 결과 분석
+    analyze_today(
+        df_final, 
+        best_params['ma'], 
+        best_params['rsi'], 
+        best_params['buf'],
+        final_score
+    )
+
+# ==========================================
+# 5. 실행부
 # ==========================================
 if __name__ == "__main__":
     # 데이터 수집 (20년치)
     df_raw = get_orcl_data()
     
-    # 오라클은 무거운 주식이므로 파라미터 범위를 넓게 잡음
-    ma_range = range(20, 201, 1)   
-    rsi_range = range(70, 96, 2)   
-    buffer_range = [0.0, 0.01, 0.02, 0.03, 0.04] 
-    
     total_combinations = len(ma_range) * len(rsi_range) * len(buffer_range)
     
     print(f"\n⚡ 최적 시나리오 분석 시작...")
     print(f"   - 총 시나리오: {total_combinations:,}개")
     
     start_time = time.time()
-    best_score = -999
-    best_params = {}
     
     # 20년 데이터라 루프가 조금 더 오래 걸릴 수 있습니다 (약 10~30초 예상)
-    for ma, rsi, buf in itertools.product(ma_range, rsi_range, buffer_range):
-        score, _ = run_orcl_strategy(df_raw.copy(), ma, rsi, buf)
-        
-        if score > best_score:
-            best_score = score
-            best_params = {'ma': ma, 'rsi': rsi, 'buf': buf}
+    best_params, best_score = optimize(df_raw)
             
     print(f"\n✅ 완료! (소요시간: {time.time() - start_time:.1f}초)")
     
-    # 최적 결과로 최종 실행
-    final_score, df_final = run_orcl_strategy(
-        df_raw, 
-        best_params['ma'], 
-        best_params['rsi'], 
-        best_params['buf']
-    )
-    
-    # 결과 분석
-    analyze_today(
-        df_final, 
-        best_params['ma'], 
-        best_params['rsi'], 
-        best_params['buf'],
-        final_score
-    )
\ No newline at end of file
+    report(df_raw, best_params)
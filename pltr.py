@@ -1,19 +1,13 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
 import time
-from fredapi import Fred
+from data_cache import load_all
+from engine import extract_arrays
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
-# ==========================================
-# 0. 설정 및 API 키
-# ==========================================
-FRED_API_KEY = 'b00d0e909d7e2e38815b8fbf62461695'
-fred = Fred(api_key=FRED_API_KEY)
-
 # ==========================================
 # 1. 데이터 수집 (PLTR + FRED 금리차)
 # ==========================================
@@ -22,22 +16,18 @@ def get_combined_data():
     
     # 1. PLTR & SHY 데이터 (Yahoo Finance)
     tickers = ['PLTR', 'SHY']
-    df = yf.download(tickers, start="2020-09-30", progress=False)
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        df = df['Close']
+    # 2. FRED 데이터 (장단기 금리차: T10Y2Y) 도 함께 동시 수집
+    df, macro = load_all(tickers, start="2020-09-30", fred_ids=['T10Y2Y'])
     
     df = df.dropna()
     
-    # 2. FRED 데이터 (장단기 금리차: T10Y2Y)
     # 장단기 금리차가 역전되거나 급변할 때 리스크 관리용
-    try:
-        fred_data = fred.get_series('T10Y2Y', observation_start='2020-09-30')
-        df['Yield_Curve'] = fred_data
+    if 'T10Y2Y' in macro:
+        df['Yield_Curve'] = macro['T10Y2Y']
         # 주말 등 데이터 공백 메우기
-        df['Yield_Curve'] = df['Yield_Curve'].fillna(method='ffill')
-    except Exception as e:
-        print(f"⚠️ FRED 데이터를 가져오지 못했습니다: {e}")
+        df['Yield_Curve'] = df['Yield_Curve'].ffill()
+    else:
+        print("⚠️ FRED 데이터를 가져오지 못했습니다.")
         df['Yield_Curve'] = 1.0 # 기본값 (정상 상황 가정)
 
     # [데이터 가공]
@@ -154,26 +144,29 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("="*60)
 
 # ==========================================
-# 4. 실행부
+# 4. 최적화 + 결과 리포트 (run_all.py 에서도 사용)
+# ==========================================
+# 파라미터 최적화 범위 (속도를 위해 조정 가능)
+ma_range = range(50, 150, 10) # EMA 범위 축소
+rsi_range = [75, 80, 85]
+buffer_range = [0.02, 0.04]
+
+def optimize(df_raw):
+    arrays = extract_arrays(df_raw, price='PLTR', ret_lev='Sim_PLTR_2X', macro='Yield_Curve')
+    return grid_search('pltr', arrays, ma_range, rsi_range, buffer_range, ticker='PLTR')
+
+def report(df_raw, best_params):
+    final_score, df_final = run_pltr_strategy(df_raw, best_params['ma'], best_params['rsi'], best_params['buf'])
+    analyze_today(df_final, best_params['ma'], best_params['rsi'], best_params['buf'], final_score)
+
+# ==========================================
+# 5. 실행부
 # ==========================================
 if __name__ == "__main__":
     df_raw = get_combined_data()
     
-    # 파라미터 최적화 범위 (속도를 위해 조정 가능)
-    ma_range = range(50, 150, 10) # EMA 범위 축소
-    rsi_range = [75, 80, 85]
-    buffer_range = [0.02, 0.04]
-    
-    best_score = -999
-    best_params = {}
-    
     print(f"⚡ 거시 지표 결합 최적 시나리오 탐색 중...")
     
-    for ma, rsi, buf in itertools.product(ma_range, rsi_range, buffer_range):
-        score, _ = run_pltr_strategy(df_raw.copy(), ma, rsi, buf)
-        if score > best_score:
-            best_score = score
-            best_params = {'ma': ma, 'rsi': rsi, 'buf': buf}
+    best_params, best_score = optimize(df_raw)
             
-    final_score, df_final = run_pltr_strategy(df_raw, best_params['ma'], best_params['rsi'], best_params['buf'])
-    analyze_today(df_final, best_params['ma'], best_params['rsi'], best_params['buf'], final_score)
\ No newline at end of file
+    report(df_raw, best_params)
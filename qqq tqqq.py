@@ -1,40 +1,28 @@
-import yfinance as yf
-from fredapi import Fred
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
+import sys
 import time
+from data_cache import load_all
+from engine import extract_arrays, span_years
+from incremental import build_state, run_update, save_state
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
-# ==========================================
-# 0. 설정 (FRED API 키 입력 필수)
-# ==========================================
-
-FRED_API_KEY = 'b00d0e909d7e2e38815b8fbf62461695'
 # ==========================================
 # 1. 데이터 수집 (QQQ + FRED 하이일드 결합)
 # ==========================================
-def get_combined_data():
+def get_combined_data(start="2006-01-01"):
     print("⏳ 데이터 수집 중... (QQQ + 하이일드 스프레드)")
     
     # 1. 주식 데이터 (QQQ, SHY)
     tickers = ['QQQ', 'SHY']
-    df = yf.download(tickers, start="2006-01-01", progress=False)
-    
-    # 멀티인덱스 컬럼 처리
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            df = df['Close']
-        except:
-            df.columns = df.columns.get_level_values(0)
+    # 2. FRED 데이터 (BAMLH0A0HYM2: 하이일드 스프레드) 도 함께 동시 수집
+    df, macro = load_all(tickers, start=start, fred_ids=['BAMLH0A0HYM2'])
     
-    # 2. FRED 데이터 (하이일드 스프레드)
     try:
-        fred = Fred(api_key=FRED_API_KEY)
-        # BAMLH0A0HYM2: 하이일드 스프레드
-        spread = fred.get_series('BAMLH0A0HYM2', observation_start="2006-01-01")
+        spread = macro['BAMLH0A0HYM2']
         spread.name = 'HighYield_Spread'
         
         # 인덱스 시간대 제거 (YFinance와 병합 위해)
@@ -45,11 +33,11 @@ def get_combined_data():
         df = df.join(spread, how='inner')
         
         # 결측치 채우기 (휴일 등으로 빈 FRED 데이터는 전일 데이터로 채움)
-        df['HighYield_Spread'] = df['HighYield_Spread'].fillna(method='ffill')
+        df['HighYield_Spread'] = df['HighYield_Spread'].ffill()
         
     except Exception as e:
         print(f"⚠️ FRED 데이터 로드 실패: {e}")
-        print("API 키를 확인하거나 인터넷 연결을 확인하세요.")
+        print("인터넷 연결을 확인하세요.")
         return pd.DataFrame() # 빈 데이터프레임 반환으로 중단
 
     df = df.dropna()
@@ -142,25 +130,24 @@ def run_tqqq_strategy(df, ma_period, rsi_limit, sell_buffer):
 # ==========================================
 # 3. 결과 분석
 # ==========================================
-def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
-    last_row = df.iloc[-1]
-    
+# 리포트는 전략 상태 스냅샷(incremental.build_state)으로 출력 (전체 실행 / 일일 업데이트 공용)
+def analyze_today(state):
     # 현재 상태 데이터
-    price = last_row['QQQ']
-    ma_val = df['QQQ'].ewm(span=ma_period, adjust=False).mean().iloc[-1]
+    price = state['last']['QQQ']
+    ma_val = state['ema']
     
     # FRED 상태
-    current_spread = last_row['HighYield_Spread']
-    spread_ma = last_row['Spread_MA20']
-    is_macro_risk = last_row['Macro_Risk_Off']
+    current_spread = state['last']['HighYield_Spread']
+    spread_ma = state['last']['Spread_MA20']
+    is_macro_risk = bool(state['last']['Macro_Risk_Off'])
     
     # 성과 분석
-    start_date = df.index[0]
-    end_date = df.index[-1]
+    total_score = state['equity']
+    start_date = pd.Timestamp(state['start'])
+    end_date = pd.Timestamp(state['end'])
     years = (end_date - start_date).days / 365.25
     cagr = (total_score ** (1 / years)) - 1
-    cum_ret = (1 + df['Strategy_Ret']).cumprod()
-    mdd = ((cum_ret - cum_ret.cummax()) / cum_ret.cummax()).min()
+    mdd = state['mdd']
     
     print("\n" + "="*60)
     print(f"📊 [FRED 하이일드 필터 + TQQQ 전략 결과]")
@@ -183,7 +170,7 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("-" * 60)
     
     # 최종 행동 권고
-    strategy_target_pos = last_row['Strategy_Pos']
+    strategy_target_pos = state['pos']
     action_msg = ""
     
     if strategy_target_pos == 0.0:
@@ -198,44 +185,75 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("="*60)
 
 # ==========================================
-# 4. 실행부
+# 4. 최적화 + 결과 리포트 (run_all.py 에서도 사용)
 # ==========================================
-if __name__ == "__main__":
-    # 데이터 수집 (API 키 필요)
-    if FRED_API_KEY == 'YOUR_FRED_API_KEY_HERE':
-        print("❌ 오류: 스크립트 상단에 FRED API 키를 입력해주세요!")
-    else:
+# 최적화 범위 (예시)
+ma_range = range(20, 201, 1)    # 굵직한 추세만 확인
+rsi_range = range(70, 90, 1)         # 과열 기준
+buffer_range = [0.0, 0.01, 0.02, 0.03]   # 휩소 방지 버퍼
+
+# 제약 조건 (None 이면 사용 안 함) - 조건을 어긴 것이 확실해지는 순간 그 조합은 시뮬레이션을 멈추고 탈락
+max_drawdown = None   # 예: -0.6 -> MDD 가 -60% 보다 나빠지는 조합 제외
+min_cagr = None       # 예: 0.2  -> CAGR 20% 미만 조합 제외
+
+# 일일 업데이트용 상태 정의 (incremental.build_state 참고)
+STATE_SPEC = {
+    'kind': 'tqqq', 'price': 'QQQ', 'macro': 'Macro_Risk_Off',
+    'columns': ['QQQ', 'SHY', 'HighYield_Spread', 'Spread_MA20', 'Macro_Risk_Off'],
+    'returns': {'ret_lev': ('QQQ', 3.0), 'ret_cash': ('SHY', 1.0)},
+}
+
+def optimize(df_raw):
+    arrays = extract_arrays(df_raw, price='QQQ', ret_lev='Sim_TQQQ_3X', macro='Macro_Risk_Off')
+    return grid_search('tqqq', arrays, ma_range, rsi_range, buffer_range,
+                       years=span_years(df_raw), max_drawdown=max_drawdown, min_cagr=min_cagr, ticker='QQQ')
+
+def report(df_raw, best_params):
+    # 최적 결과 실행
+    final_score, df_final = run_tqqq_strategy(
+        df_raw, 
+        best_params['ma'], 
+        best_params['rsi'], 
+        best_params['buf']
+    )
+
+    # 상태 스냅샷 저장 (다음 update 의 출발점)
+    state = build_state(STATE_SPEC, df_final, best_params, final_score)
+    save_state('qqq_tqqq', state)
+    analyze_today(state)
+
+def update():
+    # 저장된 스냅샷에 새 봉만 반영 (파라미터는 마지막 최적화 결과 그대로)
+    # Risk-Off 필터는 get_combined_data 가 최근 구간으로 계산한 값을 그대로 사용
+    def full_run(params):
         df_raw = get_combined_data()
+        params = params or optimize(df_raw)[0]
+        if params is None:
+            print("⚠️ 제약 조건(max_drawdown / min_cagr)을 만족하는 조합이 없습니다.")
+        else:
+            report(df_raw, params)
+    return run_update('qqq_tqqq', get_combined_data, full_run, analyze_today)
+
+# ==========================================
+# 5. 실행부
+# ==========================================
+if __name__ == "__main__":
+    # 사용법: python "qqq tqqq.py"         -> 전체 최적화 + 리포트
+    #         python "qqq tqqq.py" update  -> 저장된 상태에 새 봉만 반영해서 리포트
+    if sys.argv[1:] == ['update']:
+        update()
+        sys.exit()
+
+    # 데이터 수집
+    df_raw = get_combined_data()
+    
+    if not df_raw.empty:
+        print(f"\n⚡ FRED 필터 적용 후 최적 파라미터 탐색 중...")
         
-        if not df_raw.empty:
-            # 최적화 범위 (예시)
-            ma_range = range(20, 201, 1)    # 굵직한 추세만 확인
-            rsi_range = range(70, 90, 1)         # 과열 기준
-            buffer_range = [0.0, 0.01, 0.02, 0.03]   # 휩소 방지 버퍼
-            
-            print(f"\n⚡ FRED 필터 적용 후 최적 파라미터 탐색 중...")
-            
-            best_score = -999
-            best_params = {}
-            
-            for ma, rsi, buf in itertools.product(ma_range, rsi_range, buffer_range):
-                score, _ = run_tqqq_strategy(df_raw.copy(), ma, rsi, buf)
-                if score > best_score:
-                    best_score = score
-                    best_params = {'ma': ma, 'rsi': rsi, 'buf': buf}
-            
-            # 최적 결과 실행
-            final_score, df_final = run_tqqq_strategy(
-                df_raw, 
-                best_params['ma'], 
-                best_params['rsi'], 
-                best_params['buf']
-            )
-            
-            analyze_today(
-                df_final, 
-                best_params['ma'], 
-                best_params['rsi'], 
-                best_params['buf'],
-                final_score
-            )
\ No newline at end of file
+        
+        best_params, best_score = optimize(df_raw)
+        
+        if best_params is None:
+            print("⚠️ 제약 조건(max_drawdown / min_cagr)을 만족하는 조합이 없습니다.")
+        else:
+            report(df_raw, best_params)
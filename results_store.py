@@ -0,0 +1,213 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine import METRICS
+
+# ==========================================
+# 0. 설정
+# ==========================================
+# 결과 DB 파일 (기본: 스크립트 폴더의 .results/results.sqlite)
+RESULTS_DB = os.environ.get(
+    'RESULTS_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.results', 'results.sqlite'),
+)
+# 다른 프로세스가 쓰는 중이면 기다릴 최대 시간(초) (run_all / 스크립트 동시 실행)
+BUSY_TIMEOUT = float(os.environ.get('RESULTS_BUSY_TIMEOUT', 120))
+# 종목/전략별로 남겨 둘 데이터 버전 수 (오래된 버전부터 삭제)
+KEEP_RUNS = int(os.environ.get('RESULTS_KEEP_RUNS', 3))
+
+PARAMS = ('ma', 'rsi', 'p3')
+COLUMNS = PARAMS + METRICS
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    years REAL NOT NULL,
+    bars INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (ticker, kind, digest, years)
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL,
+    {', '.join(f'{col} REAL' for col in COLUMNS)},
+    PRIMARY KEY (run_id, ma, rsi, p3)
+) WITHOUT ROWID;
+{''.join(f'CREATE INDEX IF NOT EXISTS results_{m} ON results (run_id, {m});' for m in METRICS)}
+"""
+
+# ==========================================
+# 1. 데이터 버전 (입력 배열 내용 해시)
+# ==========================================
+def data_digest(arrays):
+    """커널 입력 배열 전체의 해시. 봉이 하나만 늘거나 과거 값이 바뀌어도 다른 값이 되므로 옛 결과를 섞어 쓰지 않습니다."""
+    h = hashlib.sha1()
+    for key in sorted(arrays):
+        arr = np.ascontiguousarray(arrays[key])
+        h.update(f"{key}:{arr.dtype}:{arr.shape}".encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+def _years(arrays, years):
+    # summarize_stats 와 같은 기본값 (1년 = 252 거래일)
+    return float(years) if years is not None else len(arrays['price']) / 252
+
+def connect(path=None):
+    path = path or RESULTS_DB
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+# ==========================================
+# 2. 저장 (그리드 전체를 한 트랜잭션으로 일괄 입력)
+# ==========================================
+def _grid_rows(ma_range, rsi_range, third_range):
+    grid = np.meshgrid(np.asarray(list(ma_range), dtype=np.float64), np.asarray(list(rsi_range), dtype=np.float64),
+                       np.asarray(list(third_range), dtype=np.float64), indexing='ij')
+    return np.column_stack([g.ravel() for g in grid])
+
+def save_results(ticker, kind, arrays, ma_range, rsi_range, third_range, metrics, years=None, path=None):
+    """
+    그리드의 모든 조합 (ma, rsi, p3, METRICS...) 을 저장합니다.
+    같은 (종목, 전략, 데이터 버전, 기간) 이 이미 있으면 그 버전에 합치고(같은 조합은 덮어씀),
+    종목/전략별로 최근 KEEP_RUNS 개 버전만 남깁니다.
+
+    params:
+      - ticker: 종목 이름 (예: 'SOXX')
+      - metrics: grid_metrics() 결과 ((..., len(METRICS)) 배열, 그리드 순서)
+    returns: run_id
+    """
+    rows = np.column_stack([_grid_rows(ma_range, rsi_range, third_range),
+                            np.asarray(metrics, dtype=np.float64).reshape(-1, len(METRICS))])
+    years = _years(arrays, years)
+    digest = data_digest(arrays)
+
+    with connect(path) as conn:
+        conn.execute(
+            'INSERT OR IGNORE INTO runs (ticker, kind, digest, years, bars, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (ticker, kind, digest, years, len(arrays['price']), time.time()),
+        )
+        run_id = conn.execute('SELECT run_id FROM runs WHERE ticker = ? AND kind = ? AND digest = ? AND years = ?',
+                              (ticker, kind, digest, years)).fetchone()[0]
+        conn.execute('UPDATE runs SET created_at = ? WHERE run_id = ?', (time.time(), run_id))
+        # NaN(조건 탈락 등)은 NULL 로 저장
+        values = [(run_id, *[None if v != v else v for v in row]) for row in rows.tolist()]
+        conn.executemany(
+            f"INSERT OR REPLACE INTO results (run_id, {', '.join(COLUMNS)}) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+            values,
+        )
+
+        old = [r[0] for r in conn.execute(
+            'SELECT run_id FROM runs WHERE ticker = ? AND kind = ? ORDER BY created_at DESC LIMIT -1 OFFSET ?',
+            (ticker, kind, KEEP_RUNS),
+        )]
+        if old:
+            marks = ', '.join('?' * len(old))
+            conn.execute(f'DELETE FROM results WHERE run_id IN ({marks})', old)
+            conn.execute(f'DELETE FROM runs WHERE run_id IN ({marks})', old)
+    conn.close()
+    return run_id
+
+def load_results(ticker, kind, arrays, ma_range, rsi_range, third_range, years=None, path=None):
+    """
+    지금 데이터(arrays 해시)로 저장된 결과가 그리드 전체를 덮으면 grid_metrics() 와 같은 모양으로 돌려주고,
+    하나라도 빠졌으면 None 을 돌려줍니다 (다시 계산해야 함).
+    """
+    if not os.path.exists(path or RESULTS_DB):
+        return None
+    grid = _grid_rows(ma_range, rsi_range, third_range)
+    shape = (len(list(ma_range)), len(list(rsi_range)), len(list(third_range)), len(METRICS))
+
+    with connect(path) as conn:
+        run = conn.execute('SELECT run_id FROM runs WHERE ticker = ? AND kind = ? AND digest = ? AND years = ?',
+                           (ticker, kind, data_digest(arrays), _years(arrays, years))).fetchone()
+        if run is None:
+            return None
+        stored = pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM results WHERE run_id = ?", conn, params=(run[0],))
+    conn.close()
+
+    table = pd.DataFrame(grid, columns=list(PARAMS)).merge(stored, on=list(PARAMS), how='left', indicator=True)
+    # 지표 NaN(조건 탈락)과 구분하려고 행 존재 여부로 확인
+    if not (table['_merge'] == 'both').all():
+        return None
+    return table[list(METRICS)].to_numpy(dtype=np.float64).reshape(shape)
+
+# ==========================================
+# 3. 조회 (재계산 없이)
+# ==========================================
+def query(ticker, where=None, params=(), order_by=None, limit=None, kind=None, arrays=None, path=None):
+    """
+    저장된 결과를 DataFrame 으로 조회합니다.
+
+    params:
+      - where: SQL 조건 (컬럼: ma, rsi, p3, score, cagr, mdd, vol, sharpe, exposure)
+               예: 'mdd > ?', params=(-0.4,)  /  'ma = ?', params=(120,)
+      - order_by: 정렬 (예: 'cagr DESC')
+      - arrays: 주면 그 데이터와 내용이 똑같은 버전만, 없으면 종목의 가장 최근 버전만 조회
+    """
+    if not os.path.exists(path or RESULTS_DB):
+        return pd.DataFrame(columns=['ticker', 'kind', *COLUMNS])
+    run_sql = 'SELECT run_id FROM runs WHERE ticker = ?'
+    run_args = [ticker]
+    if kind is not None:
+        run_sql += ' AND kind = ?'
+        run_args.append(kind)
+    if arrays is not None:
+        run_sql += ' AND digest = ?'
+        run_args.append(data_digest(arrays))
+    run_sql += ' ORDER BY created_at DESC LIMIT 1'
+
+    sql = (f"SELECT runs.ticker, runs.kind, {', '.join(COLUMNS)} FROM results JOIN runs USING (run_id) "
+           f"WHERE run_id = ({run_sql})")
+    if where:
+        sql += f" AND ({where})"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    with connect(path) as conn:
+        df = pd.read_sql_query(sql, conn, params=[*run_args, *params])
+    conn.close()
+    return df
+
+def top_results(ticker, by='cagr', n=20, max_drawdown=None, kind=None, arrays=None, path=None):
+    """예: top_results('SOXX', 'cagr', 20, max_drawdown=0.4) -> MDD 가 -40% 보다 나은 조합 중 CAGR 상위 20개"""
+    if by not in METRICS:
+        raise ValueError(f"by 는 {METRICS} 중 하나여야 합니다: {by}")
+    where, params = None, ()
+    if max_drawdown is not None:
+        where, params = 'mdd > ?', (-abs(max_drawdown),)
+    order = 'ASC' if by == 'vol' else 'DESC'
+    return query(ticker, where, params, f"{by} {order}", n, kind, arrays, path)
+
+# ==========================================
+# 4. 실행부 (명령줄 조회)
+# ==========================================
+if __name__ == "__main__":
+    # 사용법: python results_store.py SOXX --by cagr --top 20 --max-drawdown 0.4
+    #         python results_store.py NVDA --where "ma = 120"
+    parser = argparse.ArgumentParser(description="저장된 그리드 탐색 결과 조회")
+    parser.add_argument('ticker')
+    parser.add_argument('--by', default='cagr', choices=METRICS)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--max-drawdown', type=float)
+    parser.add_argument('--where', help="SQL 조건 (예: \"ma = 120 AND rsi >= 80\")")
+    args = parser.parse_args()
+
+    if args.where:
+        result = query(args.ticker, args.where, order_by=f"{args.by} DESC", limit=args.top)
+    else:
+        result = top_results(args.ticker, args.by, args.top, args.max_drawdown)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(result if len(result) else f"⚠️ {args.ticker}: 저장된 결과가 없습니다.")
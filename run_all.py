@@ -0,0 +1,129 @@
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import time
+import warnings
+
+from data_cache import load_all
+
+warnings.filterwarnings("ignore")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ==========================================
+# 0. 실행 대상
+# ==========================================
+# (스크립트 파일, 데이터 수집 함수 이름)
+STRATEGIES = [
+    ('nvda.py', 'get_combined_data'),
+    ('lly.py', 'get_combined_data'),
+    ('nflx.py', 'get_combined_data'),
+    ('unh.py', 'get_combined_data'),
+    ('indy.py', 'get_combined_data'),
+    ('ucyb.py', 'get_combined_data'),
+    ('ether.py', 'get_combined_data'),
+    ('soxx.py', 'get_soxx_data'),
+    ('avgo.py', 'get_avgo_data'),
+    ('msft.py', 'get_msft_data'),
+    ('oracle.py', 'get_orcl_data'),
+    ('btc.py', 'get_btc_data'),
+    ('pltr.py', 'get_combined_data'),
+    ('qqq tqqq.py', 'get_combined_data'),
+]
+
+# 모든 스크립트가 쓰는 시계열을 처음에 한 번만 동시 다운로드
+# (SHY, T10Y2Y 처럼 여러 스크립트가 공유하는 데이터 포함, 이후에는 로컬 캐시에서 읽음)
+PREFETCH_TICKERS = [
+    'NVDA', 'LLY', 'NFLX', 'UNH', 'INDY', 'CIBR', 'ETH-USD', 'SOXX',
+    'AVGO', 'MSFT', 'ORCL', 'BTC-USD', 'PLTR', 'QQQ', 'SHY',
+]
+PREFETCH_FRED = ['T10Y2Y', 'BAMLH0A0HYM2']
+PREFETCH_START = "2004-01-01"
+
+# ==========================================
+# 1. 스크립트 로드 (파일명에 공백이 있어도 import 가능하도록)
+# ==========================================
+def load_script(filename):
+    name = os.path.splitext(filename)[0].replace(' ', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(BASE_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# ==========================================
+# 2. 배치 실행
+# ==========================================
+def run_all(strategies):
+    """
+    스크립트별로 데이터 준비 -> optimize -> report 를 한 프로세스에서 차례로 실행합니다.
+    analyze_today 리포트는 모아 두었다가 (파일명, 리포트 문자열) 목록으로 돌려줍니다.
+    한 스크립트가 실패해도 나머지는 계속 진행합니다.
+    """
+    reports = []
+    for i, (filename, loader) in enumerate(strategies, 1):
+        print(f"\n▶ [{i}/{len(strategies)}] {filename}")
+        start_time = time.time()
+        try:
+            module = load_script(filename)
+            df_raw = getattr(module, loader)()
+            if df_raw is None or df_raw.empty:
+                print(f"⚠️ {filename}: 데이터가 없어 건너뜁니다.")
+                continue
+
+            best_params, best_score = module.optimize(df_raw)
+            if best_params is None:
+                print(f"⚠️ {filename}: 제약 조건을 만족하는 조합이 없어 건너뜁니다.")
+                continue
+
+            buf = io.StringIO()
+            with contextlib.redirect_stdout(buf):
+                module.report(df_raw, best_params)
+            reports.append((filename, buf.getvalue()))
+        except Exception as e:
+            print(f"❌ {filename} 실패: {e}")
+            continue
+
+        print(f"✅ 최적화 완료 (소요시간: {time.time() - start_time:.1f}초)")
+    return reports
+
+def update_all(strategies):
+    """
+    update() 가 있는 스크립트(저장된 전략 상태에 새 봉만 반영)만 차례로 실행합니다.
+    그리드 재최적화 없이 마지막 최적화 파라미터로 오늘의 리포트를 냅니다.
+    """
+    for filename, _ in strategies:
+        try:
+            module = load_script(filename)
+            if not hasattr(module, 'update'):
+                continue
+            print(f"\n▶ {filename}")
+            module.update()
+        except Exception as e:
+            print(f"❌ {filename} 실패: {e}")
+
+# ==========================================
+# 3. 실행부
+# ==========================================
+if __name__ == "__main__":
+    # 사용법: python run_all.py                -> 전체 실행
+    #         python run_all.py nvda soxx      -> 일부만 실행
+    #         python run_all.py --update       -> 일일 업데이트 (update() 가 있는 스크립트만)
+    names = [name for name in sys.argv[1:] if name != '--update']
+    strategies = [s for s in STRATEGIES if not names or os.path.splitext(s[0])[0] in names]
+
+    if '--update' in sys.argv[1:]:
+        update_all(strategies)
+        sys.exit()
+
+    total_start = time.time()
+    print(f"⏳ 공용 데이터 수집 중... (티커 {len(PREFETCH_TICKERS)}개 + FRED {len(PREFETCH_FRED)}개)")
+    load_all(PREFETCH_TICKERS, PREFETCH_START, fred_ids=PREFETCH_FRED)
+
+    reports = run_all(strategies)
+
+    print(f"\n🏁 전체 완료: {len(reports)}/{len(strategies)}개 전략 (총 소요시간: {time.time() - total_start:.1f}초)")
+    for filename, text in reports:
+        print(f"\n📄 {filename}")
+        print(text, end='')
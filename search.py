@@ -0,0 +1,254 @@
+import itertools
+import os
+import time
+
+import numpy as np
+
+from indicators import ema_matrix
+from memo import fingerprint, memoize
+from optimizer import evaluate_combos
+
+# ==========================================
+# 0. 탐색 공간
+# ==========================================
+# 파라미터 이름 -> 후보
+#   - 리스트 / range : 이산 파라미터 (순서 있는 값, 예: 'ma': range(20, 201))
+#   - (하한, 상한) 튜플 : 연속 파라미터 (예: 'buf': (0.0, 0.06), 'vix': (25.0, 45.0))
+# 연속 파라미터는 격자로 쪼개지 않으므로 탐색 공간을 넓혀도 평가 횟수(budget)는 그대로입니다.
+def _is_continuous(values):
+    return isinstance(values, tuple)
+
+def _to_unit(space, params):
+    # 파라미터 튜플 목록 -> [0, 1] 정규화 좌표 (이산은 인덱스 기준)
+    cols = []
+    for d, values in enumerate(space.values()):
+        x = np.array([p[d] for p in params], dtype=np.float64)
+        if _is_continuous(values):
+            low, high = values
+            cols.append((x - low) / (high - low) if high > low else np.zeros(len(x)))
+        else:
+            values = list(values)
+            idx = np.array([values.index(v) for v in x.tolist()], dtype=np.float64)
+            cols.append(idx / (len(values) - 1) if len(values) > 1 else np.zeros(len(x)))
+    return np.column_stack(cols) if cols else np.empty((len(params), 0))
+
+def _from_unit(space, unit):
+    # [0, 1] 좌표 -> 파라미터 튜플 목록 (이산은 가장 가까운 후보, 연속은 범위 안으로 자름)
+    unit = np.clip(unit, 0.0, 1.0)
+    cols = []
+    for d, values in enumerate(space.values()):
+        if _is_continuous(values):
+            low, high = values
+            cols.append([float(v) for v in low + unit[:, d] * (high - low)])
+        else:
+            values = list(values)
+            idx = np.rint(unit[:, d] * (len(values) - 1)).astype(int)
+            cols.append([values[i] for i in idx])
+    return list(zip(*cols))
+
+# ==========================================
+# 1. 탐색기 (지금까지의 기록을 보고 다음 후보 n개를 제안)
+# ==========================================
+# 모든 탐색기는 propose(space, history, n, rng) -> 파라미터 튜플 목록 형태입니다.
+# history 는 [(파라미터 튜플, 점수), ...] (평가 순서대로, 점수는 클수록 좋음)
+def propose_exhaustive(space, history, n, rng):
+    # itertools.product 순서로 아직 평가하지 않은 조합 (n 과 무관하게 남은 전부)
+    if any(_is_continuous(v) for v in space.values()):
+        raise ValueError("exhaustive 탐색은 이산 파라미터만 지원합니다.")
+    seen = {p for p, _ in history}
+    return [p for p in itertools.product(*space.values()) if p not in seen]
+
+def propose_random(space, history, n, rng):
+    return _from_unit(space, rng.random((n, len(space))))
+
+def propose_tpe(space, history, n, rng, startup=50, gamma=0.2, candidates=4):
+    """
+    TPE (Tree-structured Parzen Estimator).
+    상위 gamma 비율(good)과 나머지(bad)에 각각 가우시안 커널 밀도를 씌우고,
+    good 에서 뽑은 후보 중 l(x) / g(x) 가 큰 것을 고릅니다. 기록이 startup 개보다 적으면 무작위.
+    """
+    scored = [(p, s) for p, s in history if not np.isnan(s)]
+    if len(scored) < startup:
+        return propose_random(space, history, n, rng)
+
+    scores = np.array([s for _, s in scored])
+    order = np.argsort(-scores, kind='stable')
+    n_good = max(1, int(np.ceil(gamma * len(scored))))
+    unit = _to_unit(space, [p for p, _ in scored])
+    good, bad = unit[order[:n_good]], unit[order[n_good:]]
+
+    def bandwidth(points):
+        # Scott 규칙, 너무 좁아지지 않도록 하한
+        spread = points.std(axis=0) if len(points) > 1 else np.full(points.shape[1], 0.5)
+        return np.maximum(spread * len(points) ** (-1 / (points.shape[1] + 4)), 0.02)
+
+    def log_density(x, points, h):
+        # 커널 밀도 + 균등 사전분포(가중치 1 개분)
+        if len(points) == 0:
+            return np.zeros(len(x))
+        z = (x[:, None, :] - points[None, :, :]) / h
+        kernel = np.exp(-0.5 * (z ** 2).sum(axis=2)) / np.prod(h * np.sqrt(2 * np.pi))
+        return np.log((kernel.sum(axis=1) + 1.0) / (len(points) + 1))
+
+    h_good, h_bad = bandwidth(good), bandwidth(bad) if len(bad) else None
+    pool = good[rng.integers(len(good), size=n * candidates)] + rng.normal(size=(n * candidates, len(space))) * h_good
+    pool = np.clip(pool, 0.0, 1.0)
+    ratio = log_density(pool, good, h_good) - (log_density(pool, bad, h_bad) if len(bad) else 0.0)
+    best = ratio.reshape(n, candidates).argmax(axis=1)
+    return _from_unit(space, pool.reshape(n, candidates, -1)[np.arange(n), best])
+
+def propose_genetic(space, history, n, rng, population=40, tournament=3, mutation=0.1):
+    """
+    정상 상태(steady-state) 유전 알고리즘.
+    지금까지 평가한 조합 중 상위 population 개를 모집단으로 두고,
+    토너먼트 선택 -> 균등 교차 -> 가우시안 변이로 자식 n 개를 만듭니다.
+    """
+    scored = [(p, s) for p, s in history if not np.isnan(s)]
+    if len(scored) < 2:
+        return propose_random(space, history, n, rng)
+
+    scores = np.array([s for _, s in scored])
+    top = np.argsort(-scores, kind='stable')[:population]
+    pop, fitness = _to_unit(space, [scored[i][0] for i in top]), scores[top]
+
+    def select():
+        entrants = rng.integers(len(pop), size=(n, tournament))
+        return pop[entrants[np.arange(n), fitness[entrants].argmax(axis=1)]]
+
+    mother, father = select(), select()
+    child = np.where(rng.random(mother.shape) < 0.5, mother, father)
+    mutate = rng.random(child.shape) < 1.0 / max(len(space), 1)
+    child = child + mutate * rng.normal(scale=mutation, size=child.shape)
+    return _from_unit(space, child)
+
+SEARCHERS = {
+    'exhaustive': propose_exhaustive,
+    'random': propose_random,
+    'tpe': propose_tpe,
+    'genetic': propose_genetic,
+}
+
+# ==========================================
+# 2. 공용 탐색 루프 (평가 예산 관리)
+# ==========================================
+def run_search(space, evaluate, method='tpe', budget=2000, batch=32, seed=0, time_budget=None):
+    """
+    평가 예산(budget) 안에서 탐색기를 돌립니다. 같은 조합은 두 번 평가하지 않습니다.
+
+    params:
+      - space: 탐색 공간 (이름 -> 후보 리스트/range 또는 (하한, 상한))
+      - evaluate: 파라미터 튜플 목록 -> 점수 배열 (클수록 좋음, NaN 은 탈락)
+                  예: kernel_objective(...), strategy_objective(...)
+      - method: SEARCHERS 중 하나 ('exhaustive', 'random', 'tpe', 'genetic')
+      - budget: 최대 평가 횟수 (None 이면 exhaustive 는 전체, 나머지는 2000)
+      - batch: 한 번에 제안/평가할 조합 수 (커널은 조합 묶음 단위로 빠름)
+      - time_budget: 제한 시간(초), 시간이 다 되면 평가 예산이 남아 있어도 그때까지의 1등으로 끝냄
+    returns:
+      - (best_params, best_score, history)
+        동점이면 먼저 평가한 조합, 모두 탈락이면 (None, None, history)
+    """
+    propose = SEARCHERS[method]
+    if budget is None:
+        budget = np.inf if method == 'exhaustive' else 2000
+    deadline = time.monotonic() + time_budget if time_budget is not None else np.inf
+    rng = np.random.default_rng(seed)
+    history, seen = [], set()
+    stalls = 0
+
+    # 시간 제한이 있어도 첫 묶음은 평가 (anytime_scores 와 같음)
+    while len(history) < budget and stalls < 20 and (not history or time.monotonic() < deadline):
+        n = int(min(batch, budget - len(history)))
+        fresh = []
+        for p in propose(space, history, n, rng):
+            if p not in seen:
+                seen.add(p)
+                fresh.append(p)
+        fresh = fresh[:int(min(len(fresh), budget - len(history), batch if np.isfinite(deadline) else np.inf))]
+        if not fresh:
+            if method == 'exhaustive':
+                break
+            # 이산 공간이 작아서 새 조합이 안 나오는 경우
+            stalls += 1
+            continue
+        stalls = 0
+        history.extend(zip(fresh, np.asarray(evaluate(fresh), dtype=np.float64).tolist()))
+
+    if time.monotonic() >= deadline and len(history) < budget:
+        print(f"⏱️ 시간 제한 탐색 ({method}): 평가 예산 {budget:,}회 중 {len(history):,}회 평가 후 중단")
+
+    valid = [(p, s) for p, s in history if not np.isnan(s)]
+    if not valid:
+        return None, None, history
+    best_params, best_score = max(valid, key=lambda item: item[1])
+    return dict(zip(space, best_params)), best_score, history
+
+# ==========================================
+# 3. 목적 함수 어댑터
+# ==========================================
+# memo: 평가 결과를 (데이터 지문, 전략, 파라미터) 로 캐시 (memo.py, 메모리 LRU + 크기 제한 디스크)
+#       같은 데이터로 다시 돌리거나 겹치는 그리드를 돌리면 새 조합만 계산합니다.
+#       None 이면 환경변수 GRID_MEMO, '1' 이면 사용
+def _use_memo(memo):
+    return os.environ.get('GRID_MEMO', '0') == '1' if memo is None else memo
+
+def kernel_objective(kind, arrays, objective='score', years=None, max_drawdown=None, min_cagr=None, memo=None):
+    """
+    (ma, rsi, 세 번째 파라미터) 튜플 목록을 배열 커널로 한꺼번에 평가하는 evaluate 함수를 만듭니다.
+    EMA 는 처음 나온 기간만 계산해서 재사용하고, objective / 제약 조건은 grid_search 와 같습니다.
+    """
+    ema_cache = {}
+
+    def evaluate(params):
+        spans = [int(p[0]) for p in params]
+        # EMA 기간은 정수만 (연속 범위 (하한, 상한) 로 주면 잘려서 다른 조합을 평가하게 됨)
+        bad = [p[0] for p, s in zip(params, spans) if p[0] != s]
+        if bad:
+            raise ValueError(f"EMA 기간(ma)은 정수여야 합니다 (연속 범위 대신 range 사용): {bad[0]}")
+        new = [s for s in dict.fromkeys(spans) if s not in ema_cache]
+        if new:
+            matrix = ema_matrix(arrays['price'], new)
+            ema_cache.update({s: matrix[:, j] for j, s in enumerate(new)})
+
+        used = list(dict.fromkeys(spans))
+        ema = np.column_stack([ema_cache[s] for s in used])
+        column = {s: j for j, s in enumerate(used)}
+        ma_idx = np.array([column[s] for s in spans], dtype=np.intp)
+        rsi_vals = np.array([p[1] for p in params], dtype=np.float64)
+        third_vals = np.array([p[2] for p in params], dtype=np.float64)
+        return evaluate_combos(kind, arrays, ema, ma_idx, rsi_vals, third_vals, objective, years, max_drawdown, min_cagr)
+
+    if _use_memo(memo):
+        return memoize(fingerprint('kernel', kind, objective, years, max_drawdown, min_cagr, arrays), evaluate)
+    return evaluate
+
+def _code_id(func):
+    # 함수 이름 + 바이트코드 + 상수 (스크립트의 전략 로직을 고치면 캐시를 공유하지 않음)
+    code = func.__code__
+    consts = [c for c in code.co_consts if not hasattr(c, 'co_code')]
+    return func.__qualname__, code.co_code, repr(consts)
+
+def strategy_objective(run_strategy, df, memo=None):
+    """
+    스크립트의 run_*_strategy(df, 파라미터...) 함수를 그대로 evaluate 함수로 감쌉니다.
+    파라미터 튜플은 함수의 df 다음 인자 순서 그대로 넘깁니다 (지금 스크립트들은 (ma, rsi, 세 번째 파라미터)).
+    커널로 옮기지 않은 전략 로직(스크립트에서 고쳐 본 버전 등)을 탐색할 때 사용합니다.
+    예: strategy_objective(run_soxl_strategy, df_raw)
+    """
+    def evaluate(params):
+        # 전략 함수가 df 에 Pos_Size 등 컬럼을 쓰므로 조합마다 사본으로 실행
+        return np.array([run_strategy(df.copy(), *p)[0] for p in params], dtype=np.float64)
+
+    if _use_memo(memo):
+        return memoize(fingerprint('strategy', *_code_id(run_strategy), df), evaluate)
+    return evaluate
+
+def search_strategy(kind, arrays, space, method='tpe', budget=2000, seed=0, batch=32,
+                    objective='score', years=None, max_drawdown=None, min_cagr=None, time_budget=None, memo=None):
+    """
+    커널 전략 하나를 지정한 탐색기로 최적화합니다. space 는 (ma, rsi, 세 번째 파라미터) 순서입니다.
+    예: search_strategy('pyramid', arrays, {'ma': range(20, 201), 'rsi': range(70, 96), 'buf': (0.0, 0.06)})
+    returns: (best_params, best_score)
+    """
+    evaluate = kernel_objective(kind, arrays, objective, years, max_drawdown, min_cagr, memo)
+    best_params, best_score, _ = run_search(space, evaluate, method, budget, batch, seed, time_budget)
+    return best_params, best_score
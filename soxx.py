@@ -1,16 +1,19 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
+import sys
 import time
+from data_cache import load_prices
+from engine import extract_arrays, span_years
+from incremental import build_state, run_update, save_state
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
 # ==========================================
 # 1. 데이터 수집 (SOXX 기준 & 3배 레버리지 생성)
 # ==========================================
-def get_soxx_data():
+def get_soxx_data(start="2004-01-01"):
     print("⏳ 데이터 수집 중... (SOXX, 최근 20년)")
     # SOXX: iShares Semiconductor ETF (반도체 지수 추종)
     # SHY: 단기채 (현금 대용)
@@ -18,13 +21,7 @@ def get_soxx_data():
     
     # SOXX는 2001년 상장, SOXL은 2010년 상장.
     # 긴 시계열(2008 금융위기 포함) 분석을 위해 2004년부터 SOXX 데이터를 가져옴
-    df = yf.download(tickers, start="2004-01-01", progress=False)
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            df = df['Close']
-        except:
-            df.columns = df.columns.get_level_values(0)
+    df = load_prices(tickers, start=start)
     
     df = df.dropna()
     
@@ -108,23 +105,25 @@ def run_soxl_strategy(df, ma_period, rsi_limit, sell_buffer):
 # ==========================================
 # 3. 결과 분석
 # ==========================================
-def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
-    last_row = df.iloc[-1]
-    price = last_row['SOXX']
-    ma_val = df['SOXX'].ewm(span=ma_period, adjust=False).mean().iloc[-1]
-    rsi = last_row['RSI']
-    
-    strategy_target_pos = last_row['Strategy_Pos']
+# 리포트는 전략 상태 스냅샷(incremental.build_state)으로 출력 (전체 실행 / 일일 업데이트 공용)
+def analyze_today(state):
+    params = state['params']
+    ma_period, rsi_limit, sell_buffer = params['ma'], params['rsi'], params['buf']
+    price = state['last']['SOXX']
+    ma_val = state['ema']
+    rsi = state['rsi']
+    
+    strategy_target_pos = state['pos']
     real_cut_line = ma_val * (1 - sell_buffer)
     
     # 성과 지표
-    start_date = df.index[0]
-    end_date = df.index[-1]
+    total_score = state['equity']
+    start_date = pd.Timestamp(state['start'])
+    end_date = pd.Timestamp(state['end'])
     years = (end_date - start_date).days / 365.25
     cagr = (total_score ** (1 / years)) - 1
     
-    cum_ret = (1 + df['Strategy_Ret']).cumprod()
-    mdd = ((cum_ret - cum_ret.cummax()) / cum_ret.cummax()).min()
+    mdd = state['mdd']
     
     print("\n" + "="*60)
     print(f"📊 [SOXX(Signal) -> SOXL(3x) 전략 시뮬레이션]")
@@ -158,49 +157,79 @@ def analyze_today(df, ma_period, rsi_limit, sell_buffer, total_score):
     print("="*60)
 
 # ==========================================
-# 4. 실행부
+# 4. 최적화 + 결과 리포트 (run_all.py 에서도 사용)
+# ==========================================
+# 반도체는 추세가 길고 강하므로 파라미터 범위 설정
+ma_range = range(20, 201, 1)   
+rsi_range = range(70, 96, 2)   
+buffer_range = [0.0, 0.01, 0.02, 0.03, 0.04, 0.05] 
+
+# 제약 조건 (None 이면 사용 안 함) - 조건을 어긴 것이 확실해지는 순간 그 조합은 시뮬레이션을 멈추고 탈락
+max_drawdown = None   # 예: -0.6 -> MDD 가 -60% 보다 나빠지는 조합 제외
+min_cagr = None       # 예: 0.2  -> CAGR 20% 미만 조합 제외
+
+# 일일 업데이트용 상태 정의 (incremental.build_state 참고)
+STATE_SPEC = {
+    'kind': 'pyramid', 'price': 'SOXX', 'macro': None, 'columns': ['SOXX', 'SHY'],
+    'returns': {'ret_lev': ('SOXX', 3.0), 'ret_cash': ('SHY', 1.0)},
+}
+
+def optimize(df_raw):
+    arrays = extract_arrays(df_raw, price='SOXX', ret_lev='Sim_SOXL_3X')
+    return grid_search('pyramid', arrays, ma_range, rsi_range, buffer_range,
+                       years=span_years(df_raw), max_drawdown=max_drawdown, min_cagr=min_cagr, ticker='SOXX')
+
+def report(df_raw, best_params):
+    # 최적 결과로 최종 실행
+    final_score, df_final = run_soxl_strategy(
+        df_raw, 
+        best_params['ma'], 
+        best_params['rsi'], 
+        best_params['buf']
+    )
+
+    # 상태 스냅샷 저장 (다음 update 의 출발점) + 결과 분석
+    state = build_state(STATE_SPEC, df_final, best_params, final_score)
+    save_state('soxx', state)
+    analyze_today(state)
+
+def update():
+    # 저장된 스냅샷에 새 봉만 반영 (파라미터는 마지막 최적화 결과 그대로)
+    def full_run(params):
+        df_raw = get_soxx_data()
+        params = params or optimize(df_raw)[0]
+        if params is None:
+            print("⚠️ 제약 조건(max_drawdown / min_cagr)을 만족하는 조합이 없습니다.")
+        else:
+            report(df_raw, params)
+    return run_update('soxx', get_soxx_data, full_run, analyze_today)
+
+# ==========================================
+# 5. 실행부
 # ==========================================
 if __name__ == "__main__":
+    # 사용법: python soxx.py         -> 전체 최적화 + 리포트
+    #         python soxx.py update  -> 저장된 상태에 새 봉만 반영해서 리포트
+    if sys.argv[1:] == ['update']:
+        update()
+        sys.exit()
+
     # 데이터 수집 (20년치 SOXX, 3배 시뮬레이션)
     df_raw = get_soxx_data()
     
-    # 반도체는 추세가 길고 강하므로 파라미터 범위 설정
-    ma_range = range(20, 201, 1)   
-    rsi_range = range(70, 96, 2)   
-    buffer_range = [0.0, 0.01, 0.02, 0.03, 0.04, 0.05] 
-    
     total_combinations = len(ma_range) * len(rsi_range) * len(buffer_range)
     
     print(f"\n⚡ 최적 시나리오 분석 시작...")
     print(f"   - 총 시나리오: {total_combinations:,}개")
     
     start_time = time.time()
-    best_score = -999
-    best_params = {}
     
     # 최적 파라미터 찾기
-    for ma, rsi, buf in itertools.product(ma_range, rsi_range, buffer_range):
-        score, _ = run_soxl_strategy(df_raw.copy(), ma, rsi, buf)
-        
-        if score > best_score:
-            best_score = score
-            best_params = {'ma': ma, 'rsi': rsi, 'buf': buf}
+    best_params, best_score = optimize(df_raw)
             
     print(f"\n✅ 완료! (소요시간: {time.time() - start_time:.1f}초)")
     
-    # 최적 결과로 최종 실행
-    final_score, df_final = run_soxl_strategy(
-        df_raw, 
-        best_params['ma'], 
-        best_params['rsi'], 
-        best_params['buf']
-    )
-    
-    # 결과 분석
-    analyze_today(
-        df_final, 
-        best_params['ma'], 
-        best_params['rsi'], 
-        best_params['buf'],
-        final_score
-    )
\ No newline at end of file
+    if best_params is None:
+        print("⚠️ 제약 조건(max_drawdown / min_cagr)을 만족하는 조합이 없습니다.")
+    else:
+        report(df_raw, best_params)
@@ -0,0 +1,139 @@
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_cache
+
+# ==========================================
+# 로컬 대역 서버 (FRED 그래프 CSV 형식: ?id=이름&cosd=시작일)
+# ==========================================
+DATES = pd.bdate_range('2024-01-01', '2024-03-29')
+
+class _Stand:
+    delay = 0.0        # 모든 요청에 더하는 지연(초)
+    hang = set()       # 응답하지 않고 붙잡고 있을 id
+    fail_cosd = None   # 이 시작일로 오는 요청은 500
+    scale = 1.0        # 값 배율 (수정주가 재계산 흉내)
+    intraday = None    # 마지막 날 값 배율 (장중 가격 흉내)
+    requests = []
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        name, cosd = query['id'], query['cosd']
+        _Stand.requests.append((name, cosd))
+        if name in _Stand.hang:
+            time.sleep(5)
+            return
+        time.sleep(_Stand.delay)
+        if cosd == _Stand.fail_cosd:
+            self.send_error(500)
+            return
+        base = 10.0 + sum(map(ord, name)) % 50
+        scale = [_Stand.scale] * (len(DATES) - 1) + [_Stand.scale * (_Stand.intraday or 1.0)]
+        rows = [f"{d:%Y-%m-%d},{base * (1 + 0.001 * i) * scale[i]:.6f}"
+                for i, d in enumerate(DATES) if d >= pd.Timestamp(cosd)]
+        body = ("DATE," + name + "\n" + "\n".join(rows) + "\n").encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stand(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/fredgraph.csv"
+
+    _Stand.delay, _Stand.hang, _Stand.fail_cosd, _Stand.scale, _Stand.intraday, _Stand.requests = 0.0, set(), None, 1.0, None, []
+    monkeypatch.setattr(data_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(data_cache, 'PRICE_URL', url)
+    monkeypatch.setattr(data_cache, 'FRED_URL', url)
+    monkeypatch.setattr(data_cache, 'FETCH_TIMEOUT', 0.5)
+    monkeypatch.setattr(data_cache, 'FETCH_RETRIES', 1)
+    monkeypatch.setattr(data_cache, 'MAX_CONNECTIONS', 8)
+    yield _Stand
+    server.shutdown()
+    server.server_close()
+
+TICKERS = ['NVDA', 'SHY', '^VIX', 'SOXX', 'BTC-USD', 'QQQ']
+FRED = ['T10Y2Y', 'BAMLH0A0HYM2']
+
+# ==========================================
+# 테스트
+# ==========================================
+def test_load_all_fetches_sources_concurrently(stand):
+    stand.delay = 0.3
+    started = time.perf_counter()
+    prices, macro = data_cache.load_all(TICKERS, '2024-01-01', fred_ids=FRED)
+    elapsed = time.perf_counter() - started
+
+    # 순차라면 8 x 0.3초
+    assert elapsed < 0.3 * len(TICKERS + FRED) / 2
+    assert list(prices.columns) == TICKERS
+    assert len(prices) == len(DATES) and not prices.isna().any().any()
+    assert set(macro) == set(FRED)
+
+def test_hung_source_does_not_block_others(stand):
+    stand.hang = {'BAMLH0A0HYM2'}
+    started = time.perf_counter()
+    prices, macro = data_cache.load_all(TICKERS, '2024-01-01', fred_ids=FRED)
+    elapsed = time.perf_counter() - started
+
+    # 멈춘 소스 1개만 타임아웃 x (재시도 + 1) + 대기 후 포기, 나머지는 그대로 받음
+    assert elapsed < 3.0
+    assert list(macro) == ['T10Y2Y']
+    assert not prices.isna().any().any()
+    assert stand.requests.count(('BAMLH0A0HYM2', '2024-01-01')) == 2
+
+def test_incremental_update_requests_only_new_bars(stand, monkeypatch):
+    first = data_cache.load_close('NVDA', '2024-01-01')
+    monkeypatch.setattr(data_cache, 'MAX_AGE', 0.0)
+    stand.requests.clear()
+    again = data_cache.load_close('NVDA', '2024-01-01')
+
+    assert stand.requests == [('NVDA', f"{first.index[-1]:%Y-%m-%d}")]
+    assert first.index.equals(again.index)
+    np.testing.assert_array_equal(first.to_numpy(), again.to_numpy())
+
+def test_revised_history_refetch_failure_falls_back_to_cache(stand, monkeypatch):
+    cached = data_cache.load_close('SOXX', '2024-01-01')
+    fetched_at = data_cache._read_cache(data_cache._cache_path('price', 'SOXX'))[1]['fetched_at']
+
+    # 겹치는 날 값이 바뀌었고(수정주가), 전체 재다운로드는 실패
+    monkeypatch.setattr(data_cache, 'MAX_AGE', 0.0)
+    stand.scale, stand.fail_cosd = 1.5, '2024-01-01'
+    series = data_cache.load_close('SOXX', '2024-01-01')
+
+    np.testing.assert_array_equal(series.to_numpy(), cached.to_numpy())
+    # 캐시를 갱신하지 않았으므로 다음 실행에서 다시 시도
+    assert data_cache._read_cache(data_cache._cache_path('price', 'SOXX'))[1]['fetched_at'] == fetched_at
+
+def test_intraday_last_bar_is_refetched_without_full_history(stand, monkeypatch):
+    # 마지막 날 장중에 받아서 그날 봉은 아직 확정 종가가 아님
+    monkeypatch.setattr(data_cache, '_market_date', lambda timestamp: DATES[-1])
+    stand.intraday = 1.02
+    data_cache.load_close('NVDA', '2024-01-01')
+
+    # 장 마감 후 갱신: 마지막 확정 봉부터만 받고 장중 값은 확정 종가로 바뀜
+    monkeypatch.setattr(data_cache, 'MAX_AGE', 0.0)
+    stand.intraday = None
+    stand.requests.clear()
+    series = data_cache.load_close('NVDA', '2024-01-01')
+
+    assert stand.requests == [('NVDA', f"{DATES[-2]:%Y-%m-%d}")]
+    expected = data_cache._clean(data_cache._download_close('NVDA', '2024-01-01'))
+    np.testing.assert_array_equal(series.to_numpy(), expected.to_numpy())
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+from engine import extract_arrays
+from optimizer import grid_scores
+from run_all import load_script
+
+# ==========================================
+# 합성 데이터 (스크립트의 데이터 수집 결과와 같은 컬럼)
+# ==========================================
+N_BARS = 1200
+
+def _rsi(price):
+    delta = price.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    return 100 - (100 / (1 + gain / loss))
+
+def _frame(col, seed, vol, lev, lev_col, pct_col):
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range('2010-01-01', periods=N_BARS)
+    df = pd.DataFrame({
+        col: 50 * np.exp(np.cumsum(rng.normal(0.0006, vol, N_BARS))),
+        'SHY': 80 * np.exp(np.cumsum(rng.normal(0.0001, 0.001, N_BARS))),
+    }, index=idx)
+    df[pct_col] = df[col].pct_change()
+    df[lev_col] = df[pct_col] * lev
+    df['Sim_Cash'] = df['SHY'].pct_change()
+    df['RSI'] = _rsi(df[col])
+    return df, rng
+
+def _switch():
+    df, _ = _frame('NVDA', 1, 0.025, 2.0, 'Sim_Lev_2X', 'NVDA_Pct')
+    df['T10Y2Y'] = np.sin(np.arange(N_BARS) / 150.0) + 0.3
+    return df.dropna()
+
+def _pyramid():
+    df, _ = _frame('SOXX', 2, 0.02, 3.0, 'Sim_SOXL_3X', 'SOXX_Pct')
+    return df.dropna()
+
+def _pltr():
+    df, _ = _frame('PLTR', 3, 0.03, 2.0, 'Sim_PLTR_2X', 'PLTR_Pct')
+    df['Yield_Curve'] = np.sin(np.arange(N_BARS) / 100.0) * 1.2
+    return df.dropna()
+
+def _tqqq():
+    df, rng = _frame('QQQ', 4, 0.015, 3.0, 'Sim_TQQQ_3X', 'QQQ_Pct')
+    df['Macro_Risk_Off'] = rng.random(N_BARS) < 0.1
+    return df.dropna()
+
+def _btc():
+    df, _ = _frame('BTC-USD', 5, 0.04, 2.0, 'Sim_BITX', 'BTC_Pct')
+    return df.dropna()
+
+def _vix():
+    # VIX 스크립트는 파생 컬럼을 만든 뒤 dropna 하지 않음 (첫 날 수익률 / 초반 RSI 가 NaN 인 채로 시뮬레이션)
+    df, rng = _frame('QQQ', 6, 0.012, 3.0, 'Sim_TQQQ', 'QQQ_Pct')
+    df['^VIX'] = 18 + 8 * np.abs(np.sin(np.arange(N_BARS) / 40.0)) + rng.normal(0, 3, N_BARS)
+    df['VIX_MA50'] = df['^VIX'].ewm(span=50, adjust=False).mean()
+    df['Sim_SGOV'] = df['Sim_Cash']
+    return df
+
+# kind -> (스크립트, 전략 함수, 데이터, extract_arrays 인자, 세 번째 파라미터 후보)
+CASES = {
+    'switch': ('nvda.py', 'run_strategy', _switch,
+               dict(price='NVDA', ret_lev='Sim_Lev_2X', ret_spot='NVDA_Pct', macro='T10Y2Y'), [0.0, 0.01, 0.03]),
+    'pyramid': ('soxx.py', 'run_soxl_strategy', _pyramid,
+                dict(price='SOXX', ret_lev='Sim_SOXL_3X'), [0.0, 0.01, 0.03]),
+    'pltr': ('pltr.py', 'run_pltr_strategy', _pltr,
+             dict(price='PLTR', ret_lev='Sim_PLTR_2X', macro='Yield_Curve'), [0.0, 0.01, 0.03]),
+    'tqqq': ('qqq tqqq.py', 'run_tqqq_strategy', _tqqq,
+             dict(price='QQQ', ret_lev='Sim_TQQQ_3X', macro='Macro_Risk_Off'), [0.0, 0.01, 0.03]),
+    'btc': ('btc.py', 'run_switching_strategy', _btc,
+            dict(price='BTC-USD', ret_lev='Sim_BITX', ret_spot='BTC_Pct'), [0.0, 0.01, 0.03]),
+    'vix': ('버퍼 두는거 깜빡함 제발 이상적인 버퍼 두는거 있지마.py', 'run_pyramiding_strategy', _vix,
+            dict(price='QQQ', ret_lev='Sim_TQQQ', ret_cash='Sim_SGOV', macro='^VIX', macro2='VIX_MA50'), [25, 30, 40]),
+}
+MA_RANGE = [10, 35, 80]
+
+@pytest.fixture(scope='module', params=list(CASES))
+def baseline(request):
+    """스크립트의 run_*_strategy 루프로 계산한 그리드 점수 (백엔드 설정과 무관하게 1번만)"""
+    kind = request.param
+    filename, func, make, columns, third_range = CASES[kind]
+    run_strategy = getattr(load_script(filename), func)
+    df = make()
+    # RSI 가 기준값과 정확히 같은 날(동점 처리)도 들어가도록 실제 RSI 값 하나를 기준으로 섞음
+    rsi_range = [60, 75, 90, float(df['RSI'].dropna().iloc[len(df) // 2])]
+    expected = np.array([[[run_strategy(df.copy(), ma, rsi, p3)[0] for p3 in third_range]
+                          for rsi in rsi_range] for ma in MA_RANGE])
+    return kind, extract_arrays(df, **columns), (MA_RANGE, rsi_range, third_range), expected
+
+# ==========================================
+# 테스트
+# ==========================================
+@pytest.mark.parametrize('jit', [
+    False, pytest.param(True, marks=pytest.mark.skipif(engine.njit is None, reason="numba 없음")),
+])
+@pytest.mark.parametrize('events', [False, True])
+def test_grid_scores_match_strategy_loops(baseline, monkeypatch, jit, events):
+    kind, arrays, grid, expected = baseline
+    monkeypatch.setattr(engine, 'JIT_ENABLED', jit)
+    monkeypatch.setattr(engine, 'EVENTS_ENABLED', events)
+
+    scores = grid_scores(kind, arrays, *grid)
+    np.testing.assert_allclose(scores, expected, rtol=1e-12, atol=0)
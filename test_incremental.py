@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental import advance, advance_frame, build_state
+from run_all import load_script
+
+# ==========================================
+# 스냅샷 + 비교용 pandas 계산 (스크립트와 같은 RSI 식)
+# ==========================================
+SPEC = {
+    'kind': 'pyramid', 'price': 'SOXX', 'macro': None, 'columns': ['SOXX', 'SHY'],
+    'returns': {'ret_lev': ('SOXX', 3.0), 'ret_cash': ('SHY', 1.0)},
+}
+PARAMS = {'ma': 5, 'rsi': 80, 'buf': 0.01}
+
+def _rsi(price):
+    delta = price.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    return 100 - (100 / (1 + gain / loss))
+
+def _frame(prices):
+    df = pd.DataFrame({'SOXX': prices, 'SHY': 80.0}, index=pd.bdate_range('2024-01-01', periods=len(prices)))
+    df['RSI'] = _rsi(df['SOXX'])
+    df['Strategy_Pos'] = 0.0
+    df['Strategy_Ret'] = 0.0
+    return df
+
+def _advanced_rsi(prices, n_new, params=PARAMS):
+    # 앞부분으로 스냅샷을 만들고 마지막 n_new 봉을 advance() 로 이어 간 RSI 목록
+    df = _frame(prices)
+    state = build_state(SPEC, df.iloc[:-n_new], params, 1.0)
+    out = []
+    for date, price in df['SOXX'].iloc[-n_new:].items():
+        advance(state, date, {'SOXX': price, 'SHY': 80.0})
+        out.append(state['rsi'])
+    return np.array(out), df['RSI'].iloc[-n_new:].to_numpy()
+
+# ==========================================
+# 테스트
+# ==========================================
+def test_rsi_matches_pandas_on_random_walk():
+    rng = np.random.default_rng(0)
+    actual, expected = _advanced_rsi(50 * np.exp(np.cumsum(rng.normal(0, 0.02, 80))), 30)
+    np.testing.assert_allclose(actual, expected, rtol=1e-9)
+
+def test_rsi_without_down_days_is_100():
+    actual, expected = _advanced_rsi(np.linspace(50.0, 70.0, 40), 10)
+    np.testing.assert_array_equal(expected, 100.0)
+    np.testing.assert_array_equal(actual, expected)
+
+def test_rsi_on_flat_prices_is_nan():
+    actual, expected = _advanced_rsi(np.full(40, 50.0), 10)
+    assert np.isnan(expected).all()
+    assert np.isnan(actual).all()
+
+def test_params_are_read_by_name():
+    rng = np.random.default_rng(1)
+    prices = 50 * np.exp(np.cumsum(rng.normal(0.002, 0.02, 80)))
+    df = _frame(prices)
+    states = []
+    for params in (PARAMS, {'buf': 0.01, 'rsi': 80, 'ma': 5}):
+        state = build_state(SPEC, df.iloc[:-20], params, 1.0)
+        for date, price in df['SOXX'].iloc[-20:].items():
+            advance(state, date, {'SOXX': price, 'SHY': 80.0})
+        states.append(state)
+    assert states[0]['pos'] == states[1]['pos'] and states[0]['ema'] == states[1]['ema']
+
+# ==========================================
+# 스크립트 스냅샷 + 새 봉 이어 가기 == 전체 기간 재실행
+# ==========================================
+def _raw_prices(tickers, n, seed):
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range('2015-01-01', periods=n)
+    return pd.DataFrame({t: (50 + 30 * i) * np.exp(np.cumsum(rng.normal(0.0005, 0.015 / (i + 1), n)))
+                         for i, t in enumerate(tickers)}, index=idx)
+
+def _macro(index, name):
+    return pd.Series(np.sin(np.arange(len(index)) / 30.0) + 3.0, index=index, name=name)
+
+# 스크립트, 데이터 함수, 전략 함수, 데이터 소스 교체
+SCRIPTS = {
+    'nvda': ('nvda.py', 'get_combined_data', 'run_strategy', 'load_all', 'T10Y2Y'),
+    'soxx': ('soxx.py', 'get_soxx_data', 'run_soxl_strategy', 'load_prices', None),
+    'qqq_tqqq': ('qqq tqqq.py', 'get_combined_data', 'run_tqqq_strategy', 'load_all', 'BAMLH0A0HYM2'),
+}
+
+@pytest.mark.parametrize('name', list(SCRIPTS))
+def test_advance_frame_matches_full_rerun(name, monkeypatch):
+    filename, get_data, run, source, fred_id = SCRIPTS[name]
+    script = load_script(filename)
+    tickers = [c for c in script.STATE_SPEC['columns'] if c in ('NVDA', 'SOXX', 'QQQ', 'SHY')]
+    raw = _raw_prices(tickers, 900, seed=len(name))
+    params = {'ma': 20, 'rsi': 65, 'buf': 0.01}
+
+    def frame(rows):
+        prices = raw.iloc[:rows]
+        if source == 'load_prices':
+            monkeypatch.setattr(script, 'load_prices', lambda *a, **k: prices.copy())
+        else:
+            macro = {fred_id: _macro(prices.index, fred_id)}
+            monkeypatch.setattr(script, 'load_all', lambda *a, **k: (prices.copy(), macro))
+        return getattr(script, get_data)()
+
+    # 앞부분으로 스냅샷을 만든 뒤 마지막 30봉을 이어 붙임
+    head, full = frame(len(raw) - 30), frame(len(raw))
+    score, df_head = getattr(script, run)(head, params['ma'], params['rsi'], params['buf'])
+    state = build_state(script.STATE_SPEC, df_head, params, score)
+    assert advance_frame(state, full) == 30
+
+    score, df_full = getattr(script, run)(full, params['ma'], params['rsi'], params['buf'])
+    expected = build_state(script.STATE_SPEC, df_full, params, score)
+    assert state['end'] == expected['end'] and state['bars'] == expected['bars']
+    assert (state['pos'], state['lev']) == (expected['pos'], expected['lev'])
+    for key in ('equity', 'peak', 'mdd', 'ema', 'rsi'):
+        assert state[key] == pytest.approx(expected[key], rel=1e-9), key
+    assert [d for d, _ in state['tail']] == [d for d, _ in expected['tail']]
+    np.testing.assert_allclose([v for _, v in state['tail']], [v for _, v in expected['tail']], rtol=1e-9)
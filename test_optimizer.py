@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+import pytest
+
+import optimizer
+from engine import extract_arrays
+from optimizer import anytime_search, grid_metrics, incremental_metrics
+from test_engine import CASES
+
+GRID = ([10, 35, 80], [60, 75, 90])
+
+@pytest.mark.parametrize('kind', list(CASES))
+def test_incremental_metrics_match_full_rerun(kind, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(optimizer, 'GRID_STATE_DIR', str(tmp_path))
+    _, _, make, columns, third_range = CASES[kind]
+    df = make()
+    full = extract_arrays(df, **columns)
+    years = len(df) / 252
+
+    # 앞부분으로 상태를 저장한 뒤, 봉을 두 번에 나눠 붙여 가며 이어서 계산
+    for bars in (len(df) - 40, len(df) - 15, len(df)):
+        arrays = {key: value[:bars] for key, value in full.items()}
+        metrics = incremental_metrics(kind, arrays, *GRID, third_range, years)
+    assert "새 봉 15개만 반영" in capsys.readouterr().out
+
+    expected = grid_metrics(kind, full, *GRID, third_range, years)
+    np.testing.assert_allclose(metrics, expected, rtol=1e-12, atol=1e-15)
+
+def test_time_budget_includes_grid_setup(monkeypatch):
+    _, _, make, columns, third_range = CASES['pyramid']
+    arrays = extract_arrays(make(), **columns)
+    grid = optimizer._grid
+
+    # EMA 계산만으로 제한 시간을 다 쓰면 첫 묶음만 평가하고 멈춤
+    def slow_grid(*args):
+        time.sleep(0.3)
+        return grid(*args)
+    monkeypatch.setattr(optimizer, '_grid', slow_grid)
+
+    ma_range, rsi_range = list(range(5, 105)), [60, 75, 90]
+    _, _, coverage = anytime_search('pyramid', arrays, ma_range, rsi_range, third_range, time_budget=0.2)
+    assert coverage == 256 / (len(ma_range) * len(rsi_range) * len(third_range))
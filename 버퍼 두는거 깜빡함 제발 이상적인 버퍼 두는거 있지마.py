@@ -1,17 +1,17 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import itertools
 import warnings
 import time
+from data_cache import load_prices
+from engine import extract_arrays, span_years
+from optimizer import grid_search
 
 warnings.filterwarnings("ignore")
 
 def get_data_advanced():
     print("⏳ 데이터 수집 및 가공 중... (3중 필터 준비)")
     tickers = ['QQQ', 'SHY', '^VIX']
-    df = yf.download(tickers, start="2010-01-01", progress=False)['Close']
-    df.columns = tickers
+    df = load_prices(tickers, start="2010-01-01")
     df = df.dropna()
     
     # 가상 데이터 생성
@@ -148,33 +148,30 @@ if __name__ == "__main__":
     # 3. VIX 공포 기준: 28 ~ 40 (1 단위) - 여기가 핵심!
     vix_range = range(28, 41, 1)
     
-    best_score = -999
-    best_params = {'ma': 150, 'rsi': 75, 'vix': 35}
+    # 제약 조건 (None 이면 사용 안 함) - 조건을 어긴 것이 확실해지는 순간 그 조합은 시뮬레이션을 멈추고 탈락
+    max_drawdown = None   # 예: -0.5 -> MDD 가 -50% 보다 나빠지는 조합 제외
+    min_cagr = None       # 예: 0.2  -> CAGR 20% 미만 조합 제외
+    
+    # 제한 시간(초, None 이면 환경변수 GRID_TIME_BUDGET, 없으면 전체 탐색) - 시간이 다 되면 그때까지 평가한 조합 중 1등으로 진행
+    time_budget = None    # 예: 60
     
     total_combinations = len(ma_range) * len(rsi_range) * len(vix_range)
     print(f"\n🔍 총 {total_combinations}개의 'EMA + RSI + VIX' 조합을 테스트합니다.")
-    print("   (잠시만 기다려주세요, 약 3~5분 소요됩니다...)")
     
-    count = 0
     start_time = time.time()
     
-    # 3중 루프 Grid Search
-    for ma, rsi, vix_cut in itertools.product(ma_range, rsi_range, vix_range):
-        score, _ = run_pyramiding_strategy(df_raw.copy(), ma, rsi, vix_cut)
-        
-        if score > best_score:
-            best_score = score
-            best_params = {'ma': ma, 'rsi': rsi, 'vix': vix_cut}
-            # 중간중간 갱신될 때만 출력
-            print(f"   ✨ 발견! EMA {ma} / RSI {rsi} / VIX {vix_cut} -> 수익 {score:.2f}배")
-            
-        count += 1
-        if count % 2000 == 0:
-            elapsed = time.time() - start_time
-            print(f"   ... {count}/{total_combinations} 진행 중 ({elapsed:.1f}초)")
+    # Grid Search (탐색 방식/병렬/캐시 등은 grid_search 옵션과 환경변수 GRID_* 로 선택)
+    arrays = extract_arrays(df_raw, price='QQQ', ret_lev='Sim_TQQQ', ret_cash='Sim_SGOV', macro='^VIX', macro2='VIX_MA50')
+    best_params, best_score = grid_search('vix', arrays, ma_range, rsi_range, vix_range, names=('ma', 'rsi', 'vix'),
+                                          years=span_years(df_raw), max_drawdown=max_drawdown, min_cagr=min_cagr,
+                                          time_budget=time_budget, ticker='QQQ-VIX')
 
     print(f"\n✅ 최적화 완료! (총 소요시간: {time.time() - start_time:.1f}초)")
     
-    # 찾은 최적 값으로 오늘 분석
-    _, df_final = run_pyramiding_strategy(df_raw, best_params['ma'], best_params['rsi'], best_params['vix'])
-    analyze_today(df_final, best_params['ma'], best_params['rsi'], best_params['vix'])
\ No newline at end of file
+    if best_params is None:
+        print("⚠️ 제약 조건(max_drawdown / min_cagr)을 만족하는 조합이 없습니다.")
+    else:
+        print(f"   🏆 EMA {best_params['ma']} / RSI {best_params['rsi']} / VIX {best_params['vix']} -> 수익 {best_score:.2f}배")
+        # 찾은 최적 값으로 오늘 분석
+        _, df_final = run_pyramiding_strategy(df_raw, best_params['ma'], best_params['rsi'], best_params['vix'])
+        analyze_today(df_final, best_params['ma'], best_params['rsi'], best_params['vix'])
\ No newline at end of file